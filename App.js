@@ -3,6 +3,7 @@ const mongoose = require('mongoose');
 const http = require('http');
 const socketIo = require('socket.io');
 const path = require('path');
+const crypto = require('crypto');
 const axios = require('axios');
 const bodyParser = require('body-parser');
 const cookieParser = require('cookie-parser');
@@ -113,6 +114,10 @@ app.use('/auth', require('./routes/auth'));
 const FormData = require('form-data'); 
 // Configure Python backend URL (Render or local)
 const PY_BACKEND_URL = process.env.PY_BACKEND_URL || 'http://localhost:8000';
+// The backend keys trackers, recordings and its summary/series endpoints on this id, so it gets
+// a keyed hash of the session id rather than the cookie value itself
+const poseSessionId = (sessionID) =>
+    crypto.createHmac('sha256', process.env.SESSION_SECRET || 'dev-secret').update(sessionID).digest('hex');
 app.post('/api/pose', async (req, res) => {
     try {
         const { image } = req.body; 
@@ -128,7 +133,8 @@ app.post('/api/pose', async (req, res) => {
         form.append('file', imgBuffer, { filename: 'frame.jpg', contentType: 'image/jpeg' });
         
     const response = await axios.post(`${PY_BACKEND_URL.replace(/\/$/, '')}/analyze_pose/`, form, {
-            headers: form.getHeaders(),
+            // Keep each browser session on its own pose tracker in the Python backend
+            headers: { ...form.getHeaders(), 'X-Session-ID': poseSessionId(req.sessionID) },
             maxContentLength: Infinity,
             maxBodyLength: Infinity
         });
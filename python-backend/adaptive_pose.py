@@ -0,0 +1,204 @@
+"""
+Adaptive MediaPipe Pose quality
+Picks model complexity, input downscale and segmentation per session from a latency budget
+"""
+
+import os
+import time
+
+import cv2
+
+# Ordered from best quality to cheapest
+QUALITY_LEVELS = [
+    {"model_complexity": 2, "scale": 1.0},     # Heavy model for better accuracy
+    {"model_complexity": 1, "scale": 1.0},
+    {"model_complexity": 1, "scale": 0.75},
+    {"model_complexity": 0, "scale": 0.75},
+    {"model_complexity": 0, "scale": 0.5},
+]
+
+DEFAULT_LATENCY_BUDGET_MS = 100.0
+# Frames after a Pose is (re)built that are not timed: the first one includes graph
+# initialization (~200 ms against ~30 ms steady) and would read as over budget
+WARMUP_FRAMES = 2
+
+# Model complexities whose model could not be loaded in this process (see preload_models)
+_unavailable = set()
+
+
+def create_pose(static_image_mode=False, model_complexity=2, enable_segmentation=False):
+    """Build a MediaPipe Pose instance with improved accuracy settings"""
+    # Imported on first use: only the inference workers need MediaPipe, and it is slow to import
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(
+        static_image_mode=static_image_mode,
+        model_complexity=model_complexity,
+        # The segmentation mask is not used by any analyzer, so it is off unless requested
+        enable_segmentation=enable_segmentation,
+        min_detection_confidence=0.7,          # Increased from 0.5
+        min_tracking_confidence=0.6            # Increased from 0.5
+    )
+
+
+def preload_models():
+    """Build and close a Pose for every complexity in QUALITY_LEVELS; returns the usable ones
+
+    MediaPipe downloads the lite and heavy models on first use, which would
+    otherwise happen on the frame that first steps onto such a level. A
+    complexity whose model cannot be loaded (e.g. offline) is skipped by every
+    QualityController from then on; if none can be, the last error is raised.
+    """
+    error = None
+    for complexity in sorted({level["model_complexity"] for level in QUALITY_LEVELS}):
+        try:
+            create_pose(model_complexity=complexity).close()
+            _unavailable.discard(complexity)
+        except Exception as e:
+            error = e
+            _unavailable.add(complexity)
+            print(f"⚠️ Pose model complexity {complexity} unavailable, skipping its levels: {type(e).__name__}: {e}")
+    available = sorted({level["model_complexity"] for level in QUALITY_LEVELS} - _unavailable)
+    if not available:
+        raise error
+    return available
+
+
+def level_available(index):
+    return QUALITY_LEVELS[index]["model_complexity"] not in _unavailable
+
+
+class QualityController:
+    """Steps quality down when inference time exceeds the budget and back up with headroom
+
+    Uses an exponential moving average of per-frame inference time. Stepping
+    down needs the average over budget for down_after frames; stepping up
+    needs it under headroom * budget for up_after frames, so levels do not
+    oscillate. Levels whose model failed to preload are skipped.
+    """
+
+    def __init__(self, budget_ms=None, start_level=None, adaptive=None,
+                 segmentation=None, down_after=3, up_after=30, headroom=0.6, alpha=0.2):
+        self.budget_ms = budget_ms or float(os.getenv("POSE_LATENCY_BUDGET_MS", DEFAULT_LATENCY_BUDGET_MS))
+        if start_level is None:
+            start_level = int(os.getenv("POSE_QUALITY_LEVEL", "0"))
+        self.level_index = min(max(start_level, 0), len(QUALITY_LEVELS) - 1)
+        if not level_available(self.level_index):
+            # Nearest cheaper level, else the nearest better one
+            self.level_index = next((i for i in (self._next(1), self._next(-1)) if i is not None),
+                                    self.level_index)
+        self.adaptive = adaptive if adaptive is not None else os.getenv("POSE_ADAPTIVE_QUALITY", "1") == "1"
+        # Segmentation only ever runs at the top level, and only when enabled
+        self.segmentation = segmentation if segmentation is not None else os.getenv("POSE_SEGMENTATION", "0") == "1"
+        self.down_after = down_after
+        self.up_after = up_after
+        self.headroom = headroom
+        self.alpha = alpha
+        self.latency_ms = None
+        self._over = 0
+        self._under = 0
+        self.changes = 0
+
+    @property
+    def level(self):
+        level = dict(QUALITY_LEVELS[self.level_index])
+        level["segmentation"] = self.segmentation and self.level_index == 0
+        return level
+
+    def observe(self, inference_ms):
+        """Record one frame's inference time; returns True if the level changed"""
+        if self.latency_ms is None:
+            self.latency_ms = inference_ms
+        else:
+            self.latency_ms += self.alpha * (inference_ms - self.latency_ms)
+        if not self.adaptive:
+            return False
+
+        if self.latency_ms > self.budget_ms:
+            self._over += 1
+            self._under = 0
+            if self._over >= self.down_after and self._next(1) is not None:
+                return self._step(1)
+        elif self.latency_ms < self.budget_ms * self.headroom:
+            self._under += 1
+            self._over = 0
+            if self._under >= self.up_after and self._next(-1) is not None:
+                return self._step(-1)
+        else:
+            self._over = self._under = 0
+        return False
+
+    def _next(self, delta):
+        """Index of the nearest available level in the direction of delta, or None"""
+        index = self.level_index + delta
+        while 0 <= index < len(QUALITY_LEVELS):
+            if level_available(index):
+                return index
+            index += delta
+        return None
+
+    def _step(self, delta):
+        self.level_index = self._next(delta)
+        self._over = self._under = 0
+        # The new level's timing is unknown; start the average fresh (AdaptivePose skips the
+        # rebuilt model's warm-up frames, so it is seeded with a steady-state time)
+        self.latency_ms = None
+        self.changes += 1
+        return True
+
+
+class AdaptivePose:
+    """Drop-in for mp_pose.Pose whose configuration follows a QualityController
+
+    The first WARMUP_FRAMES frames after each (re)build are not reported to
+    the controller, so graph initialization is not mistaken for the level's
+    steady inference time.
+    """
+
+    def __init__(self, static_image_mode=False, controller=None, warmup_frames=WARMUP_FRAMES):
+        self.static_image_mode = static_image_mode
+        self.controller = controller or QualityController()
+        self.warmup_frames = warmup_frames
+        self.pose = None
+        self._config = None
+        self._warmup = 0
+
+    def process(self, rgb_image):
+        level = self.controller.level
+        config = (level["model_complexity"], level["segmentation"])
+        if config != self._config:
+            # Complexity or segmentation changed: rebuild (tracking restarts)
+            self.close()
+            self.pose = create_pose(self.static_image_mode, *config)
+            self._config = config
+            self._warmup = self.warmup_frames
+
+        # Landmarks are normalized, so a downscaled input needs no remapping
+        if level["scale"] < 1.0:
+            rgb_image = cv2.resize(rgb_image, None, fx=level["scale"], fy=level["scale"],
+                                   interpolation=cv2.INTER_AREA)
+
+        start = time.perf_counter()
+        results = self.pose.process(rgb_image)
+        if self._warmup:
+            self._warmup -= 1
+        else:
+            self.controller.observe((time.perf_counter() - start) * 1000)
+        return results
+
+    def close(self):
+        if self.pose is not None:
+            try:
+                self.pose.close()
+            except Exception:
+                pass
+            self.pose = None
+            self._config = None
+
+    def stats(self):
+        level = self.controller.level
+        return {
+            "model_complexity": level["model_complexity"],
+            "scale": level["scale"],
+            "segmentation": level["segmentation"],
+            "inference_ms": None if self.controller.latency_ms is None else round(self.controller.latency_ms, 1)
+        }
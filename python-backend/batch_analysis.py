@@ -0,0 +1,119 @@
+"""
+Vectorized posture analysis for batches of frames
+Works on (N, 33, 4) landmark arrays: x, y, z, visibility per MediaPipe landmark
+"""
+
+import numpy as np
+
+from landmarks import (
+    KEY_INDICES, LEFT_HIP, LEFT_SHOULDER, RIGHT_HIP, RIGHT_SHOULDER, VIS, Y, Landmarks
+)
+
+REQUIRED_INDICES = np.array([LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP], dtype=np.intp)
+
+
+def analyze_general_posture_batch(landmarks):
+    """Compute the general posture metrics for every frame at once
+
+    Returns a dict of (N,) arrays; frames with NaN landmarks come back as
+    not visible.
+    """
+    vis = np.nan_to_num(landmarks[..., VIS], nan=0.0)
+    y = landmarks[..., Y]
+
+    visible = np.all(vis[:, REQUIRED_INDICES] >= 0.5, axis=1)
+
+    shoulder_diff = np.abs(y[:, LEFT_SHOULDER] - y[:, RIGHT_SHOULDER])
+    hip_diff = np.abs(y[:, LEFT_HIP] - y[:, RIGHT_HIP])
+    shoulders_off = shoulder_diff > 0.05
+    hips_off = hip_diff > 0.03
+
+    avg_shoulder_y = (y[:, LEFT_SHOULDER] + y[:, RIGHT_SHOULDER]) / 2
+    avg_hip_y = (y[:, LEFT_HIP] + y[:, RIGHT_HIP]) / 2
+    not_upright = avg_shoulder_y > avg_hip_y
+
+    stable = np.count_nonzero(vis[:, KEY_INDICES] > 0.8, axis=1) >= 8
+
+    accuracy = (
+        100
+        - 15 * shoulders_off
+        - 10 * hips_off
+        - 20 * not_upright
+        - 10 * ~stable
+    )
+    accuracy = np.where(visible, np.maximum(accuracy, 0), 20)
+
+    return {
+        "visible": visible,
+        "accuracy": accuracy,
+        "shoulder_height_difference": shoulder_diff,
+        "hip_height_difference": hip_diff,
+        "shoulders_off": shoulders_off,
+        "hips_off": hips_off,
+        "not_upright": not_upright,
+        "stable": stable,
+    }
+
+
+def frame_analysis(metrics, i):
+    """Feedback, accuracy and details for frame i of analyze_general_posture_batch() output"""
+    if not metrics["visible"][i]:
+        return {
+            "feedback": "Please ensure your full body is visible in the camera",
+            "accuracy": 20,
+            "details": {"error": "Insufficient landmark visibility"}
+        }
+
+    shoulders_off = bool(metrics["shoulders_off"][i])
+    hips_off = bool(metrics["hips_off"][i])
+    feedback = [
+        "Keep your shoulders level" if shoulders_off else "Good shoulder alignment",
+        "Align your hips properly" if hips_off else "Good hip alignment",
+    ]
+    if metrics["not_upright"][i]:
+        feedback.append("Maintain upright posture")
+    feedback.append("Good pose stability" if metrics["stable"][i] else "Try to stay more stable")
+
+    return {
+        "feedback": " | ".join(feedback),
+        "accuracy": int(metrics["accuracy"][i]),
+        "details": {
+            "shoulder_alignment": {
+                "height_difference": float(metrics["shoulder_height_difference"][i]),
+                "status": "needs_improvement" if shoulders_off else "good"
+            },
+            "hip_alignment": {
+                "height_difference": float(metrics["hip_height_difference"][i]),
+                "status": "needs_improvement" if hips_off else "good"
+            }
+        }
+    }
+
+
+def build_frame_results(landmarks, detected, invalid=(), include_landmarks=False):
+    """Turn batch metrics into per-frame results shaped like /analyze_pose/ responses"""
+    metrics = analyze_general_posture_batch(landmarks)
+    invalid = set(invalid)
+    results = []
+    for i in range(len(landmarks)):
+        if i in invalid:
+            results.append({"success": False, "feedback": "Invalid image format", "accuracy": 0, "landmarks": None})
+            continue
+        if not detected[i]:
+            results.append({
+                "success": False,
+                "feedback": "No pose detected. Please ensure you're fully visible in the camera.",
+                "accuracy": 0,
+                "landmarks": None
+            })
+            continue
+
+        analysis = frame_analysis(metrics, i)
+        results.append({
+            "success": True,
+            "feedback": analysis["feedback"],
+            "accuracy": analysis["accuracy"],
+            "landmarks": Landmarks(landmarks[i]).to_dict() if include_landmarks else None,
+            "detailed_analysis": analysis["details"]
+        })
+    return results
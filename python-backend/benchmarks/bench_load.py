@@ -0,0 +1,215 @@
+"""
+End-to-end load benchmark
+Starts the production app (main:app) locally (or targets --url) and drives /analyze_pose/
+from a thread pool of keep-alive HTTP clients at increasing concurrency, reporting throughput
+and latency percentiles per level
+
+Usage: python benchmarks/bench_load.py [--concurrency 1 4 16] [--duration 15] [--workers 2] [-o load.json]
+"""
+
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from urllib.parse import urlsplit
+
+from fixtures import IMAGES, generate, load_fixture
+from report import metadata, summarize, write_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMAGE = "person_640x480.jpg"
+STARTUP_TIMEOUT = 120.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, env=None):
+    """Run the production app (main:app) with uvicorn in a subprocess; returns the Popen"""
+    server_env = {**os.environ, "POSE_WORKERS": str(workers), **(env or {})}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env,
+        # Own process group, so the pool's worker processes can be cleaned up with it
+        start_new_session=hasattr(os, "killpg")
+    )
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def wait_until_ready(base_url, process=None, timeout=STARTUP_TIMEOUT):
+    """Poll /readyz until every worker has loaded its model (503 while warming up)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/readyz", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{base_url} did not become ready within {timeout:.0f}s")
+
+
+def multipart_body(image_data, filename, fields):
+    """multipart/form-data body with one image file and plain form fields"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n".encode() + image_data + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class LoadClient(threading.Thread):
+    """One keep-alive connection posting frames back to back until the deadline"""
+
+    def __init__(self, url, body, content_type, headers, deadline):
+        super().__init__(daemon=True)
+        self.url = urlsplit(url)
+        self.body = body
+        self.headers = {"Content-Type": content_type, **headers}
+        self.deadline = deadline
+        self.latencies = []
+        self.statuses = Counter()
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.url.hostname, self.url.port, timeout=30)
+
+    def run(self):
+        connection = self._connect()
+        path = self.url.path or "/"
+        if self.url.query:
+            path += "?" + self.url.query
+        while time.monotonic() < self.deadline:
+            start = time.perf_counter()
+            try:
+                connection.request("POST", path, self.body, self.headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                self.statuses[type(e).__name__] += 1
+                connection.close()
+                connection = self._connect()
+                continue
+            self.statuses[str(status)] += 1
+            if status == 200:
+                self.latencies.append((time.perf_counter() - start) * 1000)
+            elif status == 503:
+                # Saturated: honour a short back-off like a real client would
+                time.sleep(0.05)
+        connection.close()
+
+
+def run_level(url, concurrency, duration, image_data, filename, exercise, sessions, binary):
+    """Drive the endpoint with `concurrency` clients for `duration` seconds"""
+    deadline = time.monotonic() + duration
+    clients = []
+    for i in range(concurrency):
+        fields = {"exercise": exercise}
+        if sessions:
+            fields["session_id"] = f"bench-{i}"
+        body, content_type = multipart_body(image_data, filename, fields)
+        headers = {"Accept": "application/x-pose-result"} if binary else {}
+        clients.append(LoadClient(url, body, content_type, headers, deadline))
+
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for client in clients for ms in client.latencies]
+    statuses = sum((client.statuses for client in clients), Counter())
+    return {
+        "name": f"concurrency_{concurrency}",
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "requests": sum(statuses.values()),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "statuses": dict(statuses),
+        **summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency of /analyze_pose/ under load")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one locally)")
+    parser.add_argument("--workers", type=int, default=2, help="POSE_WORKERS for the local server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, choices=sorted(IMAGES))
+    parser.add_argument("--exercise", default="general")
+    parser.add_argument("--sessions", action="store_true",
+                        help="Give each client a session id (tracking path) instead of one-off stills")
+    parser.add_argument("--binary", action="store_true", help="Request the packed binary format")
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    generate()
+    image_data = load_fixture(args.image)
+    process = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"🚀 Starting server on {base_url} with {args.workers} worker(s)...", file=sys.stderr)
+        process = start_server(port, args.workers)
+
+    try:
+        wait_until_ready(base_url, process)
+        url = f"{base_url.rstrip('/')}/analyze_pose/?include_landmarks=true"
+        # Warm every worker's model before anything is timed
+        run_level(url, max(args.concurrency), 2.0, image_data, args.image, args.exercise, args.sessions, args.binary)
+
+        levels = []
+        for concurrency in args.concurrency:
+            print(f"⏱️  {concurrency} concurrent client(s) for {args.duration:.0f}s...", file=sys.stderr)
+            levels.append(run_level(url, concurrency, args.duration, image_data, args.image,
+                                    args.exercise, args.sessions, args.binary))
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report = metadata(
+        "load", url=None if process is not None else base_url, workers=args.workers if process is not None else None,
+        duration_s=args.duration, image=args.image, exercise=args.exercise, sessions=args.sessions,
+        binary=args.binary
+    )
+    report["results"] = {"levels": levels}
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
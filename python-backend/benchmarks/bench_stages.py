@@ -0,0 +1,159 @@
+"""
+Per-stage latency benchmark
+Times each step of the single-frame pipeline in-process (decode, color conversion, MediaPipe,
+landmark extraction, exercise analysis, serialization) for every model complexity
+
+Usage: python benchmarks/bench_stages.py [--complexity 0 1 2] [--repeat 50] [-o stages.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from fixtures import IMAGES, VIDEO, fixture_path, generate, load_fixture
+from report import metadata, summarize, time_call, write_report
+
+from adaptive_pose import create_pose
+from exercises import EXERCISE_NAMES
+from frame_decoder import decode_image
+from landmarks import Landmarks
+from pose_analyzer import PoseAnalyzer
+from pose_codec import encode_result
+from pose_sessions import PoseSession
+
+POSE_IMAGE = "person_640x480.jpg"
+
+
+def load_video_frames(name=VIDEO):
+    """All frames of a fixture video as RGB arrays"""
+    capture = cv2.VideoCapture(fixture_path(name))
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    capture.release()
+    return frames
+
+
+def stage(name, samples, **extra):
+    return {"name": name, **summarize(samples), **extra}
+
+
+def bench_input_stages(repeat):
+    """Decode and color conversion, per fixture image (independent of the model)"""
+    stages = []
+    for name in IMAGES:
+        data = load_fixture(name)
+        samples, rgb = time_call(lambda: decode_image(data), repeat)
+        stages.append(stage(f"decode[{name}]", samples, output_shape=list(rgb.shape)))
+        # What the live loops do: full-resolution BGR decode, then a separate conversion
+        samples, bgr = time_call(lambda: cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), repeat)
+        stages.append(stage(f"decode_full_bgr[{name}]", samples))
+        samples, _ = time_call(lambda: cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), repeat)
+        stages.append(stage(f"color_convert[{name}]", samples))
+    return stages
+
+
+def bench_model(complexity, repeat, image, video_frames, analyzer):
+    """MediaPipe (static and tracking), extraction, analysis and serialization for one model"""
+    try:
+        static_pose = create_pose(static_image_mode=True, model_complexity=complexity)
+        tracking_pose = create_pose(static_image_mode=False, model_complexity=complexity)
+    except Exception as e:
+        # Complexity 0 and 2 are downloaded on first use, which fails offline
+        return {"name": f"complexity_{complexity}", "error": f"{type(e).__name__}: {e}"}
+
+    stages = []
+    samples, results = time_call(lambda: static_pose.process(image), repeat)
+    stages.append(stage("pose_process_static", samples, detected=results.pose_landmarks is not None))
+
+    frames = iter(())
+
+    def next_frame():
+        nonlocal frames
+        frame = next(frames, None)
+        if frame is None:
+            frames = iter(video_frames)
+            frame = next(frames)
+        return frame
+
+    detected = 0
+
+    def track():
+        nonlocal detected
+        result = tracking_pose.process(next_frame())
+        detected += result.pose_landmarks is not None
+        return result
+
+    samples, _ = time_call(track, max(repeat, len(video_frames)), warmup=5)
+    stages.append(stage("pose_process_tracking", samples, detection_rate=round(detected / (len(samples) + 5), 3)))
+    static_pose.close()
+    tracking_pose.close()
+
+    if results.pose_landmarks is None:
+        return {"name": f"complexity_{complexity}", "stages": stages, "error": "No pose detected in fixture"}
+
+    samples, landmarks = time_call(lambda: Landmarks.from_pose_landmarks(results.pose_landmarks), repeat)
+    stages.append(stage("extract_landmarks", samples))
+
+    for exercise in EXERCISE_NAMES:
+        session = PoseSession(f"bench-{exercise}", None)
+        clock = iter(range(10 ** 9))
+        samples, analysis = time_call(
+            lambda: analyzer.analyze_exercise(landmarks, exercise, session, next(clock) / 30), repeat
+        )
+        stages.append(stage(f"analyze[{exercise}]", samples))
+
+        result = {
+            "success": True,
+            "feedback": analysis["feedback"],
+            "accuracy": analysis["accuracy"],
+            "landmarks": landmarks.to_dict(),
+            "detailed_analysis": analysis["details"],
+            "exercise": exercise,
+            "angles": analysis["angles"],
+        }
+        samples, text = time_call(lambda: json.dumps(result), repeat)
+        stages.append(stage(f"serialize_json[{exercise}]", samples, bytes=len(text)))
+        packed = dict(result, landmarks=landmarks.data)
+        samples, data = time_call(lambda: encode_result(packed, exercise), repeat)
+        stages.append(stage(f"serialize_binary[{exercise}]", samples, bytes=len(data)))
+
+    return {"name": f"complexity_{complexity}", "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency of the pose pipeline")
+    parser.add_argument("--complexity", type=int, nargs="+", default=[0, 1, 2], choices=[0, 1, 2])
+    parser.add_argument("--repeat", type=int, default=50, help="Timed iterations per stage")
+    parser.add_argument("-o", "--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    generate()
+    started = time.perf_counter()
+    image = decode_image(load_fixture(POSE_IMAGE))
+    video_frames = load_video_frames()
+    analyzer = PoseAnalyzer()
+
+    models = []
+    for complexity in args.complexity:
+        print(f"⏱️  Model complexity {complexity}...", file=sys.stderr)
+        models.append(bench_model(complexity, args.repeat, image, video_frames, analyzer))
+
+    report = metadata("stages", repeat=args.repeat, complexity=args.complexity, pose_image=POSE_IMAGE, video=VIDEO)
+    report["results"] = {"input": bench_input_stages(args.repeat), "models": models}
+    report["elapsed_s"] = round(time.perf_counter() - started, 1)
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark fixtures
+Procedurally drawn person images and a squat video that MediaPipe detects, so benchmarks run
+offline without recorded footage. The generated files are checked in under fixtures/;
+run this script to regenerate them.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+IMAGES = {
+    "person_640x480.jpg": (640, 480, True),
+    "person_1280x720.jpg": (1280, 720, True),
+    "person_1920x1080.jpg": (1920, 1080, True),
+    "empty_640x480.jpg": (640, 480, False),
+}
+VIDEO = "squat_320x240.mp4"
+VIDEO_FPS = 15
+VIDEO_REPS = 3
+VIDEO_REP_SECONDS = 2.0
+
+SKIN = (150, 180, 225)
+SHIRT = (60, 60, 170)
+PANTS = (80, 50, 30)
+
+
+def draw_person(width=640, height=480, depth=0.0, person=True):
+    """BGR frame of a front-facing figure; depth 0 = standing, 1 = bottom of a squat"""
+    image = np.full((height, width, 3), (200, 210, 220), np.uint8)
+    cv2.rectangle(image, (0, int(height * 0.85)), (width, height), (90, 110, 130), -1)
+    if not person:
+        return image
+
+    s = height / 480
+    cx = width // 2
+    drop = 60 * depth
+
+    def p(dx, y):
+        return (cx + int(dx * s), int(y * s))
+
+    head = p(0, 70 + drop)
+    left_shoulder, right_shoulder = p(-45, 120 + drop), p(45, 120 + drop)
+    left_hip, right_hip = p(-28, 250 + drop), p(28, 250 + drop)
+    left_elbow, right_elbow = p(-60, 190 + drop), p(60, 190 + drop)
+    left_wrist, right_wrist = p(-65 - 20 * depth, 255 + drop * 0.5), p(65 + 20 * depth, 255 + drop * 0.5)
+    left_knee, right_knee = p(-32 - 55 * depth, 330 + drop * 0.3), p(32 + 55 * depth, 330 + drop * 0.3)
+    left_ankle, right_ankle = p(-34, 405), p(34, 405)
+
+    cv2.fillPoly(image, [np.array([left_shoulder, right_shoulder, right_hip, left_hip])], SHIRT)
+    limbs = [
+        (left_shoulder, left_elbow, SHIRT, 22), (left_elbow, left_wrist, SKIN, 16),
+        (right_shoulder, right_elbow, SHIRT, 22), (right_elbow, right_wrist, SKIN, 16),
+        (left_hip, left_knee, PANTS, 28), (left_knee, left_ankle, PANTS, 24),
+        (right_hip, right_knee, PANTS, 28), (right_knee, right_ankle, PANTS, 24),
+    ]
+    for a, b, color, thickness in limbs:
+        cv2.line(image, a, b, color, max(1, int(thickness * s)))
+    cv2.line(image, p(0, 105 + drop), p(0, 125 + drop), SKIN, max(1, int(20 * s)))
+    cv2.ellipse(image, head, (int(28 * s), int(36 * s)), 0, 0, 360, SKIN, -1)
+    cv2.ellipse(image, (head[0], head[1] - int(20 * s)), (int(29 * s), int(20 * s)), 0, 180, 360, (30, 30, 40), -1)
+    for dx in (-10, 10):
+        cv2.circle(image, (head[0] + int(dx * s), head[1] - int(5 * s)), max(1, int(3 * s)), (40, 30, 20), -1)
+    cv2.line(image, (head[0] - int(8 * s), head[1] + int(15 * s)),
+             (head[0] + int(8 * s), head[1] + int(15 * s)), (60, 60, 150), max(1, int(2 * s)))
+    for ankle in (left_ankle, right_ankle):
+        cv2.ellipse(image, (ankle[0], ankle[1] + int(8 * s)), (int(18 * s), int(8 * s)), 0, 0, 360, (20, 20, 20), -1)
+    return image
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def load_fixture(name):
+    """Raw bytes of a checked-in fixture"""
+    with open(fixture_path(name), "rb") as f:
+        return f.read()
+
+
+def generate(force=False):
+    """Write any missing fixtures (all of them with force=True)"""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, (width, height, person) in IMAGES.items():
+        path = fixture_path(name)
+        if force or not os.path.exists(path):
+            cv2.imwrite(path, draw_person(width, height, person=person), [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+    path = fixture_path(VIDEO)
+    if force or not os.path.exists(path):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), VIDEO_FPS, (320, 240))
+        frames = int(VIDEO_REPS * VIDEO_REP_SECONDS * VIDEO_FPS)
+        for i in range(frames):
+            depth = 0.5 - 0.5 * np.cos(2 * np.pi * i / (VIDEO_REP_SECONDS * VIDEO_FPS))
+            writer.write(draw_person(320, 240, depth))
+        writer.release()
+
+
+if __name__ == "__main__":
+    generate(force=True)
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        print(f"{name}: {os.path.getsize(fixture_path(name))} bytes")
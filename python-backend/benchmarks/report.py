@@ -0,0 +1,158 @@
+"""
+Benchmark reports
+Shared timing statistics, run metadata and JSON output for the benchmark scripts, plus a
+compare command that diffs two result files
+
+Usage: python benchmarks/report.py BASELINE.json CANDIDATE.json [--threshold 10]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+# min/max are single samples and too noisy to gate on
+COMPARED_LATENCIES = ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+
+
+def summarize(samples_ms):
+    """mean/min/max and p50/p95/p99 of a list of durations in milliseconds"""
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms, dtype=np.float64)
+    summary = {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{p}_ms"] = round(float(value), 3)
+    return summary
+
+
+def time_call(fn, repeat, warmup=3):
+    """Run fn warmup + repeat times; returns (per-call durations in ms, last result)"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _version(module):
+    try:
+        return __import__(module).__version__
+    except Exception:
+        return None
+
+
+def metadata(benchmark, **config):
+    """What was run, where, and against which commit, so result files can be compared"""
+    return {
+        "benchmark": benchmark,
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "versions": {name: _version(name) for name in ("cv2", "mediapipe", "numpy")},
+        "config": config,
+    }
+
+
+def write_report(report, output=None):
+    """Print the report as JSON, or write it to output and say where"""
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Results written to {output}")
+    else:
+        print(text)
+
+
+def _flatten(value, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}; lists of results are keyed by their "name" field"""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list) and all(isinstance(v, dict) and "name" in v for v in value):
+        items = ((v["name"], v) for v in value)
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        if key in ("config", "versions"):
+            continue
+        flat.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def compare(baseline, candidate, threshold=10.0):
+    """Rows of (metric, baseline, candidate, change %) for the timing and throughput metrics
+
+    A metric is flagged when it gets worse by more than threshold percent:
+    higher for latencies, lower for throughput.
+    """
+    old, new = _flatten(baseline.get("results", {})), _flatten(candidate.get("results", {}))
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        lower_is_better = metric.endswith(COMPARED_LATENCIES)
+        if not (lower_is_better or metric.endswith("throughput_rps")) or not old[metric]:
+            continue
+        change = (new[metric] - old[metric]) / old[metric] * 100
+        regressed = change > threshold if lower_is_better else change < -threshold
+        rows.append((metric, old[metric], new[metric], round(change, 1), regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent change that counts as a regression (default 10)")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    if baseline.get("benchmark") != candidate.get("benchmark"):
+        sys.exit(f"❌ Different benchmarks: {baseline.get('benchmark')} vs {candidate.get('benchmark')}")
+
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')}")
+    if baseline.get("config") != candidate.get("config") or baseline.get("cpu_count") != candidate.get("cpu_count"):
+        print("⚠️  The runs used different settings or machines; differences may not be meaningful")
+    rows = compare(baseline, candidate, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for metric, old, new, change, regressed in rows:
+        print(f"{'❌' if regressed else '  '} {metric:<{width}} {old:>10} {new:>10} {change:+7.1f}%")
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} regression(s) over {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
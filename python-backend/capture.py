@@ -0,0 +1,227 @@
+"""
+Threaded frame capture
+A producer thread keeps only the newest camera frame and reconnects with backoff on stream loss
+"""
+
+import os
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+_SYNTHETIC = re.compile(r"^synthetic://(?:(\d+)x(\d+))?(?:@([\d.]+))?$")
+
+
+class LatestSlot:
+    """Thread-safe one-slot buffer: put() replaces any item not yet taken"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._seq += 1
+            self._cond.notify_all()
+
+    def take(self, timeout=None):
+        """Wait for an item and return (seq, item); (None, None) on timeout or close"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None or self._closed, timeout):
+                return None, None
+            if self._item is None:
+                return None, None
+            item, self._item = self._item, None
+            return self._seq, item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SyntheticCapture:
+    """cv2.VideoCapture stand-in producing generated frames at a fixed rate
+
+    Source syntax: synthetic://WIDTHxHEIGHT@FPS (e.g. synthetic://640x480@15).
+    Used to exercise the capture and scheduling paths without cameras.
+    """
+
+    def __init__(self, width=640, height=480, fps=15.0):
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps
+        self._next = time.monotonic()
+        self._index = 0
+        self._opened = True
+
+    @classmethod
+    def from_url(cls, url):
+        match = _SYNTHETIC.match(url)
+        if match is None:
+            raise ValueError(f"Invalid synthetic source '{url}', expected synthetic://WIDTHxHEIGHT@FPS")
+        width, height, fps = match.groups()
+        return cls(int(width or 640), int(height or 480), float(fps or 15.0))
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic())
+
+        # Gradient background with a bar sweeping across, so consecutive frames differ
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame[:] = np.linspace(40, 200, self.width, dtype=np.uint8)[None, :, None]
+        x = (self._index * 8) % self.width
+        frame[:, x:x + 16] = (0, 255, 0)
+        self._index += 1
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+
+class PacedCapture:
+    """Delivers a video file's frames at its native frame rate, like a live camera"""
+
+    def __init__(self, capture):
+        self.capture = capture
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        self.interval = 1.0 / fps if fps > 0 else 1.0 / 30
+        self._next = time.monotonic()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic())
+        return self.capture.read()
+
+    def release(self):
+        self.capture.release()
+
+
+def open_capture(source):
+    """Open a camera index, RTSP/HTTP URL, video file (played in real time) or synthetic source"""
+    if isinstance(source, str):
+        if source.startswith("synthetic://"):
+            return SyntheticCapture.from_url(source)
+        if source.isdigit():
+            source = int(source)
+        elif os.path.isfile(source):
+            # A file read to the end counts as a lost stream, so it loops via reconnect
+            return PacedCapture(cv2.VideoCapture(source))
+    return cv2.VideoCapture(source)
+
+
+class LatestFrameReader:
+    """Grabs frames from a cv2.VideoCapture source on its own thread
+
+    Consumers always get the newest frame, so a slow consumer never lets the
+    decoder's buffer (and latency) grow. Lost streams are reopened with
+    exponential backoff.
+    """
+
+    def __init__(self, source, name="capture", initial_backoff=1.0, max_backoff=30.0,
+                 capture_factory=open_capture):
+        self.source = source
+        self.name = name
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.capture_factory = capture_factory
+        self.frames = LatestSlot()
+        self.connected = False
+        self.frames_read = 0
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def read(self, timeout=1.0):
+        """Newest frame not yet returned, or None if nothing arrived within timeout"""
+        _, frame = self.frames.take(timeout)
+        return frame
+
+    def _open(self):
+        cap = self.capture_factory(self.source)
+        if cap is not None and cap.isOpened():
+            return cap
+        if cap is not None:
+            cap.release()
+        return None
+
+    def _run(self):
+        backoff = self.initial_backoff
+        cap = None
+        try:
+            while not self._stop.is_set():
+                if cap is None:
+                    cap = self._open()
+                    if cap is None:
+                        print(f"❌ [{self.name}] Could not open stream, retrying in {backoff:.0f}s")
+                        self._stop.wait(backoff)
+                        backoff = min(backoff * 2, self.max_backoff)
+                        continue
+                    if self.frames_read:
+                        self.reconnects += 1
+                        print(f"🔗 [{self.name}] Reconnected")
+                    self.connected = True
+
+                success, frame = cap.read()
+                if not success:
+                    print(f"❌ [{self.name}] Frame not received, reconnecting in {backoff:.0f}s")
+                    self.connected = False
+                    cap.release()
+                    cap = None
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+
+                # Only a delivered frame resets the backoff, so a stream that opens
+                # and immediately fails does not spin
+                backoff = self.initial_backoff
+                self.frames_read += 1
+                self.frames.put(frame)
+        finally:
+            self.connected = False
+            if cap is not None:
+                cap.release()
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames.dropped,
+            "reconnects": self.reconnects,
+        }
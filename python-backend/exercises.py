@@ -0,0 +1,285 @@
+"""
+Streaming exercise analyzers
+Per-session state machines for rep counting, hold timing and tempo with O(1) work per frame
+"""
+
+import math
+
+from landmarks import LEFT_ANKLE, LEFT_HIP, LEFT_SHOULDER, RIGHT_ANKLE, RIGHT_HIP, RIGHT_SHOULDER, VIS, X, Y
+from template_matching import RepBuffer, default_index
+
+EXERCISE_NAMES = ("general", "plank", "squat", "pushup")
+
+# Longer gaps between frames (lost pose, dropped frames) are not counted as hold time
+MAX_FRAME_GAP = 1.0
+# Reps less similar than this to the closest reference template get feedback on the worst joint
+MIN_TEMPLATE_SIMILARITY = 70
+# Followed by the worst matching joint, e.g. "left knee"
+TEMPLATE_FEEDBACK = "Rep differs from reference at the "
+
+
+def side_mean(angles, joint):
+    """Mean of the left/right angle for a joint, ignoring sides that are not visible"""
+    values = [v for v in (angles.get("left_" + joint), angles.get("right_" + joint))
+              if v is not None and not math.isnan(v)]
+    return sum(values) / len(values) if values else math.nan
+
+
+def side_difference(angles, joint):
+    left, right = angles.get("left_" + joint, math.nan), angles.get("right_" + joint, math.nan)
+    return abs(left - right) if not (math.isnan(left) or math.isnan(right)) else 0.0
+
+
+class RepCounter:
+    """Angle-threshold state machine with hysteresis
+
+    A rep is the angle dropping below down_angle and coming back above
+    up_angle. Dips that return to the top without reaching down_angle are
+    counted as partial reps.
+    """
+
+    def __init__(self, down_angle, up_angle, partial_margin=20):
+        self.down_angle = down_angle
+        self.up_angle = up_angle
+        self.partial_margin = partial_margin
+        self.phase = "up"
+        self.reps = 0
+        self.partial_reps = 0
+        self.last_top = None
+        self.last_bottom = None
+        self.lowest = math.inf
+        self.last_depth = None
+        self.eccentric = None
+        self.concentric = None
+
+    def update(self, angle, timestamp):
+        """Feed one angle; returns "rep", "partial" or None"""
+        if math.isnan(angle):
+            return None
+        self.lowest = min(self.lowest, angle)
+
+        if self.phase == "up":
+            if angle >= self.up_angle:
+                event = None
+                if self.lowest < self.up_angle - self.partial_margin:
+                    self.partial_reps += 1
+                    event = "partial"
+                self.last_top = timestamp
+                self.lowest = angle
+                return event
+            if angle <= self.down_angle:
+                self.phase = "down"
+                self.eccentric = timestamp - (self.last_top if self.last_top is not None else timestamp)
+                self.last_bottom = timestamp
+            return None
+
+        if angle <= self.down_angle:
+            self.last_bottom = timestamp
+        elif angle >= self.up_angle:
+            self.phase = "up"
+            self.reps += 1
+            self.concentric = timestamp - self.last_bottom
+            self.last_depth = self.lowest
+            self.last_top = timestamp
+            self.lowest = angle
+            return "rep"
+        return None
+
+    def details(self):
+        return {
+            "reps": self.reps,
+            "partial_reps": self.partial_reps,
+            "phase": self.phase,
+            "last_rep_depth": None if self.last_depth is None else round(self.last_depth, 1),
+            "tempo": {
+                "eccentric": None if self.eccentric is None else round(self.eccentric, 2),
+                "concentric": None if self.concentric is None else round(self.concentric, 2)
+            }
+        }
+
+
+class RepTemplates:
+    """Matches each completed rep against the reference templates (see template_matching)
+
+    Frames are only buffered when a template index is configured, so without
+    one this costs nothing.
+    """
+
+    def __init__(self, exercise):
+        self.exercise = exercise
+        self.index = default_index()
+        self.buffer = RepBuffer() if self.index is not None else None
+        self.last_match = None
+
+    def append(self, landmarks, timestamp):
+        if self.buffer is not None:
+            self.buffer.append(landmarks, timestamp)
+
+    def match(self, start, feedback):
+        """Match the frames since start; returns the accuracy penalty and adds feedback"""
+        if self.buffer is None or start is None:
+            return 0
+        match = self.last_match = self.index.match(self.buffer.since(start), self.exercise)
+        if match is None:
+            return 0
+        if match["similarity"] < MIN_TEMPLATE_SIMILARITY and match["worst_joint"]:
+            feedback.append(TEMPLATE_FEEDBACK + match["worst_joint"].replace("_", " "))
+        return round(100 - match["similarity"])
+
+    def details(self, details):
+        if self.last_match is not None:
+            details["template_match"] = self.last_match
+        return details
+
+
+def _result(feedback, accuracy, details):
+    return {
+        "feedback": " | ".join(feedback),
+        "accuracy": max(0, accuracy),
+        "details": details
+    }
+
+
+def _not_visible(details):
+    return {
+        "feedback": "Please ensure your full body is visible in the camera",
+        "accuracy": 20,
+        "details": dict(details, error="Insufficient landmark visibility")
+    }
+
+
+class SquatState:
+    def __init__(self):
+        self.counter = RepCounter(down_angle=100, up_angle=160)
+        self.templates = RepTemplates("squat")
+
+    def update(self, landmarks, angles, timestamp):
+        knee = side_mean(angles, "knee")
+        if math.isnan(knee):
+            return _not_visible(self.templates.details(self.counter.details()))
+
+        self.templates.append(landmarks, timestamp)
+        top = self.counter.last_top
+        event = self.counter.update(knee, timestamp)
+        feedback, accuracy = [], 100
+
+        if event == "rep":
+            feedback.append(f"Rep {self.counter.reps} complete")
+            if self.counter.eccentric is not None and self.counter.eccentric < 1.0:
+                feedback.append("Slow down on the way down")
+                accuracy -= 10
+            accuracy -= self.templates.match(top, feedback)
+        elif event == "partial":
+            feedback.append("Squat deeper")
+            accuracy -= 20
+
+        if side_mean(angles, "hip") < 50:
+            feedback.append("Keep your chest up")
+            accuracy -= 15
+        if side_difference(angles, "knee") > 20:
+            feedback.append("Keep your weight even on both legs")
+            accuracy -= 10
+
+        if not feedback:
+            feedback.append("Good squat form")
+        return _result(feedback, accuracy, self.templates.details(self.counter.details()))
+
+
+class PushupState:
+    def __init__(self):
+        self.counter = RepCounter(down_angle=90, up_angle=155)
+        self.templates = RepTemplates("pushup")
+
+    def update(self, landmarks, angles, timestamp):
+        elbow = side_mean(angles, "elbow")
+        if math.isnan(elbow):
+            return _not_visible(self.templates.details(self.counter.details()))
+
+        self.templates.append(landmarks, timestamp)
+        top = self.counter.last_top
+        event = self.counter.update(elbow, timestamp)
+        feedback, accuracy = [], 100
+
+        if event == "rep":
+            feedback.append(f"Rep {self.counter.reps} complete")
+            accuracy -= self.templates.match(top, feedback)
+        elif event == "partial":
+            feedback.append("Lower your chest further")
+            accuracy -= 20
+
+        if side_mean(angles, "body_line") < 160:
+            feedback.append("Keep your body in a straight line")
+            accuracy -= 20
+
+        if not feedback:
+            feedback.append("Good push-up form")
+        return _result(feedback, accuracy, self.templates.details(self.counter.details()))
+
+
+class PlankState:
+    def __init__(self):
+        self.hold_time = 0.0
+        self.current_hold = 0.0
+        self.best_hold = 0.0
+        self.last_timestamp = None
+
+    def update(self, landmarks, angles, timestamp):
+        dt = 0.0
+        if self.last_timestamp is not None and timestamp - self.last_timestamp <= MAX_FRAME_GAP:
+            dt = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+
+        body_line = side_mean(angles, "body_line")
+        if math.isnan(body_line):
+            self.current_hold = 0.0
+            return _not_visible(self.details())
+
+        feedback, accuracy = [], 100
+        in_form = body_line >= 165
+        if not in_form:
+            feedback.append("Lower your hips" if hips_above_line(landmarks) else "Lift your hips")
+            accuracy -= 25 if body_line < 150 else 15
+
+        shoulder = side_mean(angles, "shoulder")
+        if not math.isnan(shoulder) and not 60 <= shoulder <= 120:
+            feedback.append("Stack your shoulders over your elbows")
+            accuracy -= 10
+
+        if in_form:
+            self.hold_time += dt
+            self.current_hold += dt
+            self.best_hold = max(self.best_hold, self.current_hold)
+            if not feedback:
+                feedback.append("Great plank, hold it")
+        else:
+            self.current_hold = 0.0
+
+        return _result(feedback, accuracy, self.details())
+
+    def details(self):
+        return {
+            "hold_time": round(self.hold_time, 2),
+            "current_hold": round(self.current_hold, 2),
+            "best_hold": round(self.best_hold, 2)
+        }
+
+
+def hips_above_line(landmarks):
+    """Whether the hip sits above the shoulder-ankle line (image y grows downwards)"""
+    data = landmarks.data
+    side = (LEFT_SHOULDER, LEFT_HIP, LEFT_ANKLE)
+    if data[RIGHT_HIP, VIS] > data[LEFT_HIP, VIS]:
+        side = (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_ANKLE)
+    shoulder, hip, ankle = data[side[0]], data[side[1]], data[side[2]]
+    span = ankle[X] - shoulder[X]
+    if abs(span) < 1e-6:
+        return hip[Y] < (shoulder[Y] + ankle[Y]) / 2
+    line_y = shoulder[Y] + (ankle[Y] - shoulder[Y]) * (hip[X] - shoulder[X]) / span
+    return hip[Y] < line_y
+
+
+EXERCISE_STATES = {
+    "plank": PlankState,
+    "squat": SquatState,
+    "pushup": PushupState,
+}
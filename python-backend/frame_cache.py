@@ -0,0 +1,110 @@
+"""
+Result cache for duplicate and near-duplicate frames
+Keyed by a difference hash of the decoded image (or of the session's person crop), scoped per session
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 0.5
+# Exact matches only by default: a person moving slowly changes only a few bits, and reusing
+# their landmarks freezes the pose mid-rep
+DEFAULT_MAX_DISTANCE = 0
+# Hash grid side: size x size gradient bits
+DEFAULT_HASH_SIZE = 32
+# Near-duplicate lookups only compare against a scope's most recent hashes
+NEAR_CANDIDATES = 8
+
+
+def frame_hash(image, window=None, size=DEFAULT_HASH_SIZE):
+    """size x size-bit dHash: sign of horizontal gradients on a grayscale thumbnail of an RGB frame
+
+    With window=(x0, y0, x1, y1) only that region is hashed (e.g. the
+    session's ROI), so the thumbnail's resolution goes to the person rather
+    than the background.
+    """
+    if window is not None:
+        x0, y0, x1, y1 = window
+        image = image[y0:y1, x0:x1]
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(image, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class FrameCache:
+    """Size-bounded LRU with TTL; hashes within max_distance bits count as hits"""
+
+    def __init__(self, max_entries=None, ttl=None, max_distance=None):
+        self.max_entries = max_entries or int(os.getenv("POSE_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        self.ttl = ttl or float(os.getenv("POSE_CACHE_TTL", DEFAULT_TTL))
+        self.max_distance = max_distance if max_distance is not None else int(
+            os.getenv("POSE_CACHE_MAX_DISTANCE", DEFAULT_MAX_DISTANCE)
+        )
+        # (scope, hash) -> (stored_at, value), least recently used first
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, scope, key, now=None):
+        """Return (True, value) on a hit, (False, None) on a miss"""
+        now = now if now is not None else time.monotonic()
+        entry_key = (scope, key)
+        entry = self._entries.get(entry_key)
+        if entry is not None and now - entry[0] <= self.ttl:
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return True, entry[1]
+
+        if self.max_distance > 0:
+            checked = 0
+            for (entry_scope, entry_hash), (stored_at, value) in reversed(self._entries.items()):
+                if entry_scope != scope:
+                    continue
+                if now - stored_at > self.ttl or checked >= NEAR_CANDIDATES:
+                    break
+                checked += 1
+                if bin(entry_hash ^ key).count("1") <= self.max_distance:
+                    self._entries.move_to_end((entry_scope, entry_hash))
+                    self.near_hits += 1
+                    return True, value
+
+        self.misses += 1
+        return False, None
+
+    def put(self, scope, key, value, now=None):
+        now = now if now is not None else time.monotonic()
+        entry_key = (scope, key)
+        self._entries[entry_key] = (now, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def drop_scope(self, scope):
+        """Forget every entry of one scope (e.g. when its session ends)"""
+        for entry_key in [k for k in self._entries if k[0] == scope]:
+            del self._entries[entry_key]
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0
+        }
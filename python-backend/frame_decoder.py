@@ -0,0 +1,119 @@
+"""
+Fast-path frame decoding
+Reduced-resolution JPEG decoding straight to RGB, plus raw RGB/YUV buffers that skip decoding
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# MediaPipe runs on a ~256px input, so decoding much larger frames only costs CPU
+DEFAULT_MAX_SIDE = 640
+
+# OpenCV >= 4.10 can decode straight to RGB; older builds need a cvtColor afterwards
+IMREAD_COLOR_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+REDUCED_GRAYSCALE = {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+                     8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+REDUCED_COLOR = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+# Raw pixel formats: bytes per pixel (as a fraction for 4:2:0 YUV) and conversion to RGB
+RAW_FORMATS = {
+    "rgb24": (3, None),
+    "bgr24": (3, cv2.COLOR_BGR2RGB),
+    "i420": (1.5, cv2.COLOR_YUV2RGB_I420),
+    "nv12": (1.5, cv2.COLOR_YUV2RGB_NV12),
+    "nv21": (1.5, cv2.COLOR_YUV2RGB_NV21),
+}
+
+# JPEG start-of-frame markers carrying the image size (excludes DHT, JPG and DAC)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image"""
+
+
+def jpeg_dimensions(data):
+    """(width, height) read from a JPEG header without decoding, or None"""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    offset = 2
+    size = len(data)
+    while offset + 9 < size:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = (data[offset + 5] << 8) | data[offset + 6]
+            width = (data[offset + 7] << 8) | data[offset + 8]
+            return width, height
+        segment_length = (data[offset + 2] << 8) | data[offset + 3]
+        offset += 2 + segment_length
+    return None
+
+
+def reduction_factor(width, height, max_side):
+    """Largest JPEG DCT scaling (1, 2, 4, 8) that keeps the long side >= max_side"""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side // factor >= max_side:
+            return factor
+    return 1
+
+
+def decode_image(image_data, max_side=None):
+    """Decode encoded image bytes (JPG, PNG) into an RGB array
+
+    JPEGs larger than max_side are decoded at 1/2, 1/4 or 1/8 resolution by
+    the codec itself, which is much cheaper than a full decode plus resize.
+    """
+    max_side = max_side or int(os.getenv("POSE_DECODE_MAX_SIDE", DEFAULT_MAX_SIDE))
+    nparr = np.frombuffer(image_data, np.uint8)
+
+    factor = 1
+    dimensions = jpeg_dimensions(image_data)
+    if dimensions is not None:
+        factor = reduction_factor(*dimensions, max_side)
+
+    if IMREAD_COLOR_RGB is not None:
+        flags = (IMREAD_COLOR_RGB | REDUCED_GRAYSCALE[factor]) if factor > 1 else IMREAD_COLOR_RGB
+        image = cv2.imdecode(nparr, flags)
+    else:
+        image = cv2.imdecode(nparr, REDUCED_COLOR[factor] if factor > 1 else cv2.IMREAD_COLOR)
+        if image is not None:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    if image is None:
+        raise InvalidImageError("Invalid image format")
+    return image
+
+
+def decode_raw(data, width, height, pixel_format="rgb24"):
+    """Wrap a raw pixel buffer as an RGB array (no copy for rgb24)"""
+    if pixel_format not in RAW_FORMATS:
+        raise InvalidImageError(f"Unsupported pixel format '{pixel_format}'")
+    bytes_per_pixel, conversion = RAW_FORMATS[pixel_format]
+    if width <= 0 or height <= 0 or len(data) != int(width * height * bytes_per_pixel):
+        raise InvalidImageError("Raw frame size does not match width/height/pixel format")
+    if bytes_per_pixel != 3 and (width % 2 or height % 2):
+        raise InvalidImageError("YUV 4:2:0 frames need even width and height")
+
+    buffer = np.frombuffer(data, np.uint8)
+    if conversion is None:
+        return buffer.reshape(height, width, 3)
+    if bytes_per_pixel == 3:
+        return cv2.cvtColor(buffer.reshape(height, width, 3), conversion)
+    # Planar/semi-planar 4:2:0: luma plane followed by chroma, height * 3/2 rows
+    return cv2.cvtColor(buffer.reshape(height * 3 // 2, width), conversion)
+
+
+def decode_frame(data, raw=None):
+    """Decode a frame: raw is None for encoded images or (width, height, pixel_format)"""
+    if raw is None:
+        return decode_image(data)
+    return decode_raw(data, *raw)
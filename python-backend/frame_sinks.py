@@ -0,0 +1,224 @@
+"""
+Output sinks for the live detectors
+Annotated frames and landmarks go to an MJPEG HTTP stream, an mp4 file or a JSON-lines log
+instead of (or in addition to) a GUI window
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from landmarks import LANDMARK_NAMES
+
+DEFAULT_MJPEG_QUALITY = 80
+DEFAULT_VIDEO_FPS = 15.0
+# Frames a sink may fall behind by before the oldest ones are dropped
+DEFAULT_MAX_PENDING = 2
+
+
+class MJPEGSink:
+    """Serves the newest frame as multipart/x-mixed-replace JPEG on http://host:port/"""
+
+    def __init__(self, host="0.0.0.0", port=8090, quality=DEFAULT_MJPEG_QUALITY):
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._server = None
+
+    def open(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                seq = 0
+                try:
+                    while True:
+                        with sink._cond:
+                            if not sink._cond.wait_for(lambda: sink._seq != seq or sink._server is None, 5):
+                                continue
+                            if sink._server is None:
+                                return
+                            seq, jpeg = sink._seq, sink._jpeg
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mjpeg-server", daemon=True).start()
+        print(f"📡 MJPEG stream on http://{self.host}:{self.port}/")
+
+    def write(self, frame, landmarks, info):
+        # Encoded once per frame and shared by every connected client
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if ok:
+            with self._cond:
+                self._jpeg = jpeg.tobytes()
+                self._seq += 1
+                self._cond.notify_all()
+
+    def close(self):
+        server, self._server = self._server, None
+        with self._cond:
+            self._cond.notify_all()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+class VideoFileSink:
+    """Writes annotated frames to a video file (mp4v); size is taken from the first frame"""
+
+    def __init__(self, path, fps=DEFAULT_VIDEO_FPS, fourcc="mp4v"):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self._writer = None
+
+    def open(self):
+        pass
+
+    def write(self, frame, landmarks, info):
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                           self.fps, (width, height))
+            if not self._writer.isOpened():
+                raise IOError(f"Could not open video writer for {self.path}")
+            print(f"💾 Recording to {self.path}")
+        self._writer.write(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class JsonLinesSink:
+    """Appends one JSON object per frame: timestamp, all 33 landmark rows (or null) and info"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps({"landmarks": LANDMARK_NAMES, "columns": ["x", "y", "z", "visibility"]}) + "\n")
+        print(f"📝 Logging landmarks to {self.path}")
+
+    def write(self, frame, landmarks, info):
+        # float64 before rounding, so the JSON holds 4 decimals rather than float32 noise
+        rows = np.round(landmarks.data.astype(np.float64), 4).tolist() if landmarks is not None else None
+        record = {"landmarks": rows, **info}
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ThreadedSink:
+    """Runs a sink on its own thread behind a small bounded buffer
+
+    submit() never blocks the detector loop: when the sink falls more than
+    max_pending frames behind, the oldest pending frame is dropped.
+    """
+
+    def __init__(self, sink, max_pending=DEFAULT_MAX_PENDING):
+        self.sink = sink
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.sink.open()
+        self._thread = threading.Thread(target=self._run, name=type(sink).__name__, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, landmarks=None, info=None):
+        with self._cond:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append((frame, landmarks, info or {}))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                item = self._pending.popleft()
+            try:
+                self.sink.write(*item)
+                self.written += 1
+            except Exception as e:
+                print(f"Sink error ({type(self.sink).__name__}): {e}")
+
+    def close(self):
+        """Flush what is pending, then close the sink"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=10)
+        self.sink.close()
+
+    def stats(self):
+        return {"sink": type(self.sink).__name__, "written": self.written, "dropped": self.dropped}
+
+
+def create_sink(spec, fps=DEFAULT_VIDEO_FPS):
+    """Sink from a spec string: mjpeg://HOST:PORT, *.jsonl, or a video file path (*.mp4, *.avi)"""
+    if spec.startswith("mjpeg://"):
+        host, _, port = spec[len("mjpeg://"):].rpartition(":")
+        return MJPEGSink(host or "0.0.0.0", int(port or 8090))
+    if spec.endswith((".jsonl", ".ndjson")):
+        return JsonLinesSink(spec)
+    if spec.endswith((".mp4", ".avi", ".mkv")):
+        return VideoFileSink(spec, fps)
+    raise ValueError(f"Unknown sink '{spec}', expected mjpeg://HOST:PORT, a .jsonl file or a video file")
+
+
+def add_output_arguments(parser):
+    """--headless, repeatable --sink and --render-scale options shared by the detector scripts"""
+    parser.add_argument("--headless", action="store_true", help="Do not open a window (servers)")
+    parser.add_argument("--sink", action="append", default=[], dest="sinks",
+                        help="Output sink, repeatable: mjpeg://HOST:PORT, out.mp4 or landmarks.jsonl")
+    parser.add_argument("--render-scale", type=float, default=1.0,
+                        help="Draw and output annotated frames at this fraction of the source resolution")
+
+
+def open_sinks(specs, fps=DEFAULT_VIDEO_FPS):
+    return [ThreadedSink(create_sink(spec, fps)) for spec in specs]
+
+
+def publish(sinks, frame, landmarks=None, info=None):
+    """Hand one annotated frame to every sink, stamping it with the wall-clock time"""
+    info = {"t": round(time.time(), 3), **(info or {})}
+    for sink in sinks:
+        sink.submit(frame, landmarks, info)
+
+
+def close_sinks(sinks):
+    for sink in sinks:
+        sink.close()
+        print(f"📊 {sink.stats()}")
@@ -0,0 +1,399 @@
+"""
+Inference worker pool
+Runs MediaPipe pose analysis in worker processes so the API event loop stays responsive
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes default to one per core, admission queue to a few frames per worker
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_QUEUE_PER_WORKER = 4
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the admission queue is full and a frame is rejected"""
+
+
+class WorkerUnavailableError(PoolSaturatedError):
+    """Raised when a task's worker died and the retry on its replacement failed too
+
+    Handled like saturation (503 with Retry-After): the shard is being respawned.
+    """
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a worker died while running this very task
+
+    Such a task is not retried: if its input is what crashed the worker, a
+    retry would only take down the replacement as well.
+    """
+
+
+# Per-process engine and its analyzer, created once by the worker initializer
+_worker_engine = None
+_worker_analyzer = None
+_worker_init_seconds = None
+# Shared with the parent: id of the task this worker is running, 0 between tasks
+_worker_running = None
+# Video chunks being read in steps, by chunk key (see read_video_chunk)
+_worker_chunks = {}
+
+# Blank frame used to load the model during warm-up
+WARMUP_FRAME_SIZE = 256
+
+
+def _init_worker(running=None):
+    """Build this worker's own PoseEngine (PoseAnalyzer and MediaPipe Pose instances)"""
+    global _worker_engine, _worker_analyzer, _worker_init_seconds, _worker_running
+    start = time.perf_counter()
+    _worker_running = running
+    from pose_engine import PoseEngine
+    from pose_metrics import REGISTRY
+    _worker_engine = PoseEngine()
+    _worker_analyzer = _worker_engine.analyzer
+    _worker_analyzer.register_metrics(REGISTRY)
+    _worker_init_seconds = time.perf_counter() - start
+
+
+def _warmup():
+    """Worker task: load the models and run one blank frame, so the first real request does not"""
+    import numpy as np
+    from adaptive_pose import preload_models
+    start = time.perf_counter()
+    preload_models()
+    _worker_analyzer.get_pose().process(np.zeros((WARMUP_FRAME_SIZE, WARMUP_FRAME_SIZE, 3), dtype=np.uint8))
+    return {
+        "pid": os.getpid(),
+        "import_s": round(_worker_init_seconds, 3),
+        "model_load_s": round(time.perf_counter() - start, 3),
+    }
+
+
+def _run_task(task_id, fn, *args):
+    """Run a task, marking it as this worker's current one so a crash can be traced back to it"""
+    _worker_running.value = task_id
+    try:
+        return fn(*args)
+    finally:
+        _worker_running.value = 0
+
+
+def analyze_image(image_data, session_id=None, landmarks_format="dict", exercise="general", raw=None,
+                  timings=False):
+    """Worker task: decode a frame (encoded, or raw with raw=(width, height, format)) and analyze it
+
+    With timings=True the result carries the frame's stage durations in ms under "timings".
+    """
+    from pose_metrics import frame_timer
+    timer = frame_timer()
+    result = _worker_engine.analyze_bytes(image_data, session_id, landmarks_format, exercise, raw, timer=timer)
+    if timings:
+        result["timings"] = timer.milliseconds()
+    return result
+
+
+def analyze_people_image(image_data, session_id=None, landmarks_format="dict", exercise="general", raw=None,
+                         timings=False):
+    """Worker task: like analyze_image, in multi-person mode (one result per person)"""
+    from pose_metrics import frame_timer
+    timer = frame_timer()
+    result = _worker_engine.analyze_bytes(image_data, session_id, landmarks_format, exercise, raw, timer=timer,
+                                          people=True)
+    if timings:
+        result["timings"] = timer.milliseconds()
+    return result
+
+
+def detect_landmarks_batch(frames):
+    """Worker task: decode and detect a chunk of independent frames
+
+    Returns (landmarks (n, 33, 4) float32 with NaN rows for misses,
+    detected (n,) bool, indices of frames that failed to decode).
+    """
+    import numpy as np
+    from frame_decoder import InvalidImageError, decode_image
+    from landmarks import empty_landmarks
+    landmarks = empty_landmarks(len(frames))
+    detected = np.zeros(len(frames), dtype=bool)
+    invalid = []
+    for i, image_data in enumerate(frames):
+        try:
+            image = decode_image(image_data)
+        except InvalidImageError:
+            invalid.append(i)
+            continue
+        frame_landmarks = _worker_analyzer.detect_landmarks(image)
+        if frame_landmarks is not None:
+            landmarks[i] = frame_landmarks.data
+            detected[i] = True
+    return landmarks, detected, invalid
+
+
+def read_video_chunk(chunk_key, path, start, stop, stride, warmup=0, frames=None):
+    """Worker task: the next `frames` analyzed frames of a video chunk, opening it on the first step
+
+    Returns (frame indices, landmarks, detected, done); the chunk is released
+    once done or on an error. Steps of a chunk must share its key.
+    """
+    from video_analysis import ChunkReader
+    reader = _worker_chunks.get(chunk_key)
+    if reader is None:
+        reader = _worker_chunks[chunk_key] = ChunkReader(_worker_analyzer, path, start, stop, stride, warmup)
+    try:
+        result = reader.read(frames)
+    except Exception:
+        close_video_chunk(chunk_key)
+        raise
+    if reader.done:
+        close_video_chunk(chunk_key)
+    return (*result, reader.done)
+
+
+def close_video_chunk(chunk_key):
+    """Worker task: release a video chunk's capture and tracker session"""
+    reader = _worker_chunks.pop(chunk_key, None)
+    if reader is not None:
+        reader.close()
+    return reader is not None
+
+
+def close_session(session_id):
+    """Worker task: release the tracker held for a session"""
+    return _worker_analyzer.close_session(session_id)
+
+
+def cache_stats():
+    """Worker task: this worker's frame cache counters, or None when caching is off"""
+    cache = _worker_analyzer.cache
+    return cache.stats() if cache is not None else None
+
+
+def metrics_snapshot():
+    """Worker task: this worker's metrics registry (see pose_metrics)"""
+    from pose_metrics import REGISTRY
+    return REGISTRY.snapshot()
+
+
+class InferencePool:
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = max(1, workers or int(os.getenv("POSE_WORKERS", DEFAULT_WORKERS)))
+        self.max_pending = max(1, max_pending or int(
+            os.getenv("POSE_QUEUE_SIZE", self.workers * DEFAULT_QUEUE_PER_WORKER)
+        ))
+        # One single-process executor per worker so frames can be routed to a specific process
+        self._shards = []
+        self._pending = [0] * self.workers
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # Reentrant: a done callback added to an already finished future runs in the adding thread
+        self._respawn_lock = threading.RLock()
+        # Set once every worker has loaded its model (see start(warm=True))
+        self.warmed = False
+        self.warm_error = None
+        self.warmup = []
+        # Shards whose worker died and whose replacement has not finished warming up
+        self.down = set()
+        # Shards whose replacement failed to warm up, with the error
+        self.failed = {}
+        self.respawns = 0
+        # Each executor's shared "running task" slot (see _run_task)
+        self._running = weakref.WeakKeyDictionary()
+        self._task_ids = itertools.count(1)
+
+    @property
+    def pending(self):
+        """Frames admitted but not yet finished"""
+        return sum(self._pending)
+
+    @property
+    def started(self):
+        return bool(self._shards)
+
+    @property
+    def ready(self):
+        """Every worker has loaded its model and none is being replaced"""
+        return self.warmed and not self.down and not self.failed
+
+    def _new_executor(self):
+        # MediaPipe graphs do not survive fork(), so always spawn fresh interpreters
+        ctx = multiprocessing.get_context("spawn")
+        running = ctx.Value("q", 0, lock=False)
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=_init_worker,
+                                       initargs=(running,))
+        self._running[executor] = running
+        return executor
+
+    def start(self, warm=True):
+        """Create the worker processes, and with warm=True wait until each has loaded its model
+
+        Safe to call from a background thread while requests are already
+        being submitted: those queue behind the warm-up on their worker.
+        """
+        with self._start_lock:
+            if not self._shards:
+                self._shards = [self._new_executor() for _ in range(self.workers)]
+        if warm and not self.warmed:
+            try:
+                self.warmup = [future.result() for future in [shard.submit(_warmup) for shard in self._shards]]
+            except Exception as e:
+                self.warm_error = f"{type(e).__name__}: {e}"
+                raise
+            self.warmed = True
+
+    def shutdown(self):
+        shards, self._shards = self._shards, []
+        self.warmed = False
+        self.down.clear()
+        self.failed.clear()
+        for shard in shards:
+            shard.shutdown(wait=False, cancel_futures=True)
+
+    def shard_for(self, key):
+        """Stable worker index for an affinity key (e.g. a session id)"""
+        return zlib.crc32(key.encode("utf-8")) % self.workers
+
+    def key_for_shard(self, name, shard):
+        """An affinity key derived from name that maps to the given worker"""
+        key, suffix = name, 0
+        while self.shard_for(key) != shard:
+            suffix += 1
+            key = f"{name}:{suffix}"
+        return key
+
+    def submit(self, fn, *args, key=None):
+        """Admit a task and return a concurrent.futures.Future, or raise PoolSaturatedError
+
+        Tasks with the same key always run on the same worker; keyless tasks
+        go to the least busy one.
+        """
+        if not self._shards:
+            self.start(warm=False)
+        with self._lock:
+            if sum(self._pending) >= self.max_pending:
+                raise PoolSaturatedError("Inference queue is full")
+            if key is not None:
+                shard = self.shard_for(key)
+            else:
+                shard = min(range(self.workers), key=self._pending.__getitem__)
+            self._pending[shard] += 1
+        try:
+            future = self._dispatch(shard, fn, args)
+        except Exception:
+            self._release(shard)
+            raise
+        future.add_done_callback(lambda _f, s=shard: self._release(s))
+        return future
+
+    async def run(self, fn, *args, key=None):
+        """Awaitable wrapper around submit() for use from async handlers
+
+        A task whose worker died while it was still queued is retried once on
+        the replacement worker; the task the worker died running is not (see
+        WorkerCrashedError).
+        """
+        future = self.submit(fn, *args, key=key)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            if self.crashed_on(future):
+                raise WorkerCrashedError("Inference worker crashed while analyzing this input") from e
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args, key=key))
+        except BrokenProcessPool as e:
+            raise WorkerUnavailableError("Inference worker is restarting") from e
+
+    async def run_all(self, fn, *args):
+        """Run a small control task once on every worker (bypasses admission)"""
+        if not self._shards:
+            self.start(warm=False)
+
+        async def run_on(shard):
+            try:
+                return await asyncio.wrap_future(self._dispatch(shard, fn, args))
+            except BrokenProcessPool:
+                return await asyncio.wrap_future(self._dispatch(shard, fn, args))
+        return await asyncio.gather(*[run_on(shard) for shard in range(len(self._shards))])
+
+    def _dispatch(self, shard, fn, args):
+        """Submit to a shard's worker, replacing the worker first if it is known to be dead"""
+        executor = self._shards[shard]
+        task_id = next(self._task_ids)
+        try:
+            future = executor.submit(_run_task, task_id, fn, *args)
+        except BrokenProcessPool:
+            executor = self._respawn(shard, executor)
+            future = executor.submit(_run_task, task_id, fn, *args)
+        future.task = (task_id, self._running[executor])
+        future.add_done_callback(lambda f, s=shard, e=executor: self._check_worker(f, s, e))
+        return future
+
+    @staticmethod
+    def crashed_on(future):
+        """Whether the future's worker died while running its task (rather than with it queued)"""
+        task_id, running = future.task
+        return running.value == task_id
+
+    def _check_worker(self, future, shard, executor):
+        # A worker that dies (OOM, crash in native code) fails every task it holds with BrokenProcessPool
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._respawn(shard, executor)
+
+    def _respawn(self, shard, broken):
+        """Replace a shard's dead worker and warm the new one; returns the shard's current executor
+
+        Sessions stay pinned to their shard, so their frames go to the new
+        worker (and queue behind its warm-up); their trackers start over.
+        """
+        with self._respawn_lock:
+            if shard < len(self._shards) and self._shards[shard] is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                executor = self._shards[shard] = self._new_executor()
+                self.respawns += 1
+                self.down.add(shard)
+                print(f"♻️ Inference worker {shard} died, respawning")
+                executor.submit(_warmup).add_done_callback(
+                    lambda f, s=shard, e=executor: self._rewarmed(f, s, e)
+                )
+            return self._shards[shard] if shard < len(self._shards) else broken
+
+    def _rewarmed(self, future, shard, executor):
+        if future.cancelled():
+            # Shut down, or already replaced by a newer worker with its own warm-up
+            return
+        error = future.exception()
+        with self._respawn_lock:
+            if shard >= len(self._shards) or self._shards[shard] is not executor:
+                return
+            self.down.discard(shard)
+            if error is None:
+                self.failed.pop(shard, None)
+                if not self.failed and self.warmed:
+                    self.warm_error = None
+                return
+            # Not ready until it recovers; a dead replacement is respawned by the shard's next task
+            message = self.warm_error = self.failed[shard] = f"{type(error).__name__}: {error}"
+        print(f"❌ Inference worker {shard} failed to warm up: {message}")
+
+    def _release(self, shard):
+        with self._lock:
+            self._pending[shard] -= 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "warmed": self.warmed,
+            "workers_down": sorted(self.down),
+            "workers_failed": sorted(self.failed),
+            "respawns": self.respawns,
+        }
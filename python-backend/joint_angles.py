@@ -0,0 +1,94 @@
+"""
+Vectorized joint-angle engine
+Computes every (a, b, c) joint angle of a template in one NumPy pass, for one frame or a sequence
+"""
+
+import numpy as np
+
+from landmarks import LANDMARK_INDEX, VIS, Landmarks
+
+# Angle library: name -> (a, b, c) landmarks, angle measured at b
+JOINT_ANGLES = {
+    "left_elbow": ("left_shoulder", "left_elbow", "left_wrist"),
+    "right_elbow": ("right_shoulder", "right_elbow", "right_wrist"),
+    "left_shoulder": ("left_elbow", "left_shoulder", "left_hip"),
+    "right_shoulder": ("right_elbow", "right_shoulder", "right_hip"),
+    "left_hip": ("left_shoulder", "left_hip", "left_knee"),
+    "right_hip": ("right_shoulder", "right_hip", "right_knee"),
+    "left_knee": ("left_hip", "left_knee", "left_ankle"),
+    "right_knee": ("right_hip", "right_knee", "right_ankle"),
+    # Shoulder-hip-ankle line, 180 when the body is straight (plank, push-up)
+    "left_body_line": ("left_shoulder", "left_hip", "left_ankle"),
+    "right_body_line": ("right_shoulder", "right_hip", "right_ankle"),
+}
+
+
+def angles_between(a, b, c):
+    """Angle at b in degrees for arrays of points shaped (..., D); NaN where undefined"""
+    ba = a - b
+    bc = c - b
+    dot = np.einsum("...d,...d->...", ba, bc)
+    norm = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosine = np.where(norm > 0, dot / norm, np.nan)
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def _index(landmark):
+    return LANDMARK_INDEX[landmark] if isinstance(landmark, str) else int(landmark)
+
+
+class JointAngleSet:
+    """A declarative set of joint angles evaluated together
+
+    triplets maps angle names to (a, b, c) landmark names or indices; a plain
+    list of names picks entries from JOINT_ANGLES.
+    """
+
+    def __init__(self, triplets, use_z=False, min_visibility=0.5):
+        if not isinstance(triplets, dict):
+            triplets = {name: JOINT_ANGLES[name] for name in triplets}
+        self.names = tuple(triplets)
+        index = np.array(
+            [[_index(lm) for lm in triplet] for triplet in triplets.values()], dtype=np.intp
+        ).reshape(-1, 3)
+        self.a, self.b, self.c = index[:, 0], index[:, 1], index[:, 2]
+        self.dims = 3 if use_z else 2
+        self.min_visibility = min_visibility
+
+    def __len__(self):
+        return len(self.names)
+
+    def compute(self, landmarks):
+        """Angles for (..., 33, 4) landmarks -> (..., K) degrees
+
+        Angles whose three landmarks are not all visible come back as NaN.
+        """
+        data = landmarks.data if isinstance(landmarks, Landmarks) else landmarks
+        points = data[..., :self.dims]
+        angles = angles_between(points[..., self.a, :], points[..., self.b, :], points[..., self.c, :])
+        vis = data[..., VIS]
+        visible = np.minimum(np.minimum(vis[..., self.a], vis[..., self.b]), vis[..., self.c])
+        return np.where(visible >= self.min_visibility, angles, np.nan)
+
+    def to_dict(self, angles):
+        """Named angles for one frame; masked angles become None"""
+        return {
+            name: (None if np.isnan(value) else round(float(value), 1))
+            for name, value in zip(self.names, angles)
+        }
+
+
+# Angles each exercise template needs per frame
+GENERAL_ANGLES = JointAngleSet(["left_shoulder", "right_shoulder", "left_hip", "right_hip"])
+PLANK_ANGLES = JointAngleSet(["left_body_line", "right_body_line", "left_elbow", "right_elbow",
+                              "left_shoulder", "right_shoulder"])
+SQUAT_ANGLES = JointAngleSet(["left_knee", "right_knee", "left_hip", "right_hip"])
+PUSHUP_ANGLES = JointAngleSet(["left_elbow", "right_elbow", "left_body_line", "right_body_line"])
+
+EXERCISE_ANGLES = {
+    "general": GENERAL_ANGLES,
+    "plank": PLANK_ANGLES,
+    "squat": SQUAT_ANGLES,
+    "pushup": PUSHUP_ANGLES,
+}
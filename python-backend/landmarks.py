@@ -0,0 +1,95 @@
+"""
+Array-backed pose landmarks
+One float32 (33, 4) array per frame (x, y, z, visibility) with named index constants
+"""
+
+from itertools import chain
+
+import numpy as np
+
+# MediaPipe Pose landmark order
+LANDMARK_NAMES = (
+    "nose", "left_eye_inner", "left_eye", "left_eye_outer",
+    "right_eye_inner", "right_eye", "right_eye_outer", "left_ear", "right_ear",
+    "mouth_left", "mouth_right", "left_shoulder", "right_shoulder",
+    "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_pinky", "right_pinky", "left_index", "right_index",
+    "left_thumb", "right_thumb", "left_hip", "right_hip",
+    "left_knee", "right_knee", "left_ankle", "right_ankle",
+    "left_heel", "right_heel", "left_foot_index", "right_foot_index"
+)
+LANDMARK_INDEX = {name: idx for idx, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Columns of the landmark array
+X, Y, Z, VIS = 0, 1, 2, 3
+
+# Key landmarks for fitness analysis, the set returned to API clients
+KEY_LANDMARKS = {
+    idx: LANDMARK_NAMES[idx]
+    for idx in (NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+                LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP, LEFT_KNEE,
+                RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
+}
+KEY_INDICES = np.array(sorted(KEY_LANDMARKS), dtype=np.intp)
+KEY_NAMES = [KEY_LANDMARKS[idx] for idx in KEY_INDICES]
+
+
+def empty_landmarks(n):
+    """(n, 33, 4) float32 array of NaNs, the value used for frames without a pose"""
+    return np.full((n, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+
+
+class Landmarks:
+    """Landmarks of one frame; indexing returns zero-copy row views"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_pose_landmarks(cls, pose_landmarks):
+        """Copy a MediaPipe NormalizedLandmarkList into a (33, 4) float32 array"""
+        values = chain.from_iterable(
+            (lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark
+        )
+        data = np.fromiter(values, dtype=np.float32, count=NUM_LANDMARKS * 4)
+        return cls(data.reshape(NUM_LANDMARKS, 4))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = LANDMARK_INDEX[key]
+        return self.data[key]
+
+    @property
+    def xy(self):
+        return self.data[:, :2]
+
+    @property
+    def xyz(self):
+        return self.data[:, :3]
+
+    @property
+    def visibility(self):
+        return self.data[:, VIS]
+
+    def to_dict(self, indices=KEY_LANDMARKS):
+        """Named landmark dict as returned by the JSON API"""
+        rows = self.data.tolist()
+        return {
+            name: {"x": rows[idx][X], "y": rows[idx][Y], "z": rows[idx][Z], "visibility": rows[idx][VIS]}
+            for idx, name in indices.items()
+        }
+
+    def to_rows(self, indices=KEY_INDICES, decimals=4):
+        """Flat [x, y, z, visibility] rows for compact responses"""
+        return np.round(self.data[indices].astype(np.float64), decimals).tolist()
@@ -1,20 +1,34 @@
 """FastAPI entrypoint for the pose / detection backend.
 
-Render Start Command example (if Root Directory left blank):
-  uvicorn python-backend.main:app --host 0.0.0.0 --port $PORT
-
-If Root Directory is set to "python-backend":
+Render Start Command (Root Directory set to "python-backend", see render.yaml):
   uvicorn main:app --host 0.0.0.0 --port $PORT
 
-This file currently exposes only health and version endpoints. Extend by
-importing logic from pose_analyzer.py or other modules when ready.
+Mounts the analysis routes from pose_analyzer.py. The server accepts connections as soon
+as the web app is imported; the inference workers are spawned and their models loaded in
+the background. /healthz is liveness (the process is up), /readyz is readiness (workers
+warm, safe to route traffic).
+
+Startup benchmark (import, spawn and model load times, first inference):
+  python main.py --startup-benchmark
 """
 
-from fastapi import FastAPI
-from importlib.metadata import version, PackageNotFoundError
+import time
+
+_import_started = time.perf_counter()
+
+import argparse
+import json
+import os
 import platform
+from importlib.metadata import version, PackageNotFoundError
+
+from fastapi import Response
 
-app = FastAPI(title="Fitness Trainer Pose Backend", version="0.1.0")
+from pose_analyzer import analyze_image, create_app, inference_pool
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+app = create_app(title="Fitness Trainer Pose Backend", version="0.2.0", background_warmup=True)
 
 
 @app.get("/healthz")
@@ -22,6 +36,19 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def ready(response: Response) -> dict:
+    """200 once every inference worker has loaded its model, 503 while warming up or replacing a dead worker"""
+    if inference_pool.ready:
+        return {"status": "ready", "workers": inference_pool.workers}
+    response.status_code = 503
+    if inference_pool.down:
+        return {"status": "recovering", "workers_down": sorted(inference_pool.down)}
+    if inference_pool.warm_error:
+        return {"status": "failed", "error": inference_pool.warm_error}
+    return {"status": "warming", "workers": inference_pool.workers}
+
+
 @app.get("/env")
 def env_info() -> dict:
     def safe_ver(pkg: str) -> str:
@@ -40,13 +67,46 @@ def env_info() -> dict:
     }
 
 
-# Placeholder for future pose analysis endpoint
-@app.post("/analyze/pose")
-def analyze_pose():  # TODO: accept uploaded video/frame and run pose detection
-    return {"detail": "Pose analysis not yet implemented"}
+def sample_frame():
+    """JPEG bytes for the first-inference timing: the benchmark fixture if present, else a blank frame"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "fixtures", "person_640x480.jpg")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    import cv2
+    import numpy as np
+    return cv2.imencode(".jpg", np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+
+
+def startup_benchmark():
+    """Time each step between process start and serving a first frame"""
+    report = {"import_s": round(IMPORT_SECONDS, 3), "workers": inference_pool.workers}
+    start = time.perf_counter()
+    inference_pool.start(warm=True)
+    report["warmup_s"] = round(time.perf_counter() - start, 3)
+    # Per worker: interpreter + module imports (incl. MediaPipe) and model load
+    report["worker_warmup"] = inference_pool.warmup
+
+    frame = sample_frame()
+    for name in ("first_inference_ms", "second_inference_ms"):
+        start = time.perf_counter()
+        result = inference_pool.submit(analyze_image, frame, "startup-benchmark").result()
+        report[name] = round((time.perf_counter() - start) * 1000, 1)
+    report["pose_detected"] = result["success"]
+    report["ready_s"] = round(report["import_s"] + report["warmup_s"], 3)
+    inference_pool.shutdown()
+    print(json.dumps(report, indent=2))
 
 
 if __name__ == "__main__":  # Local debug convenience
-    import uvicorn
+    parser = argparse.ArgumentParser(description="Pose analysis backend")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="Report import, worker warm-up and first-inference times, then exit")
+    args = parser.parse_args()
+    if args.startup_benchmark:
+        startup_benchmark()
+    else:
+        import uvicorn
 
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+        uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")),
+                    reload=os.getenv("RELOAD", "0") == "1")
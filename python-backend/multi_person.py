@@ -0,0 +1,221 @@
+"""
+Multi-person pose analysis
+MediaPipe Pose follows one subject, so people are found with a detection pass, each tracked
+person gets their own crop window and Pose tracker (run in parallel), and IoU matching keeps
+person IDs stable across frames
+"""
+
+import os
+
+import numpy as np
+
+from landmarks import VIS, X, Y
+from pose_sessions import PoseSessionPool
+from roi_tracker import VISIBILITY_THRESHOLD, RegionOfInterest
+from temporal_filter import TemporalLandmarkStage
+
+DEFAULT_MAX_PEOPLE = 4
+# Frames between detection passes while everyone is tracked
+DEFAULT_DETECT_INTERVAL = 10
+# Lost people keep their ID this many frames, so a re-detection can pick it up again
+DEFAULT_MAX_MISSES = 15
+# A detection matches a track above this overlap
+IOU_MATCH = 0.3
+# Two tracks overlapping this much have locked onto the same person
+IOU_DUPLICATE = 0.7
+# Fewer visible landmarks than this is not a person
+MIN_VISIBLE = 8
+# Masked area around a detected person, as a fraction of their box size per side
+MASK_PADDING = 0.15
+
+
+def box_iou(a, b):
+    """(n, m) intersection over union of normalized (x0, y0, x1, y1) boxes"""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)[:, None]
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)[None]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def landmark_box(landmarks):
+    """Normalized box around the visible landmarks, or None if too few are visible"""
+    visible = landmarks.data[landmarks.data[:, VIS] > VISIBILITY_THRESHOLD]
+    if len(visible) < MIN_VISIBLE:
+        return None
+    return np.clip([visible[:, X].min(), visible[:, Y].min(), visible[:, X].max(), visible[:, Y].max()], 0.0, 1.0)
+
+
+def detect_people(rgb_image, detect, max_people, masked=()):
+    """[(box, Landmarks)] of up to max_people people not inside the masked boxes
+
+    detect runs single-person detection on a full frame (a static-image
+    Pose) and returns Landmarks or None. After each person is found their
+    box is blanked out and detection runs again, until nobody is left.
+    """
+    if max_people <= 0:
+        return []
+    height, width = rgb_image.shape[:2]
+    image = rgb_image.copy()
+    for box in masked:
+        _mask(image, box, width, height)
+
+    people = []
+    while len(people) < max_people:
+        landmarks = detect(image)
+        box = None if landmarks is None else landmark_box(landmarks)
+        if box is None:
+            break
+        people.append((box, landmarks))
+        _mask(image, box, width, height)
+    return people
+
+
+def _mask(image, box, width, height):
+    x0, y0, x1, y1 = box
+    pad_x, pad_y = (x1 - x0) * MASK_PADDING, (y1 - y0) * MASK_PADDING
+    left, top = int(max(x0 - pad_x, 0) * width), int(max(y0 - pad_y, 0) * height)
+    right, bottom = int(np.ceil(min(x1 + pad_x, 1) * width)), int(np.ceil(min(y1 + pad_y, 1) * height))
+    image[top:bottom, left:right] = 127
+
+
+class Track:
+    __slots__ = ("person_id", "box", "misses")
+
+    def __init__(self, person_id, box):
+        self.person_id = person_id
+        self.box = box
+        self.misses = 0
+
+
+class PersonTracker:
+    """Person IDs across frames: detections are matched to tracks by IoU, greedily by overlap"""
+
+    def __init__(self, max_people=DEFAULT_MAX_PEOPLE, max_misses=DEFAULT_MAX_MISSES):
+        self.max_people = max_people
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = 1
+
+    @property
+    def active(self):
+        return [track for track in self.tracks if track.misses == 0]
+
+    def match(self, boxes):
+        """Assign detections to tracks (creating new ones); returns the track of each box, or None"""
+        assigned = [None] * len(boxes)
+        if self.tracks and boxes:
+            iou = box_iou(boxes, [track.box for track in self.tracks])
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                i, j = np.unravel_index(flat, iou.shape)
+                if iou[i, j] < IOU_MATCH:
+                    break
+                track = self.tracks[j]
+                if assigned[i] is None and all(t is not track for t in assigned):
+                    assigned[i] = track
+        for i, box in enumerate(boxes):
+            if assigned[i] is None:
+                if len(self.tracks) >= self.max_people:
+                    continue
+                assigned[i] = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(assigned[i])
+            assigned[i].box = box
+            assigned[i].misses = 0
+        return assigned
+
+    def prune(self):
+        """Drop tracks lost for too long and younger duplicates of another track; returns their IDs"""
+        dropped = {track.person_id for track in self.tracks if track.misses > self.max_misses}
+        active = self.active
+        if len(active) > 1:
+            iou = box_iou([t.box for t in active], [t.box for t in active])
+            for i, j in zip(*np.nonzero(np.triu(iou, 1) > IOU_DUPLICATE)):
+                # IDs grow with age, so the higher one is the newer track
+                dropped.add(max(active[i].person_id, active[j].person_id))
+        self.tracks = [track for track in self.tracks if track.person_id not in dropped]
+        return dropped
+
+
+class PeopleSession:
+    """Multi-person state of one source: person tracks and a pooled Pose session per person
+
+    Each person's PoseSession holds their Pose tracker, crop window,
+    landmark smoothing and exercise state, so rep counts and hold timers are
+    per person. (Keyframe skipping is not used: the crop pass is what keeps
+    each person's window on them.)
+    """
+
+    def __init__(self, pose_factory, max_people=None, detect_interval=None):
+        self.max_people = max_people or int(os.getenv("POSE_MAX_PEOPLE", DEFAULT_MAX_PEOPLE))
+        self.detect_interval = max(1, detect_interval or int(
+            os.getenv("POSE_PEOPLE_DETECT_INTERVAL", DEFAULT_DETECT_INTERVAL)
+        ))
+        self.tracker = PersonTracker(self.max_people)
+        # Idle eviction is left to the tracker, which knows when a person has left
+        self.people = PoseSessionPool(pose_factory, max_sessions=self.max_people, idle_timeout=float("inf"))
+        self._since_detect = 0
+        self.detections = 0
+
+    def update(self, rgb_image, detect, infer, executor, timestamp):
+        """[(person_id, PoseSession, Landmarks)] of the people found in this frame, by ID
+
+        Landmarks are in full-frame coordinates and smoothed per person.
+        detect(image) is single-person full-frame detection, infer(person,
+        image) runs a person's crop through their tracker; crops of all
+        tracked people are submitted to executor at once.
+        """
+        self._since_detect += 1
+        if self._since_detect >= self.detect_interval or not self.tracker.active:
+            # Tracked people are masked out, so the pass only finds new or lost ones
+            found = detect_people(rgb_image, detect, self.max_people - len(self.tracker.active),
+                                  [track.box for track in self.tracker.active])
+            # Matched (re-found) and new tracks get their crop window from the detection
+            seeded = [track for track in self.tracker.match([box for box, _ in found]) if track is not None]
+            self._since_detect = 0
+            self.detections += 1
+        else:
+            seeded = []
+
+        tracks = self.tracker.active
+        persons = [self.people.get(track.person_id) for track in tracks]
+        for track, person in zip(tracks, persons):
+            if person.roi is None:
+                person.roi = RegionOfInterest()
+                person.temporal = TemporalLandmarkStage.from_env()
+            if person.roi.box is None or track in seeded:
+                person.roi.box = np.asarray(track.box, dtype=np.float64)
+        futures = [executor.submit(infer, person, rgb_image) for person in persons]
+
+        found = []
+        for track, person, future in zip(tracks, persons, futures):
+            landmarks = future.result()
+            if landmarks is None or person.roi.box is None:
+                track.misses += 1
+                if person.temporal is not None:
+                    person.temporal.update(None, timestamp)
+                continue
+            track.box = person.roi.box
+            if person.temporal is not None:
+                landmarks = person.temporal.update(landmarks, timestamp)
+            found.append((track.person_id, person, landmarks))
+
+        for track in self.tracker.tracks:
+            if track not in tracks:
+                track.misses += 1
+        dropped = self.tracker.prune()
+        for person_id in dropped:
+            self.people.close(person_id)
+        return sorted((item for item in found if item[0] not in dropped), key=lambda item: item[0])
+
+    def close(self):
+        self.people.close_all()
+
+    def stats(self):
+        return {
+            "tracked_people": len(self.tracker.active),
+            "detection_passes": self.detections,
+        }
@@ -0,0 +1,325 @@
+"""
+Multi-camera pose service
+Headless fan-in: one capture thread and tracker session per stream over a shared inference pool
+
+Usage:
+  python multicam.py rtsp://cam1/... front=rtsp://cam2/... squat_rack=workout.mp4
+  python multicam.py synthetic://640x480@15 synthetic://320x240@30 --workers 2
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import re
+import threading
+import time
+from functools import partial
+
+import cv2
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+
+from capture import LatestFrameReader
+from exercises import EXERCISE_NAMES
+from frame_decoder import DEFAULT_MAX_SIDE
+from inference_pool import InferencePool, PoolSaturatedError, analyze_image, close_session
+from landmarks import KEY_NAMES
+from pose_stream import LatestFrameSlot, compact_result
+
+# How long the scheduler sleeps when no stream has a new frame to dispatch
+SCHEDULER_IDLE_WAIT = 0.005
+# How long stop() waits for the streams' sessions to close (flushing recorders and trackers)
+CLOSE_TIMEOUT = 5.0
+
+_CREDENTIALS = re.compile(r"//[^/@:]*:[^/@]*@")
+
+
+def redact_source(source):
+    """Hide user:password in camera URLs before they are logged or published"""
+    return _CREDENTIALS.sub("//***@", str(source))
+
+
+def parse_stream_specs(specs):
+    """[name=]source strings -> [(stream_id, source)]; unnamed streams become cam0, cam1..."""
+    streams = []
+    for i, spec in enumerate(specs):
+        name, sep, source = spec.partition("=")
+        # RTSP URLs may contain '=' in their query string, so only a bare word counts as a name
+        if sep and re.fullmatch(r"[\w-]+", name):
+            streams.append((name, source))
+        else:
+            streams.append((f"cam{i}", spec))
+    ids = [stream_id for stream_id, _ in streams]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Stream names must be unique")
+    return streams
+
+
+class CameraStream:
+    """One camera: capture thread, tracker session key and its latest published result"""
+
+    def __init__(self, stream_id, source, exercise="general", session_id=None):
+        self.stream_id = stream_id
+        self.source = source
+        self.exercise = exercise
+        # The tracker for this stream lives in whichever worker this key maps to
+        self.session_id = session_id or f"stream:{stream_id}"
+        self.reader = LatestFrameReader(source, name=f"capture-{stream_id}")
+        self.in_flight = False
+        self.latest = None
+        self.analyzed = 0
+        self.errors = 0
+        self.last_latency_ms = None
+
+    def stats(self):
+        return {
+            "id": self.stream_id,
+            "source": redact_source(self.source),
+            "exercise": self.exercise,
+            "analyzed": self.analyzed,
+            "errors": self.errors,
+            "latency_ms": self.last_latency_ms,
+            **self.reader.stats(),
+        }
+
+
+class FanInScheduler:
+    """Dispatches each stream's newest frame to the shared pool in round-robin order
+
+    A stream has at most one frame in flight, and every pass starts one stream
+    later than the previous one, so a fast or high-resolution camera cannot
+    take more than its share of the workers. Frames that arrive while a
+    stream waits for its turn are replaced by newer ones.
+    """
+
+    def __init__(self, streams, pool, max_side=None, on_result=None):
+        self.streams = streams
+        self.pool = pool
+        self.max_side = max_side or int(os.getenv("POSE_DECODE_MAX_SIDE", DEFAULT_MAX_SIDE))
+        self.on_result = on_result
+        self.rejected = 0
+        self._next = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fan-in-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            count = len(self.streams)
+            for offset in range(count):
+                if self.pool.pending >= self.pool.max_pending:
+                    break
+                stream = self.streams[(self._next + offset) % count]
+                if not stream.in_flight:
+                    self._dispatch(stream)
+            self._next = (self._next + 1) % max(count, 1)
+            self._wake.wait(SCHEDULER_IDLE_WAIT)
+            self._wake.clear()
+
+    def _dispatch(self, stream):
+        seq, frame = stream.reader.frames.take(timeout=0)
+        if frame is None:
+            return
+        # Shrink before crossing the process boundary; the model input is ~256px anyway
+        height, width = frame.shape[:2]
+        scale = self.max_side / max(height, width)
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+        raw = (width, height, "bgr24")
+        try:
+            future = self.pool.submit(
+                analyze_image, frame.tobytes(), stream.session_id, "rows", stream.exercise, raw,
+                key=stream.session_id
+            )
+        except PoolSaturatedError:
+            self.rejected += 1
+            return
+        stream.in_flight = True
+        future.add_done_callback(partial(self._done, stream, seq, time.perf_counter()))
+
+    def _done(self, stream, seq, started, future):
+        stream.in_flight = False
+        stream.last_latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            result = future.result()
+        except Exception as e:
+            stream.errors += 1
+            print(f"❌ [{stream.stream_id}] Analysis failed: {e}")
+        else:
+            stream.analyzed += 1
+            payload = compact_result(result, seq, stream.reader.frames.dropped)
+            payload["stream"] = stream.stream_id
+            payload["t"] = time.time()
+            stream.latest = payload
+            if self.on_result is not None:
+                self.on_result(stream, payload)
+        self._wake.set()
+
+
+class MultiCameraService:
+    """Owns the streams, the shared pool and the scheduler; publishes results to subscribers"""
+
+    def __init__(self, stream_specs, exercise="general", workers=None, max_side=None):
+        if exercise not in EXERCISE_NAMES:
+            raise ValueError(f"Unknown exercise '{exercise}', expected one of: {', '.join(EXERCISE_NAMES)}")
+        self.pool = InferencePool(workers=workers)
+        self.streams = []
+        for index, (stream_id, source) in enumerate(stream_specs):
+            # Spread streams evenly over the workers instead of relying on key hashing
+            session_id = self.pool.key_for_shard(f"stream:{stream_id}", index % self.pool.workers)
+            self.streams.append(CameraStream(stream_id, source, exercise, session_id))
+        self.by_id = {stream.stream_id: stream for stream in self.streams}
+        self.scheduler = FanInScheduler(self.streams, self.pool, max_side, self._on_result)
+        self._subscribers = {stream.stream_id: set() for stream in self.streams}
+        self._loop = None
+
+    def start(self, loop=None):
+        self._loop = loop
+        self.pool.start()
+        for stream in self.streams:
+            print(f"🎥 [{stream.stream_id}] {redact_source(stream.source)}")
+            stream.reader.start()
+        self.scheduler.start()
+
+    def stop(self, timeout=CLOSE_TIMEOUT):
+        """Stop capture, close every stream's session and shut the pool down
+
+        The closes queue behind the frames still in flight; they are waited
+        for (up to timeout) since shutting the pool down cancels queued tasks.
+        """
+        self.scheduler.stop()
+        deadline = time.monotonic() + timeout
+        closes = []
+        for stream in self.streams:
+            stream.reader.stop()
+            while True:
+                try:
+                    closes.append(self.pool.submit(close_session, stream.session_id, key=stream.session_id))
+                    break
+                except PoolSaturatedError:
+                    # Frames in flight free their slots as they finish
+                    if time.monotonic() >= deadline:
+                        print(f"⚠️ [{stream.stream_id}] Session not closed: inference queue full")
+                        break
+                    time.sleep(SCHEDULER_IDLE_WAIT)
+        concurrent.futures.wait(closes, timeout=max(0.0, deadline - time.monotonic()))
+        self.pool.shutdown()
+
+    def subscribe(self, stream_id):
+        slot = LatestFrameSlot()
+        self._subscribers[stream_id].add(slot)
+        return slot
+
+    def unsubscribe(self, stream_id, slot):
+        self._subscribers[stream_id].discard(slot)
+
+    def _on_result(self, stream, payload):
+        # Called on a pool callback thread; hand the result to the event loop
+        if self._loop is not None and self._subscribers[stream.stream_id]:
+            self._loop.call_soon_threadsafe(self._publish, stream.stream_id, payload)
+
+    def _publish(self, stream_id, payload):
+        for slot in self._subscribers[stream_id]:
+            slot.put(payload)
+
+    def stats(self):
+        return {
+            "streams": [stream.stats() for stream in self.streams],
+            "inference": self.pool.stats(),
+            "rejected": self.scheduler.rejected,
+        }
+
+
+def create_app(service):
+    """HTTP/WebSocket front end publishing per-stream analysis results"""
+    app = FastAPI(title="AI Fitness Trainer - Multi-Camera Pose Service")
+
+    @app.on_event("startup")
+    async def start_service():
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, service.start, loop)
+
+    @app.on_event("shutdown")
+    async def stop_service():
+        service.stop()
+
+    def get_stream(stream_id):
+        stream = service.by_id.get(stream_id)
+        if stream is None:
+            raise HTTPException(status_code=404, detail=f"Unknown stream '{stream_id}'")
+        return stream
+
+    @app.get("/streams")
+    async def list_streams():
+        """Every stream's capture/analysis counters and latest result"""
+        return {
+            "landmarks": KEY_NAMES,
+            "streams": [{**stream.stats(), "latest": stream.latest} for stream in service.streams],
+        }
+
+    @app.get("/streams/{stream_id}")
+    async def latest_result(stream_id: str):
+        """Latest analysis result of one stream"""
+        stream = get_stream(stream_id)
+        return {**stream.stats(), "latest": stream.latest}
+
+    @app.websocket("/ws/streams/{stream_id}")
+    async def stream_results(websocket: WebSocket, stream_id: str):
+        """Pushes each new result of a stream; slow clients only get the newest one"""
+        await websocket.accept()
+        if stream_id not in service.by_id:
+            await websocket.close(code=1008, reason=f"Unknown stream '{stream_id}'")
+            return
+        slot = service.subscribe(stream_id)
+        await websocket.send_json({"stream": stream_id, "landmarks": KEY_NAMES})
+        try:
+            while True:
+                _, payload = await slot.take()
+                await websocket.send_json(payload)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            service.unsubscribe(stream_id, slot)
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "multi-camera-pose", **service.stats()}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-camera pose analysis service")
+    parser.add_argument("streams", nargs="*",
+                        help="[name=]source: RTSP/HTTP URL, camera index, video file or synthetic://WxH@FPS")
+    parser.add_argument("--exercise", default="general", choices=EXERCISE_NAMES)
+    parser.add_argument("--workers", type=int, default=None, help="Inference worker processes (POSE_WORKERS)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8001")))
+    args = parser.parse_args()
+
+    specs = args.streams or [s.strip() for s in os.getenv("POSE_STREAMS", "").split(",") if s.strip()]
+    if not specs:
+        parser.error("no streams given (pass them as arguments or set POSE_STREAMS)")
+
+    import uvicorn
+    service = MultiCameraService(parse_stream_specs(specs), args.exercise, args.workers)
+    print(f"🚀 Multi-camera pose service with {len(service.streams)} stream(s)")
+    print(f"📍 Running on: http://localhost:{args.port}/streams")
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Overlay renderer
+Draws skeletons, feedback and counters onto annotated frames from the (33, 4) landmark array:
+connection indices and styles are prepared once, and all bones and all joints of a skeleton are
+drawn with one cv2.polylines call each, optionally on a reduced-resolution copy of the frame
+"""
+
+import cv2
+import numpy as np
+
+from landmarks import VIS
+
+# Same cut-off MediaPipe's drawing utilities use
+VISIBILITY_THRESHOLD = 0.5
+# Skeleton colours (BGR) cycled through by person ID in multi-person mode
+PERSON_COLORS = ((0, 255, 0), (255, 128, 0), (255, 0, 255), (0, 255, 255), (255, 255, 0), (128, 0, 255))
+JOINT_COLOR = (0, 0, 255)
+WHITE = (255, 255, 255)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def pose_connections():
+    """(n, 2) landmark index pairs of MediaPipe's pose skeleton"""
+    import mediapipe as mp
+    return np.array(sorted(mp.solutions.pose.POSE_CONNECTIONS), dtype=np.intp)
+
+
+def counter_text(details):
+    if "reps" in details:
+        return f"Reps: {details['reps']}"
+    if "current_hold" in details:
+        return f"Hold: {details['current_hold']:.1f}s"
+    return None
+
+
+def accuracy_color(accuracy):
+    return (0, 255, 0) if accuracy > 80 else (0, 165, 255) if accuracy > 60 else (0, 0, 255)
+
+
+class OverlayRenderer:
+    """Draws analysis results onto frames
+
+    scale < 1 renders onto a downscaled copy of the frame (line widths, joint
+    size and text shrink with it), which also makes every sink downstream
+    encode fewer pixels; at 1 the frame is drawn on in place.
+    """
+
+    def __init__(self, scale=1.0, connections=None):
+        if not 0 < scale <= 1:
+            raise ValueError("Overlay scale must be in (0, 1]")
+        self.scale = scale
+        connections = pose_connections() if connections is None else np.asarray(connections, dtype=np.intp)
+        self.bone_a, self.bone_b = connections[:, 0], connections[:, 1]
+        self.bone_thickness = max(1, round(2 * scale))
+        # Joints are zero-length segments: a round cap of this width is a filled circle of radius 3
+        self.joint_thickness = max(2, round(6 * scale))
+        self.font_scale = 0.8 * scale
+        self.label_scale = 0.6 * scale
+        self.text_thickness = max(1, round(2 * scale))
+        self.margin = round(50 * scale)
+        self.line_height = round(40 * scale)
+
+    def render(self, frame, result):
+        """The frame with the result drawn on: the frame itself at scale 1, else a resized copy"""
+        if self.scale != 1:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if "people" in result:
+            self.draw_people(frame, result)
+        else:
+            self.draw_result(frame, result)
+        return frame
+
+    def draw_skeleton(self, frame, landmarks, color=PERSON_COLORS[0]):
+        """Bones and joints of a (33, 4) landmark array, one polylines call each"""
+        height, width = frame.shape[:2]
+        points = np.rint(landmarks[:, :2] * (width, height)).astype(np.int32)
+        visible = landmarks[:, VIS] > VISIBILITY_THRESHOLD
+        drawn = visible[self.bone_a] & visible[self.bone_b]
+        if drawn.any():
+            bones = np.stack([points[self.bone_a[drawn]], points[self.bone_b[drawn]]], axis=1)
+            cv2.polylines(frame, bones, False, color, self.bone_thickness)
+        if visible.any():
+            joints = np.repeat(points[visible][:, None], 2, axis=1)
+            cv2.polylines(frame, joints, False, JOINT_COLOR, self.joint_thickness)
+
+    def draw_result(self, frame, result):
+        """Skeleton, feedback, accuracy and counter of a single-person result (landmarks as an array)"""
+        landmarks = result.get("landmarks")
+        if landmarks is not None:
+            self.draw_skeleton(frame, landmarks)
+
+        accuracy = result.get("accuracy", 0)
+        lines = [(result.get("feedback", ""), accuracy_color(accuracy)), (f"Accuracy: {accuracy}%", WHITE)]
+        counter = counter_text(result.get("detailed_analysis") or {})
+        if counter is not None:
+            lines.append((counter, WHITE))
+        for row, (text, color) in enumerate(lines):
+            cv2.putText(frame, text, (self.margin, self.margin + row * self.line_height), FONT,
+                        self.font_scale, color, self.text_thickness)
+
+    def draw_people(self, frame, result):
+        """Multi-person result: each skeleton in its person's colour, labelled above its box"""
+        height, width = frame.shape[:2]
+        for person in result["people"]:
+            color = PERSON_COLORS[(person["person_id"] - 1) % len(PERSON_COLORS)]
+            if person.get("landmarks") is not None:
+                self.draw_skeleton(frame, person["landmarks"], color)
+            if person["box"] is None:
+                continue
+            label = " ".join(filter(None, [f"#{person['person_id']}", f"{person['accuracy']}%",
+                                           counter_text(person.get("detailed_analysis") or {})]))
+            x = int(person["box"][0] * width)
+            y = max(int(person["box"][1] * height) - round(10 * self.scale), round(20 * self.scale))
+            cv2.putText(frame, label, (x, y), FONT, self.label_scale, color, self.text_thickness)
+        cv2.putText(frame, f"People: {result.get('count', 0)}", (self.margin, self.margin), FONT,
+                    self.font_scale, WHITE, self.text_thickness)
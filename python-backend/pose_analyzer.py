@@ -2,86 +2,169 @@
 AI Fitness Trainer - Python Backend Service
 Real-time pose analysis using MediaPipe
 Port: 8000 (connects with Node.js main app)
+
+The analysis routes live on `router`; create_app() mounts them (main.py is the production
+entrypoint, `app` below keeps `uvicorn pose_analyzer:app` working). MediaPipe itself is only
+imported by the inference workers.
 """
 
-import cv2
-import mediapipe as mp
 import numpy as np
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import APIRouter, FastAPI, File, Form, Header, Request, Response, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 import uvicorn
 import io
 from PIL import Image
 import base64
 import json
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from inference_pool import (
+    InferencePool, PoolSaturatedError, WorkerCrashedError, analyze_image, analyze_people_image, cache_stats, close_session,
+    detect_landmarks_batch, metrics_snapshot
+)
+from batch_analysis import analyze_general_posture_batch, build_frame_results, frame_analysis
+from landmarks import KEY_NAMES, Landmarks, empty_landmarks
+from adaptive_pose import AdaptivePose, QualityController
+from frame_cache import FrameCache, frame_hash
+from frame_decoder import RAW_FORMATS, InvalidImageError
+from exercises import EXERCISE_NAMES, EXERCISE_STATES, PlankState, PushupState, SquatState
+from joint_angles import GENERAL_ANGLES, PLANK_ANGLES, PUSHUP_ANGLES, SQUAT_ANGLES, angles_between
+from pose_sessions import PoseSession, PoseSessionPool
+import pose_metrics
+from pose_metrics import NULL_TIMER, REGISTRY, frame_timer, labels
+from temporal_filter import TemporalLandmarkStage
+from roi_tracker import RegionOfInterest
+from multi_person import DEFAULT_MAX_PEOPLE, PeopleSession, detect_people, landmark_box
+from session_recorder import DEFAULT_MAX_POINTS, SessionRecorder, read_series, read_summary
+from pose_codec import MEDIA_TYPE, encode_result, encode_stream_result, format_description, wants_binary
+from pose_stream import LatestFrameSlot, compact_result
+from video_analysis import InvalidVideoError, analyze_video
 
-# Initialize FastAPI app
-app = FastAPI(title="AI Fitness Trainer - Pose Analysis API")
+# Analysis routes, mounted by create_app()
+router = APIRouter()
 
-# Add CORS middleware to allow requests from Node.js/Vercel app (configurable)
+# CORS origins allowed to call the API from the Node.js/Vercel app (configurable)
 origins_env = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
 allowed_origins = [o.strip() for o in origins_env.split(",") if o.strip()]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# Initialize MediaPipe Pose with improved accuracy settings
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=2,                    # Heavy model for better accuracy
-    enable_segmentation=True,
-    min_detection_confidence=0.7,          # Increased from 0.5
-    min_tracking_confidence=0.6            # Increased from 0.5
-)
-mp_draw = mp.solutions.drawing_utils
 
 class PoseAnalyzer:
     def __init__(self):
+        # Tracking Pose instances keyed by client session (one analyzer per worker process);
+        # each adapts its model complexity and input scale to the latency budget
+        self.sessions = PoseSessionPool(AdaptivePose, on_close=self._drop_cached)
+        # Frames without a session are unrelated stills, so they must not share a tracker
+        self._static_pose = None
+        # Optional cache of detection results for repeated (near-identical) frames
+        self.cache = FrameCache() if os.getenv("POSE_CACHE", "0") == "1" else None
+        # Multi-person mode: people per frame, and threads running their crops in parallel
+        self.max_people = int(os.getenv("POSE_MAX_PEOPLE", DEFAULT_MAX_PEOPLE))
+        self._person_executor = None
+        # Each template pairs its analyzer with the joint angles it needs per frame
         self.exercise_templates = {
-            "plank": self.analyze_plank,
-            "squat": self.analyze_squat,
-            "pushup": self.analyze_pushup,
-            "general": self.analyze_general_posture
+            "plank": {"analyze": self.analyze_plank, "angles": PLANK_ANGLES},
+            "squat": {"analyze": self.analyze_squat, "angles": SQUAT_ANGLES},
+            "pushup": {"analyze": self.analyze_pushup, "angles": PUSHUP_ANGLES},
+            "general": {"analyze": self.analyze_general_posture, "angles": GENERAL_ANGLES}
         }
     
-    def analyze_pose(self, image_array):
-        """Main pose analysis function"""
+    def get_session(self, session_id=None):
+        """Return the tracker session for a client, or None for one-off frames"""
+        if not session_id:
+            return None
+        session = self.sessions.get(session_id)
+        if session.frames == 1:
+            # Smoothing, keyframe skipping and ROI cropping need consecutive frames, so they are per session
+            session.temporal = TemporalLandmarkStage.from_env()
+            session.roi = RegionOfInterest.from_env()
+            session.recorder = SessionRecorder.from_env(session_id)
+        return session
+    
+    def detached_session(self, session_id):
+        """Tracker session for offline work (video chunks), kept outside the session pool
+
+        It has the ROI and temporal stages of a client session, but takes no
+        POSE_MAX_SESSIONS slot (so it never evicts a live session), is not
+        recorded, and keeps the configured quality level since it is not
+        latency bound. Release it with close_detached().
+        """
+        session = PoseSession(session_id, AdaptivePose(controller=QualityController(adaptive=False)))
+        session.temporal = TemporalLandmarkStage.from_env()
+        session.roi = RegionOfInterest.from_env()
+        return session
+    
+    def close_detached(self, session):
+        session.close()
+        self._drop_cached(session.session_id)
+    
+    def get_pose(self, session=None):
+        """Return the session's tracker, or the shared static-image instance"""
+        if session is not None:
+            return session.pose
+        if self._static_pose is None:
+            self._static_pose = AdaptivePose(static_image_mode=True)
+        return self._static_pose
+    
+    def analyze_pose(self, rgb_image, session_id=None, landmarks_format="dict",
+                     exercise="general", timestamp=None, timer=None):
+        """Main pose analysis function (expects an RGB frame, see frame_decoder)
+
+        landmarks_format picks how landmarks are returned: "dict" (named
+        key landmarks), "rows" (flat [x, y, z, visibility] rows), "array"
+        (the (33, 4) float32 array, for binary encoding) or "none".
+        Exercise state (reps, hold time) is kept per session across frames.
+        Stage durations go to timer (a pose_metrics.FrameTimer) and the
+        process's metrics registry.
+        """
+        timer = timer if timer is not None else frame_timer()
         try:
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
+            session = self.get_session(session_id)
+            timestamp = timestamp if timestamp is not None else time.monotonic()
+            timer.lap("session")
+            landmarks = self.detect_landmarks(rgb_image, session, timestamp, timer)
             
-            # Process with MediaPipe
-            results = pose.process(rgb_image)
-            
-            if not results.pose_landmarks:
+            if landmarks is None:
+                if session is not None and session.recorder is not None:
+                    session.recorder.record(exercise)
+                    timer.lap("record")
+                self.record_frame(timer, "no_pose", session)
                 return {
                     "success": False,
                     "feedback": "No pose detected. Please ensure you're fully visible in the camera.",
                     "accuracy": 0,
-                    "landmarks": None
+                    "landmarks": None,
+                    "exercise": exercise
                 }
             
-            # Extract landmarks
-            landmarks = self.extract_landmarks(results.pose_landmarks)
-            
-            # Analyze posture
-            analysis = self.analyze_general_posture(landmarks)
+            # Analyze posture for the selected exercise
+            analysis = self.analyze_exercise(landmarks, exercise, session, timestamp)
+            timer.lap("analysis")
             
-            return {
+            result = {
                 "success": True,
                 "feedback": analysis["feedback"],
                 "accuracy": analysis["accuracy"],
-                "landmarks": landmarks,
-                "detailed_analysis": analysis["details"]
+                "landmarks": self.format_landmarks(landmarks, landmarks_format),
+                "detailed_analysis": analysis["details"],
+                "exercise": exercise,
+                "angles": analysis["angles"],
+                "quality": self.quality_stats(session)
             }
+            timer.lap("format")
+            if session is not None and session.recorder is not None:
+                session.recorder.record(exercise, landmarks, analysis["accuracy"], analysis["details"])
+                timer.lap("record")
+            self.record_frame(timer, "detected", session)
+            return result
             
         except Exception as e:
+            REGISTRY.inc("pose_errors_total", type=type(e).__name__)
             return {
                 "success": False,
                 "feedback": f"Analysis error: {str(e)}",
@@ -89,151 +172,367 @@ class PoseAnalyzer:
                 "landmarks": None
             }
     
-    def extract_landmarks(self, pose_landmarks):
-        """Extract pose landmarks with names"""
-        landmarks = {}
-        
-        # Key landmarks for fitness analysis
-        landmark_names = {
-            0: "nose", 11: "left_shoulder", 12: "right_shoulder",
-            13: "left_elbow", 14: "right_elbow", 15: "left_wrist", 16: "right_wrist",
-            23: "left_hip", 24: "right_hip", 25: "left_knee", 26: "right_knee",
-            27: "left_ankle", 28: "right_ankle"
-        }
-        
-        for idx, landmark in enumerate(pose_landmarks.landmark):
-            if idx in landmark_names:
-                landmarks[landmark_names[idx]] = {
-                    "x": landmark.x,
-                    "y": landmark.y,
-                    "z": landmark.z,
-                    "visibility": landmark.visibility
-                }
-        
-        return landmarks
-    
-    def calculate_angle(self, point1, point2, point3):
-        """Calculate angle between three points"""
+    def analyze_people(self, rgb_image, session_id=None, landmarks_format="dict",
+                       exercise="general", timestamp=None, timer=None):
+        """Multi-person analysis: one result per person under "people", ordered by person_id
+
+        Session frames follow each person with their own tracker, crop window
+        and exercise state, and person IDs stay stable across frames (see
+        multi_person). Frames without a session are stills: everyone the
+        detection pass finds is analyzed once and numbered per frame.
+        """
+        timer = timer if timer is not None else frame_timer()
         try:
-            # Validate inputs
-            for p in (point1, point2, point3):
-                if p is None or "x" not in p or "y" not in p:
-                    return 0
-            # Convert to numpy arrays
-            a = np.array([point1["x"], point1["y"]], dtype=float)
-            b = np.array([point2["x"], point2["y"]], dtype=float)
-            c = np.array([point3["x"], point3["y"]], dtype=float)
-            
-            # Calculate vectors
-            ba = a - b
-            bc = c - b
+            session = self.get_session(session_id)
+            timestamp = timestamp if timestamp is not None else time.monotonic()
+            timer.lap("session")
+            if session is None:
+                found = [(i + 1, None, landmarks) for i, (_, landmarks)
+                         in enumerate(detect_people(rgb_image, self._process, self.max_people))]
+            else:
+                if session.people is None:
+                    session.people = PeopleSession(AdaptivePose, self.max_people)
+                found = session.people.update(rgb_image, self._process, self._infer_person,
+                                              self.person_executor, timestamp)
+            timer.lap("inference")
             
-            # Avoid division by zero
-            norm_ba = np.linalg.norm(ba)
-            norm_bc = np.linalg.norm(bc)
-            if norm_ba == 0 or norm_bc == 0:
-                return 0
+            people = []
+            for person_id, person, landmarks in found:
+                analysis = self.analyze_exercise(landmarks, exercise, person, timestamp)
+                box = landmark_box(landmarks)
+                people.append({
+                    "person_id": person_id,
+                    "box": None if box is None else [round(float(v), 4) for v in box],
+                    "feedback": analysis["feedback"],
+                    "accuracy": analysis["accuracy"],
+                    "landmarks": self.format_landmarks(landmarks, landmarks_format),
+                    "detailed_analysis": analysis["details"],
+                    "angles": analysis["angles"]
+                })
+            timer.lap("analysis")
             
-            # Calculate angle
-            cosine_angle = np.dot(ba, bc) / (norm_ba * norm_bc)
-            angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
+            result = {
+                "success": bool(people),
+                "people": people,
+                "count": len(people),
+                "exercise": exercise
+            }
+            if not people:
+                result["feedback"] = "No people detected. Please ensure you're fully visible in the camera."
+            if session is not None:
+                result["tracking"] = session.people.stats()
+            timer.lap("format")
+            self.record_frame(timer, "detected" if people else "no_pose")
+            return result
             
-            return float(np.degrees(angle))
-        except Exception:
-            return 0
+        except Exception as e:
+            REGISTRY.inc("pose_errors_total", type=type(e).__name__)
+            return {
+                "success": False,
+                "feedback": f"Analysis error: {str(e)}",
+                "people": [],
+                "count": 0
+            }
     
-    def analyze_general_posture(self, landmarks):
-        """General posture analysis"""
-        feedback = []
-        accuracy_score = 100
-        details = {}
-        
-        # Check if all required landmarks are visible
-        required_landmarks = ["left_shoulder", "right_shoulder", "left_hip", "right_hip"]
-        for landmark in required_landmarks:
-            if landmark not in landmarks or landmarks[landmark]["visibility"] < 0.5:
-                return {
-                    "feedback": "Please ensure your full body is visible in the camera",
-                    "accuracy": 20,
-                    "details": {"error": "Insufficient landmark visibility"}
-                }
-        
-        # 1. Shoulder alignment
-        left_shoulder = landmarks["left_shoulder"]
-        right_shoulder = landmarks["right_shoulder"]
-        shoulder_height_diff = abs(left_shoulder["y"] - right_shoulder["y"])
-        
-        if shoulder_height_diff > 0.05:  # 5% threshold
-            feedback.append("Keep your shoulders level")
-            accuracy_score -= 15
-        else:
-            feedback.append("Good shoulder alignment")
-        
-        details["shoulder_alignment"] = {
-            "height_difference": shoulder_height_diff,
-            "status": "good" if shoulder_height_diff <= 0.05 else "needs_improvement"
-        }
-        
-        # 2. Hip alignment
-        left_hip = landmarks["left_hip"]
-        right_hip = landmarks["right_hip"]
-        hip_height_diff = abs(left_hip["y"] - right_hip["y"])
+    @property
+    def person_executor(self):
+        if self._person_executor is None:
+            self._person_executor = ThreadPoolExecutor(max_workers=self.max_people, thread_name_prefix="person")
+        return self._person_executor
+    
+    def _infer_person(self, person, rgb_image):
+        """One tracked person's crop through their own tracker (runs on a person thread)"""
+        return self._infer_roi(rgb_image, person, full_frame_fallback=False)
+    
+    def analyze_exercise(self, landmarks, exercise="general", session=None, timestamp=None):
+        """Compute the template's joint angles and run its analyzer with the session's state"""
+        template = self.exercise_templates[exercise]
+        angle_set = template["angles"]
+        angles = angle_set.compute(landmarks)
         
-        if hip_height_diff > 0.03:  # 3% threshold
-            feedback.append("Align your hips properly")
-            accuracy_score -= 10
-        else:
-            feedback.append("Good hip alignment")
+        state = None
+        if session is not None and exercise in EXERCISE_STATES:
+            state = session.state.get(exercise)
+            if state is None:
+                state = session.state[exercise] = EXERCISE_STATES[exercise]()
         
-        details["hip_alignment"] = {
-            "height_difference": hip_height_diff,
-            "status": "good" if hip_height_diff <= 0.03 else "needs_improvement"
-        }
+        analysis = template["analyze"](landmarks, dict(zip(angle_set.names, angles.tolist())), state, timestamp)
+        analysis["angles"] = angle_set.to_dict(angles)
+        return analysis
+    
+    def record_frame(self, timer, outcome, session=None):
+        """Count a finished frame and add its stage timings to the metrics registry"""
+        if pose_metrics.ENABLED:
+            REGISTRY.record(timer)
+            complexity = self.get_pose(session).controller.level["model_complexity"]
+            REGISTRY.inc("pose_frames_total", outcome=outcome, model_complexity=complexity)
+    
+    def register_metrics(self, registry):
+        """Expose this analyzer's trackers and frame cache as gauges (called once per worker)"""
+        def trackers():
+            counts = {}
+            poses = [("session", session.pose) for session in self.sessions]
+            for session in self.sessions:
+                if session.people is not None:
+                    poses += [("person", person.pose) for person in session.people.people]
+            if self._static_pose is not None:
+                poses.append(("static", self._static_pose))
+            for mode, pose in poses:
+                key = labels(mode=mode, model_complexity=pose.controller.level["model_complexity"])
+                counts[key] = counts.get(key, 0) + 1
+            return counts
+        registry.gauge("pose_trackers", trackers)
         
-        # 3. Back straightness (using shoulder to hip line)
-        avg_shoulder_y = (left_shoulder["y"] + right_shoulder["y"]) / 2
-        avg_hip_y = (left_hip["y"] + right_hip["y"]) / 2
+        if self.cache is not None:
+            cache = self.cache
+            registry.gauge("pose_cache_lookups_total", lambda: {
+                labels(result="hit"): cache.hits,
+                labels(result="near_hit"): cache.near_hits,
+                labels(result="miss"): cache.misses,
+            })
+            registry.gauge("pose_cache_entries", lambda: cache.stats()["entries"])
+    
+    def quality_stats(self, session=None):
+        """Model level and latency, plus smoothing/keyframe and ROI state for sessions"""
+        stats = self.get_pose(session).stats()
+        if session is not None and session.temporal is not None:
+            stats.update(session.temporal.stats())
+        if session is not None and session.roi is not None:
+            stats.update(session.roi.stats())
+        return stats
+    
+    def detect_landmarks(self, rgb_image, session=None, timestamp=None, timer=NULL_TIMER):
+        """Run pose detection only on an RGB frame; returns Landmarks or None
+
+        Session frames go through the session's temporal stage: landmarks are
+        smoothed, and between keyframes inference may be skipped in favour of
+        extrapolated landmarks.
+        """
+        temporal = session.temporal if session is not None else None
+        if temporal is not None:
+            timestamp = timestamp if timestamp is not None else time.monotonic()
+            predicted = temporal.predict(timestamp)
+            timer.lap("temporal")
+            if predicted is not None:
+                return predicted
         
-        if avg_shoulder_y > avg_hip_y:  # Shoulders should be above hips
-            feedback.append("Maintain upright posture")
-            accuracy_score -= 20
+        landmarks = self._infer_landmarks(rgb_image, session, timer)
+        if temporal is not None:
+            landmarks = temporal.update(landmarks, timestamp)
+            timer.lap("temporal")
+        return landmarks
+    
+    def _infer_landmarks(self, rgb_image, session=None, timer=NULL_TIMER):
+        """Cached result for a repeated frame, otherwise a MediaPipe pass"""
+        if self.cache is not None:
+            scope = session.session_id if session is not None else None
+            # Hash the person's region when tracking one, where motion shows up in the most bits
+            window = session.roi.window if session is not None and session.roi is not None else None
+            key = frame_hash(rgb_image, window)
+            hit, cached = self.cache.get(scope, key)
+            timer.lap("cache")
+            if hit:
+                return None if cached is None else Landmarks(cached.copy())
         
-        # 4. Overall stability check
-        if len([l for l in landmarks.values() if l["visibility"] > 0.8]) >= 8:
-            feedback.append("Good pose stability")
+        if session is None or session.roi is None:
+            landmarks = self._process(rgb_image, session, timer)
         else:
-            feedback.append("Try to stay more stable")
-            accuracy_score -= 10
+            landmarks = self._infer_roi(rgb_image, session, timer)
         
-        # Ensure accuracy doesn't go below 0
-        accuracy_score = max(0, accuracy_score)
-        
-        return {
-            "feedback": " | ".join(feedback) if feedback else "Great posture!",
-            "accuracy": accuracy_score,
-            "details": details
-        }
+        if self.cache is not None:
+            self.cache.put(scope, key, None if landmarks is None else landmarks.data.copy())
+            timer.lap("cache")
+        return landmarks
     
-    def analyze_plank(self, landmarks):
-        """Analyze plank position"""
-        # Implementation for plank analysis
-        # Similar structure as general posture but with plank-specific checks
-        pass
+    def _infer_roi(self, rgb_image, session, timer=NULL_TIMER, full_frame_fallback=True):
+        """MediaPipe pass on the area around the session's previous pose (see roi_tracker)"""
+        roi = session.roi
+        height, width = rgb_image.shape[:2]
+        image, window = roi.crop(rgb_image)
+        timer.lap("roi")
+        landmarks = self._process(image, session, timer)
+        if landmarks is None and window is not None and full_frame_fallback:
+            # Lost inside the window (or the tracker missed it after the window moved): detect on
+            # the full frame, so a lost frame costs at most two passes
+            roi.reset()
+            landmarks = self._process(rgb_image, session, timer)
+            window = None
+        landmarks = roi.update(landmarks, window, width, height)
+        timer.lap("roi")
+        return landmarks
     
-    def analyze_squat(self, landmarks):
-        """Analyze squat position"""
-        # Implementation for squat analysis
-        pass
+    def _process(self, rgb_image, session=None, timer=NULL_TIMER):
+        """One MediaPipe pass (consecutive frames of a session reuse its tracker)"""
+        results = self.get_pose(session).process(rgb_image)
+        timer.lap("inference")
+        landmarks = self.extract_landmarks(results.pose_landmarks) if results.pose_landmarks else None
+        timer.lap("extract")
+        return landmarks
     
-    def analyze_pushup(self, landmarks):
-        """Analyze push-up position"""
-        # Implementation for push-up analysis
-        pass
+    def close_session(self, session_id):
+        """Release a session's tracker and its cached results"""
+        return self.sessions.close(session_id)
+    
+    def _drop_cached(self, session_id):
+        """Forget a closed or evicted session's cached results"""
+        if self.cache is not None:
+            self.cache.drop_scope(session_id)
+    
+    def extract_landmarks(self, pose_landmarks):
+        """Extract pose landmarks into a (33, 4) float32 array"""
+        return Landmarks.from_pose_landmarks(pose_landmarks)
+    
+    def format_landmarks(self, landmarks, landmarks_format="dict"):
+        """Convert landmarks for the JSON response (only built when the client asks)"""
+        if landmarks_format == "dict":
+            return landmarks.to_dict()
+        if landmarks_format == "rows":
+            return landmarks.to_rows()
+        if landmarks_format == "array":
+            return landmarks.data
+        return None
+    
+    def calculate_angle(self, point1, point2, point3):
+        """Calculate angle at point2 between three landmark rows (uses x, y)"""
+        angle = angles_between(point1[:2], point2[:2], point3[:2])
+        return 0 if np.isnan(angle) else float(angle)
+    
+    def compute_angles(self, landmarks, exercise="general"):
+        """All joint angles of an exercise template for one frame or a (N, 33, 4) sequence"""
+        return self.exercise_templates[exercise]["angles"].compute(landmarks)
+    
+    def analyze_general_posture(self, landmarks, angles=None, state=None, timestamp=None):
+        """General posture analysis (shoulder/hip alignment, uprightness, stability)"""
+        metrics = analyze_general_posture_batch(landmarks.data[np.newaxis])
+        return frame_analysis(metrics, 0)
+    
+    def analyze_plank(self, landmarks, angles, state=None, timestamp=None):
+        """Analyze plank position: body line, shoulder stacking and hold time"""
+        state = state or PlankState()
+        return state.update(landmarks, angles, timestamp if timestamp is not None else time.monotonic())
+    
+    def analyze_squat(self, landmarks, angles, state=None, timestamp=None):
+        """Analyze squat: knee-angle rep counting, depth, chest position and tempo"""
+        state = state or SquatState()
+        return state.update(landmarks, angles, timestamp if timestamp is not None else time.monotonic())
+    
+    def analyze_pushup(self, landmarks, angles, state=None, timestamp=None):
+        """Analyze push-up: elbow-angle rep counting, depth and body line"""
+        state = state or PushupState()
+        return state.update(landmarks, angles, timestamp if timestamp is not None else time.monotonic())
+
+# Pose inference runs in a pool of worker processes, each with its own analyzer
+inference_pool = InferencePool()
+http_in_flight = 0
+
+async def http_metrics(request: Request, call_next):
+    """Count and time every HTTP request by route template (bounded label set)"""
+    global http_in_flight
+    http_in_flight += 1
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_in_flight -= 1
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REGISTRY.observe("http_request_duration_seconds", time.perf_counter() - start, route=path)
+        REGISTRY.inc("http_requests_total", route=path, method=request.method, status=status)
+
+async def start_inference_pool(background=False):
+    """Spawn the workers and load their models; with background=True return immediately
 
-# Initialize pose analyzer
-analyzer = PoseAnalyzer()
+    Requests that arrive while a background warm-up is running simply queue
+    on their worker; inference_pool.warmed tells when the models are loaded.
+    """
+    # Registered here rather than at import, since the worker processes import this module too
+    REGISTRY.gauge("pose_queue_depth", lambda: inference_pool.pending)
+    REGISTRY.gauge("pose_queue_capacity", lambda: inference_pool.max_pending)
+    REGISTRY.gauge("pose_workers", lambda: inference_pool.workers)
+    REGISTRY.gauge("http_requests_in_flight", lambda: http_in_flight)
+    warmup = asyncio.get_running_loop().run_in_executor(None, inference_pool.start)
+    if not background:
+        await warmup
+        return
+    started = time.perf_counter()
+
+    def warmed(future):
+        if future.exception() is not None:
+            print(f"❌ Inference warm-up failed: {inference_pool.warm_error}")
+        else:
+            print(f"🔥 {inference_pool.workers} inference worker(s) warm in {time.perf_counter() - started:.1f}s")
+    warmup.add_done_callback(warmed)
+
+async def stop_inference_pool():
+    inference_pool.shutdown()
+
+def check_exercise(exercise):
+    if exercise not in EXERCISE_NAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown exercise '{exercise}', expected one of: {', '.join(EXERCISE_NAMES)}"
+        )
 
-@app.get("/")
+def check_precision(precision):
+    if precision not in ("f16", "f32"):
+        raise HTTPException(status_code=400, detail="precision must be 'f16' or 'f32'")
+
+def at_capacity():
+    """503 with Retry-After for a request the inference pool could not admit"""
+    REGISTRY.inc("pose_requests_rejected_total")
+    return HTTPException(
+        status_code=503,
+        detail="Pose analysis is at capacity, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def run_analysis(image_data, session_id=None, include_landmarks=True, exercise="general", raw=None,
+                       accept=None, precision="f16", response=None, people=False):
+    """Submit frame bytes to the worker pool and map failures to HTTP errors
+
+    raw is None for encoded images, or (width, height, pixel_format) for raw pixels.
+    When the Accept header asks for MEDIA_TYPE the result is returned as a packed
+    binary response (see pose_codec) instead of JSON. With POSE_SERVER_TIMING=1 the
+    frame's stage durations are reported in a Server-Timing header. people=True runs
+    multi-person analysis (JSON only, the binary format holds one pose).
+    """
+    check_exercise(exercise)
+    binary = wants_binary(accept) and not people
+    if binary:
+        check_precision(precision)
+        landmarks_format = "array" if include_landmarks else "none"
+    else:
+        landmarks_format = "dict" if include_landmarks else "none"
+    try:
+        # Frames of one session always go to the same worker, where its tracker lives
+        start = time.perf_counter()
+        result = await inference_pool.run(
+            analyze_people_image if people else analyze_image, image_data, session_id, landmarks_format,
+            exercise, raw, pose_metrics.TIMING, key=session_id
+        )
+        timings = result.pop("timings", None)
+        if timings is not None:
+            # Whatever the worker did not account for was spent queued or crossing processes
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            timings["queue"] = max(0.0, elapsed_ms - sum(timings.values()))
+            REGISTRY.observe("pose_stage_seconds", timings["queue"] / 1000, stage="queue")
+        if binary:
+            start = time.perf_counter()
+            response = Response(encode_result(result, exercise, precision), media_type=MEDIA_TYPE)
+            if timings is not None:
+                timings["encode"] = (time.perf_counter() - start) * 1000
+        if pose_metrics.SERVER_TIMING and timings is not None and response is not None:
+            response.headers["Server-Timing"] = pose_metrics.server_timing(timings)
+        return response if binary else result
+    except PoolSaturatedError:
+        raise at_capacity()
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/")
 async def root():
     return {
         "message": "AI Fitness Trainer - Pose Analysis API",
@@ -241,12 +540,23 @@ async def root():
         "version": "1.0.0"
     }
 
-@app.post("/analyze_pose/")
-async def analyze_pose(file: UploadFile = File(...)):
+@router.post("/analyze_pose/")
+async def analyze_pose(
+    response: Response,
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    exercise: str = Form("general"),
+    x_session_id: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    include_landmarks: bool = True,
+    precision: str = "f16"
+):
     """
     Analyze pose from uploaded image
-    Expects: image file (JPG, PNG)
-    Returns: pose analysis results
+    Expects: image file (JPG, PNG), optional session id (X-Session-ID header or form field)
+    and exercise (general, plank, squat, pushup)
+    Returns: pose analysis results (landmarks omitted with ?include_landmarks=false);
+    packed binary with "Accept: application/x-pose-result" (?precision=f16|f32)
     """
     try:
         # Validate file type
@@ -256,26 +566,55 @@ async def analyze_pose(file: UploadFile = File(...)):
         # Read image file
         image_data = await file.read()
         
-        # Convert to OpenCV format
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image format")
-        
-        # Analyze pose
-        result = analyzer.analyze_pose(image)
-        
-        return result
+        # Decode and analyze pose in a worker process
+        return await run_analysis(
+            image_data, x_session_id or session_id, include_landmarks, exercise, accept=accept,
+            precision=precision, response=response
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.post("/analyze_pose_base64/")
-async def analyze_pose_base64(data: dict):
+@router.post("/analyze_people/")
+async def analyze_people(
+    response: Response,
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    exercise: str = Form("general"),
+    x_session_id: Optional[str] = Header(None),
+    include_landmarks: bool = True
+):
+    """
+    Multi-person analysis of an uploaded image
+    Same inputs as /analyze_pose/. Returns one result per person under "people", each with a
+    person_id that stays the same across a session's frames, its box and its own exercise state
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    image_data = await file.read()
+    try:
+        return await run_analysis(
+            image_data, x_session_id or session_id, include_landmarks, exercise, response=response, people=True
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze_pose_base64/")
+async def analyze_pose_base64(
+    response: Response,
+    data: dict,
+    x_session_id: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    include_landmarks: bool = True,
+    precision: str = "f16"
+):
     """
     Analyze pose from base64 encoded image
-    Expects: {"image": "base64_string"}
+    Expects: {"image": "base64_string", "session_id": "optional", "exercise": "optional"}
     Returns: pose analysis results
     """
     try:
@@ -284,24 +623,364 @@ async def analyze_pose_base64(data: dict):
         
         # Decode base64 image
         image_data = base64.b64decode(data["image"])
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image format")
+        # Decode and analyze pose in a worker process
+        return await run_analysis(
+            image_data, x_session_id or data.get("session_id"), include_landmarks,
+            data.get("exercise", "general"), accept=accept, precision=precision, response=response
+        )
         
-        # Analyze pose
-        result = analyzer.analyze_pose(image)
-        
-        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze_pose_raw/")
+async def analyze_pose_raw(
+    request: Request,
+    response: Response,
+    x_frame_width: int = Header(...),
+    x_frame_height: int = Header(...),
+    x_pixel_format: str = Header("rgb24"),
+    x_session_id: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    exercise: str = "general",
+    include_landmarks: bool = True,
+    precision: str = "f16"
+):
+    """
+    Analyze pose from raw pixels, skipping image decoding entirely
+    Expects: request body of raw pixels with X-Frame-Width, X-Frame-Height and
+    X-Pixel-Format (rgb24, bgr24, i420, nv12, nv21) headers
+    Returns: pose analysis results
+    """
+    try:
+        if x_pixel_format not in RAW_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported pixel format, expected one of: {', '.join(RAW_FORMATS)}"
+            )
+        image_data = await request.body()
+        return await run_analysis(
+            image_data, x_session_id, include_landmarks, exercise,
+            raw=(x_frame_width, x_frame_height, x_pixel_format), accept=accept, precision=precision,
+            response=response
+        )
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+# Batch requests are split into small chunks so they interleave with live frames
+BATCH_MAX_FRAMES = int(os.getenv("POSE_BATCH_MAX_FRAMES", "256"))
+BATCH_CHUNK_SIZE = int(os.getenv("POSE_BATCH_CHUNK_SIZE", "8"))
+
+async def read_batch_frames(request: Request):
+    """Collect encoded frames from a multipart upload or one concatenated buffer"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        return [await f.read() for f in form.getlist("files")]
+
+    # Concatenated buffer: X-Frame-Lengths lists each frame's byte length in order
+    lengths_header = request.headers.get("x-frame-lengths")
+    if not lengths_header:
+        raise HTTPException(status_code=400, detail="Missing X-Frame-Lengths header for concatenated frames")
+    try:
+        lengths = [int(n) for n in lengths_header.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid X-Frame-Lengths header")
+    body = await request.body()
+    if sum(lengths) != len(body) or any(n <= 0 for n in lengths):
+        raise HTTPException(status_code=400, detail="X-Frame-Lengths does not match request body")
+    frames, offset = [], 0
+    for n in lengths:
+        frames.append(body[offset:offset + n])
+        offset += n
+    return frames
+
+async def run_batch_detection(frames):
+    """Fan chunks of frames out over the worker pool, waiting for room when it is full"""
+    in_flight = set()
+    futures = []
+    for start in range(0, len(frames), BATCH_CHUNK_SIZE):
+        chunk = frames[start:start + BATCH_CHUNK_SIZE]
+        while True:
+            try:
+                future = asyncio.wrap_future(inference_pool.submit(detect_landmarks_batch, chunk))
+                break
+            except PoolSaturatedError:
+                if not in_flight:
+                    raise
+                _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        in_flight.add(future)
+        futures.append(future)
+    return await asyncio.gather(*futures)
+
+@router.post("/analyze_pose_batch/")
+async def analyze_pose_batch(request: Request, include_landmarks: bool = False):
+    """
+    Analyze many frames in one request
+    Expects: multipart "files" parts, or an application/octet-stream body of
+    concatenated images with an X-Frame-Lengths header (comma separated byte counts)
+    Returns: per-frame results in input order plus batch summary
+    """
+    try:
+        frames = await read_batch_frames(request)
+        if not frames:
+            raise HTTPException(status_code=400, detail="No frames provided")
+        if len(frames) > BATCH_MAX_FRAMES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_FRAMES} frames")
+
+        # Detection runs in the workers; metrics are computed here for the whole batch at once
+        landmarks = empty_landmarks(len(frames))
+        detected = np.zeros(len(frames), dtype=bool)
+        invalid = []
+        offset = 0
+        for chunk_landmarks, chunk_detected, chunk_invalid in await run_batch_detection(frames):
+            n = len(chunk_detected)
+            landmarks[offset:offset + n] = chunk_landmarks
+            detected[offset:offset + n] = chunk_detected
+            invalid.extend(offset + i for i in chunk_invalid)
+            offset += n
+
+        results = build_frame_results(landmarks, detected, invalid, include_landmarks)
+        scored = [r["accuracy"] for r in results if r["success"]]
+        return {
+            "frames": len(frames),
+            "detected": int(detected.sum()),
+            "mean_accuracy": float(np.mean(scored)) if scored else 0.0,
+            "results": results
+        }
+
+    except HTTPException:
+        raise
+    except PoolSaturatedError:
+        raise at_capacity()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-@app.get("/health")
+@router.post("/analyze_video/")
+async def analyze_video_upload(
+    video: UploadFile = File(...),
+    exercise: str = Form("general"),
+    stride: Optional[int] = Form(None),
+    include_landmarks: bool = False
+):
+    """
+    Analyze a recorded workout video
+    Expects: video file (MP4, MOV, AVI), optional exercise and stride (analyze every n-th frame)
+    Returns: per-frame time series (accuracy, joint angles, optional key landmarks),
+    scored reps and a summary; chunks of the video are processed in parallel workers
+    """
+    check_exercise(exercise)
+    if stride is not None and stride < 1:
+        raise HTTPException(status_code=400, detail="stride must be at least 1")
+    # Workers read the video themselves, so it is spooled to a file they can open
+    suffix = os.path.splitext(video.filename or "")[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        path = tmp.name
+        await asyncio.get_running_loop().run_in_executor(None, shutil.copyfileobj, video.file, tmp)
+    try:
+        return await analyze_video(inference_pool, path, exercise, stride, include_landmarks=include_landmarks)
+    except InvalidVideoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError:
+        raise at_capacity()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        os.unlink(path)
+
+@router.websocket("/ws/pose")
+async def pose_stream(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    exercise: str = "general",
+    pixel_format: Optional[str] = None,
+    width: int = 0,
+    height: int = 0,
+    format: str = "json",
+    precision: str = "f16",
+    include_landmarks: bool = True
+):
+    """
+    Continuous pose analysis over a WebSocket
+    Expects: binary messages, each one encoded image (JPG), or raw pixels when
+    pixel_format, width and height are given as query parameters
+    Returns: one compact JSON result per analyzed frame, or with format=binary one
+    binary packet (see /formats/binary); frames that arrive while inference is busy
+    are replaced by newer ones (latest frame wins)
+    """
+    await websocket.accept()
+    if exercise not in EXERCISE_NAMES:
+        await websocket.close(code=1008, reason=f"Unknown exercise '{exercise}'")
+        return
+    if pixel_format is not None and pixel_format not in RAW_FORMATS:
+        await websocket.close(code=1008, reason=f"Unsupported pixel format '{pixel_format}'")
+        return
+    if format not in ("json", "binary") or precision not in ("f16", "f32"):
+        await websocket.close(code=1008, reason="format must be json|binary and precision f16|f32")
+        return
+    binary = format == "binary"
+    if include_landmarks:
+        landmarks_format = "array" if binary else "rows"
+    else:
+        landmarks_format = "none"
+    raw = (width, height, pixel_format) if pixel_format else None
+    session_id = session_id or uuid.uuid4().hex
+    slot = LatestFrameSlot()
+    dropped_reported = 0
+    await websocket.send_json({"session_id": session_id, "landmarks": KEY_NAMES})
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                slot.put(message["bytes"])
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            taker = asyncio.create_task(slot.take())
+            done, _ = await asyncio.wait({receiver, taker}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                taker.cancel()
+                receiver.result()
+                break
+            seq, frame = taker.result()
+            try:
+                result = await inference_pool.run(
+                    analyze_image, frame, session_id, landmarks_format, exercise, raw, key=session_id
+                )
+            except PoolSaturatedError:
+                # Count the frame as dropped; the next one received will be tried instead
+                slot.dropped += 1
+                REGISTRY.inc("pose_requests_rejected_total")
+                await asyncio.sleep(0.01)
+                continue
+            except (InvalidImageError, WorkerCrashedError) as e:
+                await websocket.send_json({"seq": seq, "ok": False, "fb": str(e)})
+                continue
+            REGISTRY.inc("pose_frames_dropped_total", slot.dropped - dropped_reported, source="websocket")
+            dropped_reported = slot.dropped
+            if binary:
+                await websocket.send_bytes(encode_stream_result(result, seq, slot.dropped, exercise, precision))
+            else:
+                await websocket.send_json(compact_result(result, seq, slot.dropped))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        REGISTRY.inc("pose_frames_dropped_total", slot.dropped - dropped_reported, source="websocket")
+        try:
+            inference_pool.submit(close_session, session_id, key=session_id)
+        except PoolSaturatedError:
+            pass  # Idle timeout will release the tracker
+
+@router.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    """Release the pose tracker held for a session"""
+    try:
+        closed = await inference_pool.run(close_session, session_id, key=session_id)
+    except PoolSaturatedError:
+        raise at_capacity()
+    return {"session_id": session_id, "closed": closed}
+
+@router.get("/sessions/{session_id}/summary")
+async def session_summary(session_id: str):
+    """Aggregates of a recorded session (POSE_RECORD=1), read from its meta file only"""
+    summary = await asyncio.get_running_loop().run_in_executor(None, read_summary, session_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No recording for session '{session_id}'")
+    return summary
+
+@router.get("/sessions/{session_id}/series")
+async def session_series(
+    session_id: str,
+    columns: str = "accuracy,angles",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+):
+    """Downsampled time series of a recorded session, from start to end seconds"""
+    if max_points < 1:
+        raise HTTPException(status_code=400, detail="max_points must be at least 1")
+    try:
+        series = await asyncio.get_running_loop().run_in_executor(
+            None, read_series, session_id, [c.strip() for c in columns.split(",") if c.strip()], start, end, max_points
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"No recording for session '{session_id}'")
+    return series
+
+@router.get("/formats/binary")
+async def binary_format():
+    """Feedback code table, landmark/angle order and packet layout of the binary format"""
+    return format_description()
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Frame cache hit/miss counters summed over all workers"""
+    per_worker = [stats for stats in await inference_pool.run_all(cache_stats) if stats]
+    if not per_worker:
+        return {"enabled": False}
+    totals = {key: sum(stats[key] for stats in per_worker)
+              for key in ("entries", "hits", "near_hits", "misses", "evictions")}
+    lookups = totals["hits"] + totals["near_hits"] + totals["misses"]
+    totals["hit_rate"] = round((totals["hits"] + totals["near_hits"]) / lookups, 4) if lookups else 0.0
+    return {"enabled": True, **totals, "workers": per_worker}
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics of the API process and every inference worker"""
+    if not pose_metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (POSE_METRICS=0)")
+    snapshots = [REGISTRY.snapshot()]
+    if inference_pool.started:
+        snapshots += await inference_pool.run_all(metrics_snapshot)
+    merged = pose_metrics.merge(snapshots)
+    
+    lookups = {key: value for (name, key), value in merged["gauges"].items() if name == "pose_cache_lookups_total"}
+    if lookups:
+        total = sum(lookups.values())
+        misses = lookups.get(labels(result="miss"), 0)
+        merged["gauges"][("pose_cache_hit_ratio", ())] = round((total - misses) / total, 4) if total else 0.0
+    return Response(pose_metrics.render(merged), media_type=pose_metrics.CONTENT_TYPE)
+
+@router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "pose-analysis"}
+    return {"status": "healthy", "service": "pose-analysis", "inference": inference_pool.stats()}
+
+def create_app(title="AI Fitness Trainer - Pose Analysis API", background_warmup=False, **kwargs):
+    """FastAPI app with CORS, metrics middleware, the analysis routes and the worker pool lifecycle"""
+    app = FastAPI(title=title, **kwargs)
+    # Allow requests from the Node.js/Vercel app
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    if pose_metrics.ENABLED:
+        app.middleware("http")(http_metrics)
+    app.include_router(router)
+
+    @app.on_event("startup")
+    async def start_pool():
+        await start_inference_pool(background_warmup)
+
+    app.on_event("shutdown")(stop_inference_pool)
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
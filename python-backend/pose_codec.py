@@ -0,0 +1,179 @@
+"""
+Compact binary encoding of analysis results
+Fixed-layout little-endian packet: header, numeric feedback codes, joint angles, exercise
+counters and packed float16/float32 key landmarks
+
+Layout (version 1):
+  header    <2sBBBBBB  magic b"PR", version, flags, exercise, accuracy, n_feedback, n_angles
+  feedback  n_feedback x uint8   codes into FEEDBACK_MESSAGES (0 = other / free text)
+  angles    n_angles x float32   in the exercise's angle order, NaN when not visible
+  counters  <HHffffff            only for rep/hold exercises: reps, partial_reps, hold_time,
+                                 current_hold, best_hold, last_rep_depth, eccentric, concentric
+  landmarks 13 x 4 x float16|32  key landmarks [x, y, z, visibility], only with FLAG_LANDMARKS
+
+On /ws/pose each packet is prefixed with <II: frame sequence number, frames dropped so far.
+"""
+
+import math
+import struct
+
+import numpy as np
+
+from exercises import EXERCISE_NAMES, TEMPLATE_FEEDBACK
+from joint_angles import EXERCISE_ANGLES
+from landmarks import KEY_INDICES, KEY_NAMES
+from template_matching import JOINT_NAMES
+
+MEDIA_TYPE = "application/x-pose-result"
+MAGIC = b"PR"
+VERSION = 1
+
+FLAG_SUCCESS = 0x01
+FLAG_LANDMARKS = 0x02
+FLAG_FLOAT16 = 0x04
+
+HEADER = struct.Struct("<2sBBBBBB")
+COUNTERS = struct.Struct("<HHffffff")
+STREAM_PREFIX = struct.Struct("<II")
+
+# Codes are positions in this tuple plus one; append only, so existing codes stay valid
+FEEDBACK_MESSAGES = (
+    "No pose detected. Please ensure you're fully visible in the camera.",
+    "Please ensure your full body is visible in the camera",
+    "Invalid image format",
+    "Keep your shoulders level",
+    "Good shoulder alignment",
+    "Align your hips properly",
+    "Good hip alignment",
+    "Maintain upright posture",
+    "Good pose stability",
+    "Try to stay more stable",
+    "Rep complete",
+    "Slow down on the way down",
+    "Squat deeper",
+    "Keep your chest up",
+    "Keep your weight even on both legs",
+    "Good squat form",
+    "Lower your chest further",
+    "Keep your body in a straight line",
+    "Good push-up form",
+    "Lower your hips",
+    "Lift your hips",
+    "Stack your shoulders over your elbows",
+    "Great plank, hold it",
+    # Template matching: one code per joint the rep can differ at
+    *(TEMPLATE_FEEDBACK + name.replace("_", " ") for name in JOINT_NAMES),
+)
+FEEDBACK_CODES = {message: code for code, message in enumerate(FEEDBACK_MESSAGES, start=1)}
+REP_COMPLETE = FEEDBACK_CODES["Rep complete"]
+
+
+def feedback_codes(feedback):
+    """ "A | B" feedback text -> list of codes; "Rep N complete" maps to REP_COMPLETE"""
+    codes = []
+    for message in feedback.split(" | ") if feedback else ():
+        if message.startswith("Rep ") and message.endswith(" complete"):
+            codes.append(REP_COMPLETE)
+        else:
+            codes.append(FEEDBACK_CODES.get(message, 0))
+    return codes
+
+
+def wants_binary(accept):
+    """Whether an Accept header asks for the binary format"""
+    return bool(accept) and MEDIA_TYPE in accept
+
+
+def _number(value):
+    return math.nan if value is None else float(value)
+
+
+def encode_result(result, exercise="general", precision="f16"):
+    """Pack an analysis result; landmarks must be a (33, 4) array (landmarks_format="array") or None"""
+    flags = 0
+    if result.get("success"):
+        flags |= FLAG_SUCCESS
+    landmarks = result.get("landmarks")
+    if landmarks is not None:
+        flags |= FLAG_LANDMARKS
+        if precision == "f16":
+            flags |= FLAG_FLOAT16
+
+    codes = feedback_codes(result.get("feedback", ""))
+    angle_names = EXERCISE_ANGLES[exercise].names
+    angles = result.get("angles") or {}
+    parts = [
+        HEADER.pack(MAGIC, VERSION, flags, EXERCISE_NAMES.index(exercise),
+                    int(max(0, min(100, result.get("accuracy", 0)))), len(codes), len(angle_names)),
+        bytes(codes),
+        np.array([_number(angles.get(name)) for name in angle_names], dtype="<f4").tobytes(),
+    ]
+
+    if exercise != "general":
+        details = result.get("detailed_analysis") or {}
+        tempo = details.get("tempo") or {}
+        parts.append(COUNTERS.pack(
+            details.get("reps", 0), details.get("partial_reps", 0),
+            _number(details.get("hold_time")), _number(details.get("current_hold")),
+            _number(details.get("best_hold")), _number(details.get("last_rep_depth")),
+            _number(tempo.get("eccentric")), _number(tempo.get("concentric"))
+        ))
+
+    if landmarks is not None:
+        dtype = "<f2" if precision == "f16" else "<f4"
+        parts.append(np.asarray(landmarks)[KEY_INDICES].astype(dtype).tobytes())
+    return b"".join(parts)
+
+
+def encode_stream_result(result, seq, dropped=0, exercise="general", precision="f16"):
+    """Packet for the WebSocket stream: sequence/dropped prefix plus encode_result()"""
+    return STREAM_PREFIX.pack(seq, dropped) + encode_result(result, exercise, precision)
+
+
+def decode_result(data):
+    """Inverse of encode_result, for Python clients and debugging"""
+    magic, version, flags, exercise_index, accuracy, n_feedback, n_angles = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version 1 pose result packet")
+    exercise = EXERCISE_NAMES[exercise_index]
+    offset = HEADER.size
+
+    codes = list(data[offset:offset + n_feedback])
+    offset += n_feedback
+    angles = np.frombuffer(data, "<f4", n_angles, offset)
+    offset += 4 * n_angles
+
+    result = {
+        "success": bool(flags & FLAG_SUCCESS),
+        "exercise": exercise,
+        "accuracy": accuracy,
+        "feedback_codes": codes,
+        "angles": dict(zip(EXERCISE_ANGLES[exercise].names, angles.tolist())),
+        "landmarks": None,
+    }
+    if exercise != "general":
+        values = COUNTERS.unpack_from(data, offset)
+        offset += COUNTERS.size
+        result["counters"] = dict(zip(
+            ("reps", "partial_reps", "hold_time", "current_hold", "best_hold",
+             "last_rep_depth", "eccentric", "concentric"), values
+        ))
+    if flags & FLAG_LANDMARKS:
+        dtype = "<f2" if flags & FLAG_FLOAT16 else "<f4"
+        result["landmarks"] = np.frombuffer(data, dtype, len(KEY_INDICES) * 4, offset).reshape(-1, 4)
+    return result
+
+
+def format_description():
+    """Everything a client needs to decode packets: code table, landmark and angle order"""
+    return {
+        "media_type": MEDIA_TYPE,
+        "version": VERSION,
+        "flags": {"success": FLAG_SUCCESS, "landmarks": FLAG_LANDMARKS, "float16": FLAG_FLOAT16},
+        "exercises": list(EXERCISE_NAMES),
+        "feedback_codes": {code: message for message, code in FEEDBACK_CODES.items()},
+        "landmarks": KEY_NAMES,
+        "angles": {name: angle_set.names for name, angle_set in EXERCISE_ANGLES.items()},
+        "layout": __doc__.split("Layout (version 1):")[1].strip(),
+        "stream_prefix": "<II seq, dropped",
+    }
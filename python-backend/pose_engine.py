@@ -0,0 +1,212 @@
+"""
+Pose engine
+One pipeline behind every front end: frames from an upload, a webcam, an RTSP stream or a
+video file go through the same session-tracked, adaptive, smoothed PoseAnalyzer, and the
+annotated results go out to pluggable sinks (window, MJPEG, video file, JSON lines)
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from adaptive_pose import preload_models
+from capture import LatestFrameReader, LatestSlot, open_capture
+from frame_decoder import decode_frame
+from frame_sinks import close_sinks, open_sinks, publish
+from landmarks import Landmarks
+from overlay import OverlayRenderer
+from pose_metrics import frame_timer
+
+DEFAULT_WEBCAM_SIZE = (1280, 720)
+
+
+def webcam_factory(width=DEFAULT_WEBCAM_SIZE[0], height=DEFAULT_WEBCAM_SIZE[1]):
+    """capture_factory for LatestFrameReader that opens a local camera at a requested size"""
+    def open_webcam(source):
+        capture = cv2.VideoCapture(int(source))
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return capture
+    return open_webcam
+
+
+def open_source(source, name=None, **webcam_size):
+    """Frame source for a webcam index, an RTSP/HTTP URL, a video file or a synthetic:// spec
+
+    Sources are LatestFrameReaders: capture runs on its own thread, keeps only
+    the newest frame and reconnects when the stream drops.
+    """
+    source = str(source)
+    if source.isdigit():
+        return LatestFrameReader(source, name or f"webcam-{source}", capture_factory=webcam_factory(**webcam_size))
+    return LatestFrameReader(source, name or "capture", capture_factory=open_capture)
+
+
+def sink_record(result, seq):
+    """(landmarks, info) handed to the sinks for one analyzed frame"""
+    if "people" not in result:
+        landmarks = result.get("landmarks")
+        return None if landmarks is None else Landmarks(landmarks), {"frame": seq}
+    people = [
+        {"person_id": person["person_id"], "box": person["box"],
+         "landmarks": np.round(person["landmarks"].astype(np.float64), 4).tolist()}
+        for person in result["people"]
+    ]
+    return None, {"frame": seq, "people": people}
+
+
+class PoseEngine:
+    """Shared analysis pipeline for uploads, live cameras and files
+
+    Every frame goes through PoseAnalyzer.analyze_pose with a session id, so
+    tracking, adaptive model complexity, temporal smoothing/keyframe skipping,
+    the frame cache and exercise state apply whatever the frame came from.
+    Uploads call analyze_bytes() (in the inference workers); live sources are
+    driven by run(), which draws results with an OverlayRenderer at
+    render_scale of the source resolution.
+    """
+
+    def __init__(self, analyzer=None, exercise="general", people=False, render_scale=1.0):
+        if analyzer is None:
+            # Imported here: pose_analyzer also builds the web app
+            from pose_analyzer import PoseAnalyzer
+            analyzer = PoseAnalyzer()
+        self.analyzer = analyzer
+        self.exercise = exercise
+        # Multi-person mode: results carry one entry per tracked person under "people"
+        self.people = people
+        self.renderer = OverlayRenderer(render_scale)
+        self.frames_analyzed = 0
+
+    def analyze_rgb(self, rgb_image, session_id=None, landmarks_format="dict", exercise=None,
+                    timestamp=None, timer=None, people=None):
+        analyze = self.analyzer.analyze_people if (self.people if people is None else people) \
+            else self.analyzer.analyze_pose
+        return analyze(rgb_image, session_id, landmarks_format, exercise or self.exercise, timestamp, timer=timer)
+
+    def analyze_bytes(self, data, session_id=None, landmarks_format="dict", exercise=None, raw=None, timer=None,
+                      people=None):
+        """Encoded image bytes, or raw pixels with raw=(width, height, pixel_format)"""
+        timer = timer if timer is not None else frame_timer()
+        image = decode_frame(data, raw)
+        timer.lap("decode")
+        return self.analyze_rgb(image, session_id, landmarks_format, exercise, timer=timer, people=people)
+
+    def analyze_bgr(self, frame, session_id, exercise=None, timestamp=None):
+        """Live BGR frame -> result with landmarks as a (33, 4) array"""
+        timer = frame_timer()
+        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        timer.lap("decode")
+        return self.analyze_rgb(rgb_image, session_id, "array", exercise, timestamp, timer=timer)
+
+    def run(self, source, sink_specs=(), window=None, session_id=None, stop=None):
+        """Analyze a live source until it is stopped, 'q' is pressed or Ctrl+C
+
+        Three stages: the source's capture thread keeps only the newest frame,
+        an inference thread analyzes it, and the calling thread draws the
+        newest result, hands it to the sinks (which encode on their own
+        threads) and shows it in `window` unless that is None (headless).
+        Frames that arrive while inference is busy are dropped, not queued.
+        Returns the source's capture counters plus frames analyzed.
+        """
+        session_id = session_id or source.name
+        stop = stop or threading.Event()
+        # Fetched now rather than by the frame that first changes quality level
+        preload_models()
+        results = LatestSlot()
+        sinks = open_sinks(sink_specs)
+        source.start()
+        inference = threading.Thread(target=self._inference_loop, args=(source, session_id, results, stop),
+                                     name=f"{source.name}-inference", daemon=True)
+        inference.start()
+        if window is not None:
+            cv2.namedWindow(window, cv2.WINDOW_NORMAL)
+
+        try:
+            while not stop.is_set():
+                seq, item = results.take(timeout=0.1)
+                if item is not None:
+                    frame, result = item
+                    frame = self.renderer.render(frame, result)
+                    if sinks:
+                        publish(sinks, frame, *sink_record(result, seq))
+                if window is None:
+                    continue
+
+                if item is not None:
+                    try:
+                        cv2.imshow(window, frame)
+                    except Exception as show_err:
+                        print(f"Display error: {show_err}")
+                        break
+                # Exit on 'q' key press (also keeps the window responsive while reconnecting)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            source.stop()
+            inference.join(timeout=5)
+            close_sinks(sinks)
+            if window is not None:
+                cv2.destroyAllWindows()
+            self.analyzer.close_session(session_id)
+        return {**source.stats(), "frames_analyzed": self.frames_analyzed}
+
+    def _inference_loop(self, source, session_id, results, stop):
+        """Inference stage: newest captured frame in, (frame, result) out"""
+        while not stop.is_set():
+            frame = source.read(timeout=0.5)
+            if frame is None:
+                continue
+            try:
+                results.put((frame, self.analyze_bgr(frame, session_id, timestamp=time.monotonic())))
+                self.frames_analyzed += 1
+            except Exception as e:
+                print(f"Inference error: {e}")
+
+
+class LiveDetector:
+    """Shared setup of the live front ends (webcam, RTSP, pose_engine's own CLI)
+
+    Same pipeline as the API (tracking session, ROI cropping, adaptive model
+    complexity, smoothing, exercise analysis); capture runs on its own thread
+    and keeps only the newest frame (see PoseEngine.run). Headless mode never
+    opens a window, so annotated frames only go to the sinks.
+    """
+
+    window_title = "AI Fitness Trainer - Pose Engine"
+
+    def __init__(self, headless=False, sinks=(), exercise="general", people=False, render_scale=1.0):
+        self.engine = PoseEngine(exercise=exercise, people=people, render_scale=render_scale)
+        self.headless = headless
+        self.sink_specs = list(sinks)
+
+    def run(self, source):
+        """Analyze the source until stopped; returns PoseEngine.run's counters"""
+        print("👋 Press Ctrl+C to quit" if self.headless else "👋 Press 'q' to quit")
+        return self.engine.run(source, self.sink_specs, None if self.headless else self.window_title)
+
+
+def main():
+    import argparse
+    from exercises import EXERCISE_NAMES
+    from frame_sinks import add_output_arguments
+
+    parser = argparse.ArgumentParser(description="Live pose analysis of any source")
+    parser.add_argument("source", help="Webcam index, RTSP/HTTP URL, video file or synthetic://WxH@FPS")
+    parser.add_argument("--exercise", default="general", choices=EXERCISE_NAMES)
+    parser.add_argument("--people", action="store_true", help="Multi-person mode (one tracked result per person)")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
+    detector = LiveDetector(args.headless, args.sinks, args.exercise, args.people, args.render_scale)
+    stats = detector.run(open_source(args.source))
+    print(f"📊 {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Pose pipeline metrics
+Per-frame stage timers, counters, histograms and gauges kept per process, merged across the
+inference workers and rendered in the Prometheus text format for /metrics
+"""
+
+import os
+import time
+from bisect import bisect_left
+
+# POSE_METRICS=0 turns recording off entirely (timers become no-ops)
+ENABLED = os.getenv("POSE_METRICS", "1") == "1"
+# Adds a Server-Timing header with the frame's stage durations to analysis responses
+SERVER_TIMING = os.getenv("POSE_SERVER_TIMING", "0") == "1"
+TIMING = ENABLED or SERVER_TIMING
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram upper bounds in seconds, from cheap stages (<1 ms) to slow inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Every exported metric: (type, help)
+METRICS = {
+    "pose_stage_seconds": ("histogram", "Time spent per pipeline stage of a frame"),
+    "pose_frames_total": ("counter", "Frames analyzed, by outcome and model complexity"),
+    "pose_errors_total": ("counter", "Frames whose analysis raised, by exception type"),
+    "pose_frames_dropped_total": ("counter", "Stream frames replaced by newer ones before inference"),
+    "pose_requests_rejected_total": ("counter", "Frames rejected because the inference queue was full"),
+    "pose_queue_depth": ("gauge", "Frames admitted to the worker pool and not yet finished"),
+    "pose_queue_capacity": ("gauge", "Admission limit of the worker pool"),
+    "pose_workers": ("gauge", "Inference worker processes"),
+    "pose_trackers": ("gauge", "Live MediaPipe Pose instances, by mode and model complexity"),
+    "pose_cache_lookups_total": ("counter", "Frame cache lookups, by result"),
+    "pose_cache_entries": ("gauge", "Frames held in the frame cache"),
+    "pose_cache_hit_ratio": ("gauge", "Share of frame cache lookups that were (near) hits"),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being handled"),
+    "http_requests_total": ("counter", "HTTP requests, by route, method and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency, by route"),
+}
+
+
+def labels(**values):
+    """Canonical (hashable, picklable) label set"""
+    return tuple(sorted((name, str(value)) for name, value in values.items()))
+
+
+class FrameTimer:
+    """Stage durations of one frame; lap(stage) charges the time since the previous lap"""
+
+    __slots__ = ("stages", "_last")
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def milliseconds(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+
+class _NullTimer:
+    """Stand-in when timing is off: laps cost one method call and record nothing"""
+
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+    def milliseconds(self):
+        return {}
+
+
+NULL_TIMER = _NullTimer()
+
+
+def frame_timer():
+    return FrameTimer() if TIMING else NULL_TIMER
+
+
+class MetricsRegistry:
+    """Counters, fixed-bucket histograms and callback gauges for one process
+
+    snapshot() is plain data, so worker registries can be collected over the
+    process pool and combined with merge() before rendering.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def inc(self, name, value=1, **label_values):
+        if ENABLED and value:
+            key = (name, labels(**label_values))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **label_values):
+        if not ENABLED:
+            return
+        key = (name, labels(**label_values))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts (the last one is +Inf), then the sum
+            histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def record(self, timer):
+        """Add a frame's stage durations to pose_stage_seconds"""
+        if ENABLED:
+            for stage, seconds in timer.stages.items():
+                self.observe("pose_stage_seconds", seconds, stage=stage)
+
+    def gauge(self, name, fn):
+        """Register a gauge read at snapshot time; fn returns a number or {labels(...): number}"""
+        self._gauges[name] = fn
+
+    def snapshot(self):
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            value = fn()
+            for key, number in (value.items() if isinstance(value, dict) else [((), value)]):
+                gauges[(name, key)] = number
+        return {
+            "buckets": self.buckets,
+            "counters": dict(self._counters),
+            "histograms": {key: list(value) for key, value in self._histograms.items()},
+            "gauges": gauges,
+        }
+
+
+def merge(snapshots):
+    """Sum several snapshots (e.g. the API process and each worker) into one"""
+    merged = {"buckets": DEFAULT_BUCKETS, "counters": {}, "histograms": {}, "gauges": {}}
+    for snapshot in snapshots:
+        for kind in ("counters", "gauges"):
+            for key, value in snapshot[kind].items():
+                merged[kind][key] = merged[kind].get(key, 0) + value
+        for key, value in snapshot["histograms"].items():
+            current = merged["histograms"].get(key)
+            merged["histograms"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+    return merged
+
+
+def _format_labels(label_set, extra=()):
+    pairs = list(label_set) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)"""
+    series = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, label_set), value in snapshot[kind].items():
+            series.setdefault(name, []).append((label_set, value))
+
+    bounds = [_format_number(float(b)) for b in snapshot["buckets"]] + ["+Inf"]
+    lines = []
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for label_set, value in sorted(series[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(label_set)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(label_set, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(label_set)} {_format_number(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(label_set)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(stages_ms):
+    """Server-Timing header value from {stage: milliseconds}"""
+    return ", ".join(f"{stage};dur={ms:.2f}" for stage, ms in stages_ms.items())
+
+
+# This process's registry (each inference worker has its own)
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,126 @@
+"""
+Per-client pose tracker sessions
+Keeps one MediaPipe Pose instance per session so consecutive frames use the tracking path
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+# Each tracking Pose instance holds its own graph and buffers, so the number of live
+# sessions per worker process is the memory cap
+DEFAULT_MAX_SESSIONS = 16
+DEFAULT_IDLE_TIMEOUT = 60.0
+
+
+class PoseSession:
+    def __init__(self, session_id, pose):
+        self.session_id = session_id
+        self.pose = pose
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.frames = 0
+        # Per-session analyzer state (e.g. rep counters), keyed by exercise
+        self.state = {}
+        # Optional landmark smoothing / keyframe skipping stage (temporal_filter)
+        self.temporal = None
+        # Optional landmark-guided crop window (roi_tracker)
+        self.roi = None
+        # Person tracks and per-person sessions in multi-person mode (multi_person)
+        self.people = None
+        # Optional columnar recording of the session's frames (session_recorder)
+        self.recorder = None
+
+    def touch(self):
+        self.last_used = time.monotonic()
+        self.frames += 1
+
+    def close(self):
+        if self.people is not None:
+            self.people.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        try:
+            self.pose.close()
+        except Exception:
+            pass
+
+
+class PoseSessionPool:
+    """Sessions by id, least recently used first; on_close(session_id) runs for every session
+    that is closed, evicted or dropped, so per-session state kept elsewhere can be released"""
+
+    def __init__(self, pose_factory, max_sessions=None, idle_timeout=None, on_close=None):
+        self.pose_factory = pose_factory
+        self.on_close = on_close
+        self.max_sessions = max(1, max_sessions or int(
+            os.getenv("POSE_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)
+        ))
+        self.idle_timeout = idle_timeout or float(
+            os.getenv("POSE_SESSION_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)
+        )
+        # Ordered from least to most recently used
+        self._sessions = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def get(self, session_id):
+        """Return the session for this id, creating it (and evicting others) if needed"""
+        self.evict_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            while len(self._sessions) >= self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                self._close(oldest)
+                self.evictions += 1
+            session = PoseSession(session_id, self.pose_factory())
+            self._sessions[session_id] = session
+        else:
+            self._sessions.move_to_end(session_id)
+        session.touch()
+        return session
+
+    def close(self, session_id):
+        """Drop a session and release its Pose instance"""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._close(session)
+        return True
+
+    def evict_idle(self, now=None):
+        """Close sessions that have not received a frame within idle_timeout"""
+        now = now if now is not None else time.monotonic()
+        while self._sessions:
+            session_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_used < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            self._close(oldest)
+            self.evictions += 1
+
+    def close_all(self):
+        while self._sessions:
+            _, session = self._sessions.popitem()
+            self._close(session)
+
+    def _close(self, session):
+        session.close()
+        if self.on_close is not None:
+            self.on_close(session.session_id)
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,45 @@
+"""
+Helpers for the streaming pose WebSocket
+Latest-frame-wins buffering and compact per-frame results
+"""
+
+import asyncio
+
+
+class LatestFrameSlot:
+    """One-slot frame buffer: a newer frame replaces any frame not yet picked up"""
+
+    def __init__(self):
+        self._frame = None
+        self._seq = 0
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._seq += 1
+        self.received += 1
+        self._ready.set()
+
+    async def take(self):
+        """Wait for a frame and return (seq, frame), emptying the slot"""
+        await self._ready.wait()
+        self._ready.clear()
+        frame, self._frame = self._frame, None
+        return self._seq, frame
+
+
+def compact_result(result, seq, dropped=0):
+    """Shrink an analysis result (landmarks already as key-landmark rows) to short keys"""
+    return {
+        "seq": seq,
+        "ok": result.get("success", False),
+        "acc": result.get("accuracy", 0),
+        "fb": result.get("feedback", ""),
+        "lm": result.get("landmarks"),
+        "ex": result.get("detailed_analysis") if result.get("exercise", "general") != "general" else None,
+        "drop": dropped,
+    }
@@ -0,0 +1,137 @@
+"""
+Landmark-guided region of interest
+Crops each session frame to the area around the previous frame's pose before inference and maps
+the landmarks back to full-frame coordinates
+"""
+
+import os
+
+import numpy as np
+
+from landmarks import VIS, X, Y, Z
+
+# Added on every side, as a fraction of the landmark box's longer side
+DEFAULT_PADDING = 0.25
+# Frames of box movement added as extra margin on each side
+DEFAULT_MOTION_MARGIN = 2.0
+# Fewer visible landmarks than this counts as tracking lost
+DEFAULT_MIN_VISIBLE = 8
+VISIBILITY_THRESHOLD = 0.5
+# Smallest crop side in pixels; the pose models work on 256x256 inputs
+MIN_ROI_SIZE = 96
+# A crop covering more of the frame than this saves nothing, so the full frame is used
+MAX_COVERAGE = 0.8
+
+
+class RegionOfInterest:
+    """Per-session crop window that follows the pose
+
+    crop() returns the part of the frame to run inference on: the previous
+    landmarks' bounding box, padded and widened by the box's recent motion.
+    The window is kept while the pose stays well inside it and recomputed
+    when the pose nears an edge or shrinks: MediaPipe's own tracker works in
+    the coordinates of its input, so a steady window keeps it on the
+    tracking path, while a moved window costs it one re-detection.
+    Without a tracked pose, or when the window would cover most of the
+    frame, the full frame is used.
+    """
+
+    def __init__(self, padding=DEFAULT_PADDING, motion_margin=DEFAULT_MOTION_MARGIN,
+                 min_visible=DEFAULT_MIN_VISIBLE):
+        self.padding = padding
+        self.motion_margin = motion_margin
+        self.min_visible = min_visible
+        # Normalized (x0, y0, x1, y1) box of the last visible landmarks and its per-frame change
+        self.box = None
+        self.velocity = np.zeros(4)
+        self.window = None
+        self.crops = 0
+        self.full_frames = 0
+        self.lost = 0
+
+    @classmethod
+    def from_env(cls):
+        """ROI stage configured by POSE_ROI_*, or None when POSE_ROI=0"""
+        if os.getenv("POSE_ROI", "1") != "1":
+            return None
+        return cls(
+            padding=float(os.getenv("POSE_ROI_PADDING", DEFAULT_PADDING)),
+            motion_margin=float(os.getenv("POSE_ROI_MOTION", DEFAULT_MOTION_MARGIN)),
+        )
+
+    def crop(self, rgb_image):
+        """(image, window): the pixels to analyze and the (x0, y0, x1, y1) they cover, or None for the full frame"""
+        height, width = rgb_image.shape[:2]
+        self.window = self._next_window(width, height)
+        if self.window is None:
+            self.full_frames += 1
+            return rgb_image, None
+        self.crops += 1
+        x0, y0, x1, y1 = self.window
+        return np.ascontiguousarray(rgb_image[y0:y1, x0:x1]), self.window
+
+    def update(self, landmarks, window, width, height):
+        """Map crop landmarks to the full frame (in place) and track their box; None resets to full-frame detection"""
+        if landmarks is not None and window is not None:
+            x0, y0, x1, y1 = window
+            data = landmarks.data
+            scale_x = (x1 - x0) / width
+            data[:, X] = data[:, X] * scale_x + x0 / width
+            data[:, Y] = data[:, Y] * ((y1 - y0) / height) + y0 / height
+            # z shares the scale of x
+            data[:, Z] *= scale_x
+
+        visible = None if landmarks is None else landmarks.data[landmarks.data[:, VIS] > VISIBILITY_THRESHOLD]
+        if visible is None or len(visible) < self.min_visible:
+            self.reset()
+            return landmarks
+
+        box = np.clip([visible[:, X].min(), visible[:, Y].min(), visible[:, X].max(), visible[:, Y].max()], 0.0, 1.0)
+        self.velocity = np.zeros(4) if self.box is None else box - self.box
+        self.box = box
+        return landmarks
+
+    def reset(self):
+        if self.box is not None:
+            self.lost += 1
+        self.box = None
+        self.velocity = np.zeros(4)
+        self.window = None
+
+    def _next_window(self, width, height):
+        if self.box is None:
+            return None
+        x0, y0, x1, y1 = self.box * (width, height, width, height)
+        pad = self.padding * max(x1 - x0, y1 - y0)
+        margin = np.abs(self.velocity) * (width, height, width, height) * self.motion_margin
+        desired = np.array([x0 - pad - margin[0], y0 - pad - margin[1], x1 + pad + margin[2], y1 + pad + margin[3]])
+
+        # Keep the current window while it holds the pose with half the padding and is not oversized
+        current = self.window
+        if current is not None:
+            inner = (x0 - pad / 2, y0 - pad / 2, x1 + pad / 2, y1 + pad / 2)
+            contains = current[0] <= max(inner[0], 0) and current[1] <= max(inner[1], 0) \
+                and current[2] >= min(inner[2], width) and current[3] >= min(inner[3], height)
+            if contains and _area(current) <= 1.5 * _area(desired):
+                return current
+
+        # Grow to the minimum size around the centre, then clip to the frame
+        size = np.maximum(desired[2:] - desired[:2], MIN_ROI_SIZE)
+        centre = (desired[:2] + desired[2:]) / 2
+        lo = np.clip(np.floor(centre - size / 2), 0, None).astype(int)
+        hi = np.minimum(np.ceil(centre + size / 2), (width, height)).astype(int)
+        window = (int(lo[0]), int(lo[1]), int(hi[0]), int(hi[1]))
+        if _area(window) > MAX_COVERAGE * width * height:
+            return None
+        return window
+
+    def stats(self):
+        return {
+            "roi": None if self.window is None else list(self.window),
+            "roi_crops": self.crops,
+            "roi_lost": self.lost,
+        }
+
+
+def _area(window):
+    return max(window[2] - window[0], 0) * max(window[3] - window[1], 0)
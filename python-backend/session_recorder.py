@@ -0,0 +1,408 @@
+"""
+Columnar session recorder
+Each session's per-frame landmarks, angles and scores are appended to memory-mapped column files,
+with running aggregates kept in O(1) per frame; summaries and downsampled series are read back
+from disk without loading a whole session
+
+Layout of a recording (one directory per session under POSE_RECORD_DIR):
+  meta.json        committed frame count, column dtypes/shapes and the aggregates
+  <column>.bin     raw rows of one column, preallocated in growing blocks
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import time
+import warnings
+
+import numpy as np
+
+from exercises import EXERCISE_NAMES
+from joint_angles import JOINT_ANGLES, JointAngleSet
+from landmarks import NUM_LANDMARKS
+
+DEFAULT_RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+# Frames between flushes of the columns and meta.json (what readers see of a live session)
+DEFAULT_FLUSH_INTERVAL = 30
+# Rows preallocated when a recording is created; capacity then doubles, up to MAX_GROWTH rows at a time
+INITIAL_CAPACITY = 1024
+MAX_GROWTH = 65536
+DEFAULT_MAX_POINTS = 500
+# Rows per block when reducing a column to buckets, so memory stays bounded however long the session
+READ_BLOCK = 65536
+FORMAT_VERSION = 1
+
+# Every angle is recorded whatever the exercise, so columns keep one shape for the whole session
+RECORDED_ANGLES = JointAngleSet(list(JOINT_ANGLES))
+
+# name -> (dtype, row shape, how a bucket of rows is reduced when downsampling)
+COLUMNS = {
+    "t": ("float64", (), "first"),
+    "detected": ("uint8", (), "mean"),
+    "accuracy": ("float32", (), "mean"),
+    "reps": ("int32", (), "max"),
+    "exercise": ("uint8", (), "first"),
+    "angles": ("float32", (len(RECORDED_ANGLES),), "mean"),
+    "landmarks": ("float16", (NUM_LANDMARKS, 4), "first"),
+}
+
+_SAFE_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]{0,63}")
+
+
+def recording_path(session_id, root=None):
+    """Directory of a session's recording; ids that are not safe file names are hashed"""
+    root = root or os.getenv("POSE_RECORD_DIR", DEFAULT_RECORD_DIR)
+    name = session_id if _SAFE_ID.fullmatch(session_id) else \
+        "s-" + hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(root, name)
+
+
+class Column:
+    """One append-only column: a memory-mapped file of fixed-shape rows, grown in blocks"""
+
+    def __init__(self, path, dtype, shape, capacity=INITIAL_CAPACITY):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.row_bytes = self.dtype.itemsize * math.prod(self.shape)
+        existing = os.path.getsize(path) // self.row_bytes if os.path.exists(path) else 0
+        self.data = None
+        self._map(max(existing, capacity))
+
+    def _map(self, capacity):
+        # The old mapping is released before resizing (required on Windows)
+        self.data = None
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        if os.path.getsize(self.path) < capacity * self.row_bytes:
+            os.truncate(self.path, capacity * self.row_bytes)
+        self.capacity = capacity
+        self.data = np.memmap(self.path, self.dtype, "r+", shape=(capacity,) + self.shape)
+
+    def write(self, row, value):
+        if row >= self.capacity:
+            self.data.flush()
+            self._map(self.capacity + min(self.capacity, MAX_GROWTH))
+        self.data[row] = value
+
+    def flush(self):
+        self.data.flush()
+
+    def close(self):
+        if self.data is not None:
+            self.data.flush()
+            self.data = None
+
+
+class SessionAggregates:
+    """Running statistics of a session, O(1) per frame and serializable to meta.json
+
+    Accuracy percentiles come from a 101-bin histogram (one bin per point),
+    angle mean/std from Welford's algorithm per angle, and joint deviation
+    from the template matches of completed reps (see template_matching).
+    """
+
+    def __init__(self, state=None):
+        state = state or {}
+        angles = len(RECORDED_ANGLES)
+        self.frames = state.get("frames", 0)
+        self.detected = state.get("detected", 0)
+        self.accuracy_sum = state.get("accuracy_sum", 0.0)
+        self.histogram = np.array(state.get("histogram", [0] * 101), dtype=np.int64)
+        self.angle_count = np.array(state.get("angle_count", [0] * angles), dtype=np.int64)
+        self.angle_mean = np.array(state.get("angle_mean", [0.0] * angles), dtype=np.float64)
+        self.angle_m2 = np.array(state.get("angle_m2", [0.0] * angles), dtype=np.float64)
+        self.angle_min = np.array(state.get("angle_min", [math.inf] * angles), dtype=np.float64)
+        self.angle_max = np.array(state.get("angle_max", [-math.inf] * angles), dtype=np.float64)
+        # Per exercise: frames, reps, partial reps and best hold as last reported by its analyzer
+        self.exercises = state.get("exercises", {})
+        self.matched_reps = state.get("matched_reps", 0)
+        self.similarity_sum = state.get("similarity_sum", 0.0)
+        self.joint_deviation_sum = state.get("joint_deviation_sum", {})
+        self.joint_deviation_count = state.get("joint_deviation_count", {})
+        self._last_match = None
+
+    def update(self, exercise, accuracy=None, angles=None, details=None):
+        self.frames += 1
+        stats = self.exercises.setdefault(exercise, {"frames": 0})
+        stats["frames"] += 1
+        if accuracy is None:
+            return
+        self.detected += 1
+        self.accuracy_sum += accuracy
+        self.histogram[min(max(int(round(accuracy)), 0), 100)] += 1
+
+        valid = ~np.isnan(angles)
+        if valid.any():
+            self.angle_count += valid
+            delta = np.where(valid, angles - self.angle_mean, 0.0)
+            self.angle_mean += delta / np.maximum(self.angle_count, 1)
+            self.angle_m2 += np.where(valid, delta * (angles - self.angle_mean), 0.0)
+            self.angle_min = np.fmin(self.angle_min, angles)
+            self.angle_max = np.fmax(self.angle_max, angles)
+
+        details = details or {}
+        for key in ("reps", "partial_reps", "best_hold"):
+            if key in details:
+                stats[key] = details[key]
+        match = details.get("template_match")
+        if match is not None and match is not self._last_match:
+            # Analyzers repeat the last match on every frame; each rep's match is counted once
+            self._last_match = match
+            self.matched_reps += 1
+            self.similarity_sum += match["similarity"]
+            for joint, deviation in match["joint_deviation"].items():
+                if deviation is not None:
+                    self.joint_deviation_sum[joint] = self.joint_deviation_sum.get(joint, 0.0) + deviation
+                    self.joint_deviation_count[joint] = self.joint_deviation_count.get(joint, 0) + 1
+
+    def percentile(self, q):
+        if not self.detected:
+            return None
+        return int(np.searchsorted(np.cumsum(self.histogram), q / 100 * self.detected))
+
+    def state(self):
+        return {
+            "frames": self.frames,
+            "detected": self.detected,
+            "accuracy_sum": self.accuracy_sum,
+            "histogram": self.histogram.tolist(),
+            "angle_count": self.angle_count.tolist(),
+            "angle_mean": self.angle_mean.tolist(),
+            "angle_m2": self.angle_m2.tolist(),
+            # JSON has no infinity, so unseen angles are stored as null
+            "angle_min": [None if math.isinf(v) else v for v in self.angle_min.tolist()],
+            "angle_max": [None if math.isinf(v) else v for v in self.angle_max.tolist()],
+            "exercises": self.exercises,
+            "matched_reps": self.matched_reps,
+            "similarity_sum": self.similarity_sum,
+            "joint_deviation_sum": self.joint_deviation_sum,
+            "joint_deviation_count": self.joint_deviation_count,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        state = dict(state)
+        for key, missing in (("angle_min", math.inf), ("angle_max", -math.inf)):
+            if key in state:
+                state[key] = [missing if v is None else v for v in state[key]]
+        return cls(state)
+
+    def summary(self):
+        def rounded(value):
+            return None if value is None or math.isnan(value) or math.isinf(value) else round(float(value), 1)
+
+        angles = {}
+        for k, name in enumerate(RECORDED_ANGLES.names):
+            count = int(self.angle_count[k])
+            if count:
+                angles[name] = {
+                    "mean": rounded(self.angle_mean[k]),
+                    "std": rounded(math.sqrt(self.angle_m2[k] / count)),
+                    "min": rounded(self.angle_min[k]),
+                    "max": rounded(self.angle_max[k]),
+                }
+        return {
+            "frames": self.frames,
+            "detected_frames": self.detected,
+            "accuracy": {
+                "mean": round(self.accuracy_sum / self.detected, 1) if self.detected else None,
+                "p10": self.percentile(10),
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+            },
+            "exercises": self.exercises,
+            "angles": angles,
+            "template_reps": self.matched_reps,
+            "mean_similarity": round(self.similarity_sum / self.matched_reps, 1) if self.matched_reps else None,
+            "joint_deviation": {
+                joint: round(total / self.joint_deviation_count[joint], 3)
+                for joint, total in self.joint_deviation_sum.items()
+            },
+        }
+
+
+class SessionRecorder:
+    """Append-only columnar recording of one session, reopened and extended if it already exists
+
+    record() writes one row to every column and updates the aggregates; the
+    frame count in meta.json only advances on flush() (every flush_interval
+    frames and on close), so readers never see half-written rows.
+    """
+
+    def __init__(self, session_id, root=None, flush_interval=None):
+        self.session_id = session_id
+        self.path = recording_path(session_id, root)
+        self.flush_interval = flush_interval or int(os.getenv("POSE_RECORD_FLUSH", DEFAULT_FLUSH_INTERVAL))
+        os.makedirs(self.path, exist_ok=True)
+        meta = read_meta(self.path)
+        if meta is not None and meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{self.path} holds a recording in an unsupported format")
+        self.started = meta["started"] if meta else time.time()
+        self.frames = meta["frames"] if meta else 0
+        self.aggregates = SessionAggregates.from_state(meta["aggregates"]) if meta else SessionAggregates()
+        self.columns = {
+            name: Column(os.path.join(self.path, name + ".bin"), dtype, shape)
+            for name, (dtype, shape, _) in COLUMNS.items()
+        }
+        self._unflushed = 0
+        if meta is None:
+            self.flush()
+
+    @classmethod
+    def from_env(cls, session_id):
+        """Recorder for a session when POSE_RECORD=1, else None"""
+        if os.getenv("POSE_RECORD", "0") != "1":
+            return None
+        return cls(session_id)
+
+    def record(self, exercise, landmarks=None, accuracy=None, details=None, now=None):
+        """Append one frame; landmarks None (and no accuracy) records a frame without a pose"""
+        row = self.frames
+        detected = landmarks is not None
+        angles = RECORDED_ANGLES.compute(landmarks) if detected else None
+        columns = self.columns
+        columns["t"].write(row, (now if now is not None else time.time()) - self.started)
+        columns["detected"].write(row, detected)
+        columns["accuracy"].write(row, accuracy if detected else np.nan)
+        columns["reps"].write(row, (details or {}).get("reps", 0))
+        columns["exercise"].write(row, EXERCISE_NAMES.index(exercise))
+        columns["angles"].write(row, angles if detected else np.nan)
+        columns["landmarks"].write(row, landmarks.data if detected else np.nan)
+        self.frames += 1
+        self.aggregates.update(exercise, accuracy if detected else None, angles, details)
+
+        self._unflushed += 1
+        if self._unflushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Make the recorded rows durable, then publish the frame count and aggregates"""
+        for column in self.columns.values():
+            column.flush()
+        meta = {
+            "version": FORMAT_VERSION,
+            "session_id": self.session_id,
+            "started": self.started,
+            "frames": self.frames,
+            "columns": {name: {"dtype": dtype, "shape": list(shape)} for name, (dtype, shape, _) in COLUMNS.items()},
+            "angle_names": list(RECORDED_ANGLES.names),
+            "exercise_names": list(EXERCISE_NAMES),
+            "aggregates": self.aggregates.state(),
+        }
+        temporary = os.path.join(self.path, "meta.json.tmp")
+        with open(temporary, "w") as f:
+            f.write(json.dumps(meta))
+        os.replace(temporary, os.path.join(self.path, "meta.json"))
+        self._unflushed = 0
+
+    def close(self):
+        self.flush()
+        for column in self.columns.values():
+            column.close()
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def read_summary(session_id, root=None):
+    """Session summary from meta.json alone, or None if the session was not recorded"""
+    meta = read_meta(recording_path(session_id, root))
+    if meta is None:
+        return None
+    aggregates = SessionAggregates.from_state(meta["aggregates"])
+    return {
+        "session_id": meta["session_id"],
+        "started": meta["started"],
+        **aggregates.summary(),
+    }
+
+
+def read_column(path, meta, name):
+    """Read-only memory map of a column's committed rows"""
+    spec = meta["columns"][name]
+    shape = (meta["frames"],) + tuple(spec["shape"])
+    if not meta["frames"]:
+        return np.empty(shape, dtype=spec["dtype"])
+    return np.memmap(os.path.join(path, name + ".bin"), spec["dtype"], "r", shape=shape)
+
+
+def reduce_buckets(values, step, how):
+    """Reduce consecutive buckets of step rows (the last may be shorter), block by block"""
+    if step == 1:
+        return np.array(values)
+    if how == "first":
+        return np.array(values[::step])
+    reduce = np.nanmax if how == "max" else np.nanmean
+    parts = []
+    block = max(READ_BLOCK // step, 1) * step
+    with warnings.catch_warnings():
+        # All-NaN buckets (frames without a pose) reduce to NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for start in range(0, len(values), block):
+            chunk = np.asarray(values[start:start + block], dtype=np.float64)
+            whole = len(chunk) // step * step
+            if whole:
+                parts.append(reduce(chunk[:whole].reshape((-1, step) + chunk.shape[1:]), axis=1))
+            if whole < len(chunk):
+                parts.append(reduce(chunk[whole:], axis=0)[None])
+    return np.concatenate(parts)
+
+
+def read_series(session_id, columns=("accuracy",), start=None, end=None, max_points=DEFAULT_MAX_POINTS, root=None):
+    """Downsampled columns between start and end seconds, or None if the session was not recorded
+
+    The time range is located with a binary search on the t column, and only
+    rows inside it are read: with more than max_points of them, consecutive
+    rows are reduced to one point (mean; max for reps; the first row for
+    landmarks and exercise).
+    """
+    path = recording_path(session_id, root)
+    meta = read_meta(path)
+    if meta is None:
+        return None
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown column(s) {', '.join(sorted(unknown))}, expected: {', '.join(COLUMNS)}")
+
+    t = read_column(path, meta, "t")
+    lo = int(np.searchsorted(t, start, side="left")) if start is not None else 0
+    hi = int(np.searchsorted(t, end, side="right")) if end is not None else len(t)
+    hi = max(hi, lo)
+    step = max(1, math.ceil((hi - lo) / max(1, max_points)))
+
+    series = {"t": _rounded(reduce_buckets(t[lo:hi], step, "first"), 3)}
+    for name in columns:
+        if name == "t":
+            continue
+        values = reduce_buckets(read_column(path, meta, name)[lo:hi], step, COLUMNS[name][2])
+        if name == "angles":
+            series[name] = {angle: _rounded(values[:, k], 1) for k, angle in enumerate(meta["angle_names"])}
+        elif name == "exercise":
+            series[name] = [meta["exercise_names"][int(v)] for v in values]
+        elif name == "reps":
+            series[name] = values.astype(int).tolist()
+        elif name == "landmarks":
+            series[name] = [None if np.isnan(rows[:, 0]).all() else _rounded(rows, 4) for rows in values]
+        else:
+            series[name] = _rounded(values, 3 if name == "detected" else 1)
+    return {
+        "session_id": meta["session_id"],
+        "frames": meta["frames"],
+        "range": [lo, hi],
+        "step": step,
+        "series": series,
+    }
+
+
+def _rounded(values, decimals):
+    """Nested lists with NaN mapped to None, for JSON"""
+    values = np.round(np.asarray(values, dtype=np.float64), decimals)
+    return np.where(np.isnan(values), None, values).tolist()
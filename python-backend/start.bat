@@ -38,7 +38,7 @@ if %errorlevel% equ 0 (
     echo ✅ Dependencies installed successfully!
     echo.
     echo 🎯 Available commands:
-    echo   python pose_analyzer.py     - Start FastAPI backend service (port 8000)
+    echo   python main.py              - Start FastAPI backend service (port 8000)
     echo   python webcam_detector.py   - Start webcam pose detection
     echo   python rtsp_detector.py     - Start RTSP camera pose detection
     echo.
@@ -48,7 +48,7 @@ if %errorlevel% equ 0 (
     
     REM Start the FastAPI service
     echo 🚀 Starting FastAPI Pose Analysis Service...
-    python pose_analyzer.py
+    python main.py
 ) else (
     echo ❌ Failed to install dependencies. Please check your Python environment.
     pause
@@ -25,7 +25,7 @@ if [ $? -eq 0 ]; then
     echo "✅ Dependencies installed successfully!"
     echo ""
     echo "🎯 Available commands:"
-    echo "  python pose_analyzer.py     - Start FastAPI backend service (port 8000)"
+    echo "  python main.py              - Start FastAPI backend service (port 8000)"
     echo "  python webcam_detector.py   - Start webcam pose detection"
     echo "  python rtsp_detector.py     - Start RTSP camera pose detection"
     echo ""
@@ -35,7 +35,7 @@ if [ $? -eq 0 ]; then
     
     # Start the FastAPI service
     echo "🚀 Starting FastAPI Pose Analysis Service..."
-    python pose_analyzer.py
+    python main.py
 else
     echo "❌ Failed to install dependencies. Please check your Python environment."
     exit 1
@@ -0,0 +1,329 @@
+"""
+Reference-exercise template matching
+Reference reps are stored once as normalized landmark sequences in a precomputed .npz index;
+completed reps are scored against every template of their exercise with band-constrained DTW,
+vectorized across templates
+
+Usage:
+  python template_matching.py build reference_squats.mp4 --exercise squat
+  python template_matching.py list
+"""
+
+import argparse
+import os
+import warnings
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from landmarks import (
+    LANDMARK_NAMES, LEFT_ANKLE, LEFT_ELBOW, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, LEFT_WRIST,
+    RIGHT_ANKLE, RIGHT_ELBOW, RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER, RIGHT_WRIST, VIS
+)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "index.npz")
+
+# Joints compared, as left/right pairs so a mirrored rep can be matched too
+TEMPLATE_JOINTS = np.array([
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+    LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+], dtype=np.intp)
+JOINT_NAMES = tuple(LANDMARK_NAMES[i] for i in TEMPLATE_JOINTS)
+MIRRORED_JOINTS = np.arange(len(TEMPLATE_JOINTS)).reshape(-1, 2)[:, ::-1].ravel()
+# Every sequence is resampled to this many frames, so templates stack into one array
+TEMPLATE_LENGTH = 32
+# Sakoe-Chiba band: the warping path stays within this fraction of the length of the diagonal
+DEFAULT_BAND = 0.2
+# Mean joint distance (in torso lengths) at which similarity drops to 1/e (~37%)
+DISTANCE_SCALE = 0.15
+# Cost of a frame pair with no joint visible in both
+MISSING_COST = 1.0
+MIN_VISIBILITY = 0.5
+MIN_REP_FRAMES = 5
+# Longest rep window kept by RepBuffer
+MAX_REP_FRAMES = 600
+
+
+def normalize_sequence(landmarks):
+    """(N, 33, 4) landmarks -> (N, J, 2) joint positions, translation and scale invariant
+
+    Each frame is centred on the mid-hip point; the sequence is scaled by its
+    median torso length (mid-shoulder to mid-hip). Joints below
+    MIN_VISIBILITY are NaN.
+    """
+    data = np.asarray(landmarks, dtype=np.float64)
+    visible = data[..., VIS] >= MIN_VISIBILITY
+    xy = np.where(visible[..., None], data[..., :2], np.nan)
+    with _ignore_empty_slices():
+        hips = np.nanmean(xy[:, [LEFT_HIP, RIGHT_HIP]], axis=1)
+        shoulders = np.nanmean(xy[:, [LEFT_SHOULDER, RIGHT_SHOULDER]], axis=1)
+        torso = np.nanmedian(np.hypot(*(shoulders - hips).T))
+    if not np.isfinite(torso) or torso <= 0:
+        torso = 1.0
+    return ((xy[:, TEMPLATE_JOINTS] - hips[:, None]) / torso).astype(np.float32)
+
+
+def resample(sequence, length=TEMPLATE_LENGTH):
+    """Linear resampling along time to a fixed number of frames"""
+    n = len(sequence)
+    position = np.linspace(0, n - 1, length)
+    lo = np.floor(position).astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    weight = (position - lo).astype(np.float32).reshape(-1, *([1] * (sequence.ndim - 1)))
+    return sequence[lo] * (1 - weight) + sequence[hi] * weight
+
+
+def mirror(sequence):
+    """The same movement seen from the other side: x flipped, left and right joints swapped"""
+    flipped = sequence[..., MIRRORED_JOINTS, :].copy()
+    flipped[..., 0] *= -1
+    return flipped
+
+
+def band_cells(length, band=DEFAULT_BAND):
+    """(rows, cols) of the cells within the Sakoe-Chiba band of a length x length matrix"""
+    width = band_width(length, band)
+    rows, cols = np.nonzero(np.abs(np.subtract.outer(np.arange(length), np.arange(length))) <= width)
+    return rows, cols
+
+
+def band_width(length, band=DEFAULT_BAND):
+    return max(1, int(np.ceil(band * length)))
+
+
+def frame_costs(queries, templates, band=DEFAULT_BAND):
+    """(B, L, J, 2) x (B, L, J, 2) -> (B, L, L) mean distance of the joints visible in both frames
+
+    Only cells within the band are computed; the rest are never visited by dtw().
+    """
+    batch, length = queries.shape[:2]
+    rows, cols = band_cells(length, band)
+    q, t = queries[:, rows], templates[:, cols]
+    valid = ~(np.isnan(q[..., 0]) | np.isnan(t[..., 0]))
+    dx = q[..., 0] - t[..., 0]
+    dy = q[..., 1] - t[..., 1]
+    distance = np.sqrt(np.multiply(dx, dx, out=dx) + np.multiply(dy, dy, out=dy), out=dx)
+    distance[~valid] = 0
+    count = valid.sum(axis=-1)
+    cost = np.full((batch, length, length), np.inf, dtype=np.float32)
+    cost[:, rows, cols] = np.where(count > 0, distance.sum(axis=-1) / np.maximum(count, 1), MISSING_COST)
+    return cost
+
+
+def dtw(cost, band=DEFAULT_BAND):
+    """Band-constrained DTW over a batch of (B, L, L) cost matrices
+
+    Cells on one anti-diagonal depend only on the two before it, so each
+    diagonal is filled for the whole batch in one step. Returns the
+    accumulated cost (B, L+1, L+1) and the step taken into each cell
+    (0 diagonal, 1 from above, 2 from the left) for backtracking.
+    """
+    batch, length, _ = cost.shape
+    width = band_width(length, band)
+    total = np.full((batch, length + 1, length + 1), np.inf, dtype=np.float32)
+    total[:, 0, 0] = 0.0
+    steps = np.zeros((batch, length + 1, length + 1), dtype=np.int8)
+    for k in range(2, 2 * length + 1):
+        i = np.arange(max(1, k - length, (k - width + 1) // 2), min(length, k - 1, (k + width) // 2) + 1)
+        j = k - i
+        previous = np.stack([total[:, i - 1, j - 1], total[:, i - 1, j], total[:, i, j - 1]])
+        step = previous.argmin(axis=0)
+        total[:, i, j] = cost[:, i - 1, j - 1] + np.take_along_axis(previous, step[None], 0)[0]
+        steps[:, i, j] = step
+    return total, steps
+
+
+def warping_path(steps):
+    """(query frame, template frame) pairs of the optimal path through one step matrix"""
+    i = j = steps.shape[0] - 1
+    path = []
+    while i > 0 and j > 0:
+        path.append((i - 1, j - 1))
+        step = steps[i, j]
+        if step == 0:
+            i, j = i - 1, j - 1
+        elif step == 1:
+            i -= 1
+        else:
+            j -= 1
+    return np.array(path[::-1], dtype=np.intp)
+
+
+def similarity(distance):
+    """0-100 score from a mean joint distance in torso lengths"""
+    return 100.0 * np.exp(-np.asarray(distance) / DISTANCE_SCALE)
+
+
+class TemplateIndex:
+    """Reference reps as one (T, TEMPLATE_LENGTH, J, 2) float32 array plus names and exercises"""
+
+    def __init__(self, names=(), exercises=(), sequences=None, band=DEFAULT_BAND):
+        self.names = list(names)
+        self.exercises = list(exercises)
+        self.sequences = sequences if sequences is not None else \
+            np.empty((0, TEMPLATE_LENGTH, len(TEMPLATE_JOINTS), 2), dtype=np.float32)
+        self.band = band
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH, band=DEFAULT_BAND):
+        with np.load(path, allow_pickle=False) as index:
+            if tuple(index["joints"]) != tuple(TEMPLATE_JOINTS) or index["sequences"].shape[1] != TEMPLATE_LENGTH:
+                raise ValueError(f"{path} was built with a different joint set or template length, rebuild it")
+            return cls(index["names"].tolist(), index["exercises"].tolist(), index["sequences"], band)
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(
+            path, names=np.array(self.names, dtype=str), exercises=np.array(self.exercises, dtype=str),
+            sequences=self.sequences, joints=TEMPLATE_JOINTS
+        )
+
+    def add(self, name, exercise, landmarks):
+        """Normalize and store one reference rep given as (N, 33, 4) landmarks"""
+        sequence = resample(normalize_sequence(landmarks))
+        self.names.append(name)
+        self.exercises.append(exercise)
+        self.sequences = np.concatenate([self.sequences, sequence[None]])
+
+    def match(self, landmarks, exercise):
+        """Score a rep window ((N, 33, 4) landmarks) against the exercise's templates
+
+        Returns None without templates or with too short a window, else the
+        closest template, its similarity (0-100) and the mean deviation of
+        each joint along the warping path, in torso lengths.
+        """
+        candidates = np.flatnonzero(np.array(self.exercises) == exercise)
+        if not len(candidates) or len(landmarks) < MIN_REP_FRAMES:
+            return None
+        query = resample(normalize_sequence(landmarks))
+        templates = self.sequences[candidates]
+        # Every template against the rep as seen and mirrored, in one batch
+        queries = np.stack([query, mirror(query)])
+        pairs_q = np.repeat(queries, len(templates), axis=0)
+        pairs_t = np.tile(templates, (2, 1, 1, 1))
+        total, steps = dtw(frame_costs(pairs_q, pairs_t, self.band), self.band)
+
+        path_cost = total[:, -1, -1]
+        best = int(np.argmin(path_cost))
+        path = warping_path(steps[best])
+        q, t = pairs_q[best][path[:, 0]], pairs_t[best][path[:, 1]]
+        with _ignore_empty_slices():
+            deviation = np.nanmean(np.linalg.norm(q - t, axis=-1), axis=0)
+        distance = float(path_cost[best] / len(path))
+        joint_names = JOINT_NAMES if best < len(templates) else tuple(JOINT_NAMES[i] for i in MIRRORED_JOINTS)
+        joints = {name: (None if np.isnan(value) else round(float(value), 3))
+                  for name, value in zip(joint_names, deviation)}
+        worst = max((name for name in joints if joints[name] is not None), key=joints.get, default=None)
+        return {
+            "template": self.names[candidates[best % len(templates)]],
+            "similarity": round(float(similarity(distance)), 1),
+            "distance": round(distance, 3),
+            "mirrored": best >= len(templates),
+            "joint_deviation": joints,
+            "worst_joint": worst,
+        }
+
+    def stats(self):
+        return {exercise: self.exercises.count(exercise) for exercise in sorted(set(self.exercises))}
+
+
+@contextmanager
+def _ignore_empty_slices():
+    """Joints that are never visible give NaN, not "Mean of empty slice" warnings"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        yield
+
+
+# (path, mtime, band) the cached default index was loaded for, and the index
+_default_key = None
+_default_index = None
+
+
+def default_index():
+    """The index at POSE_TEMPLATES (default templates/index.npz); None if there is none
+
+    Loaded once per file version: setting POSE_TEMPLATES later, or rebuilding
+    the index, is picked up by the next session that asks for it.
+    """
+    global _default_key, _default_index
+    path = os.getenv("POSE_TEMPLATES", DEFAULT_INDEX_PATH)
+    try:
+        mtime = os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        mtime = None
+    band = float(os.getenv("POSE_TEMPLATE_BAND", DEFAULT_BAND))
+    key = (path, mtime, band)
+    if key != _default_key:
+        _default_index = TemplateIndex.load(path, band) if mtime is not None else None
+        _default_key = key
+    return _default_index
+
+
+class RepBuffer:
+    """Recent (timestamp, landmarks) of a session, so a completed rep can be matched"""
+
+    def __init__(self, max_frames=MAX_REP_FRAMES):
+        self.frames = deque(maxlen=max_frames)
+
+    def append(self, landmarks, timestamp):
+        self.frames.append((timestamp, landmarks.data.copy()))
+
+    def since(self, start):
+        """(N, 33, 4) landmarks from timestamp start on"""
+        rows = [data for timestamp, data in self.frames if timestamp >= start]
+        return np.stack(rows) if rows else np.empty((0, len(LANDMARK_NAMES), 4), dtype=np.float32)
+
+
+def build(videos, exercise, output=DEFAULT_INDEX_PATH, append=False, stride=1):
+    """Detect every rep of the reference videos and store each one as a template"""
+    from pose_analyzer import PoseAnalyzer
+    from video_analysis import detect_chunk, probe_video, score_series
+
+    index = TemplateIndex.load(output) if append and os.path.exists(output) else TemplateIndex()
+    analyzer = PoseAnalyzer()
+    for path in videos:
+        fps = probe_video(path)["fps"]
+        frames, landmarks, detected = detect_chunk(analyzer, path, 0, None, stride)
+        timestamps = frames / fps
+        reps = score_series(landmarks, detected, timestamps, exercise)["reps"]
+        for rep in reps:
+            lo, hi = np.searchsorted(timestamps, [rep["start"], rep["end"]], side="left")
+            window = landmarks[lo:hi + 1][detected[lo:hi + 1]]
+            if len(window) >= MIN_REP_FRAMES:
+                index.add(f"{os.path.splitext(os.path.basename(path))[0]}#{rep['rep']}", exercise, window)
+        print(f"🎯 {path}: {len(reps)} rep(s)")
+    index.save(output)
+    print(f"💾 {len(index)} template(s) in {output}: {index.stats()}")
+
+
+def main():
+    from exercises import EXERCISE_NAMES
+
+    parser = argparse.ArgumentParser(description="Build or inspect the reference template index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Add every rep of reference videos as templates")
+    build_parser.add_argument("videos", nargs="+")
+    build_parser.add_argument("--exercise", required=True, choices=[e for e in EXERCISE_NAMES if e != "general"])
+    build_parser.add_argument("--output", "-o", default=DEFAULT_INDEX_PATH)
+    build_parser.add_argument("--append", action="store_true", help="Keep the templates already in the index")
+    build_parser.add_argument("--stride", type=int, default=1, help="Analyze every n-th frame")
+    list_parser = commands.add_parser("list", help="Show the templates in an index")
+    list_parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.videos, args.exercise, args.output, args.append, args.stride)
+    else:
+        index = TemplateIndex.load(args.index)
+        for name, exercise in zip(index.names, index.exercises):
+            print(f"{exercise:8} {name}")
+        print(f"{len(index)} template(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Temporal landmark filtering
+One-Euro smoothing over (33, 4) landmark arrays and keyframe skipping with constant-velocity
+extrapolation between inferences
+"""
+
+import math
+import os
+
+import numpy as np
+
+from landmarks import KEY_INDICES, VIS, Landmarks
+
+DEFAULT_MIN_CUTOFF = 1.0
+# Landmarks are normalized to the frame, so speeds are in frame-widths per second
+DEFAULT_BETA = 5.0
+DEFAULT_D_CUTOFF = 1.0
+DEFAULT_KEYFRAME_INTERVAL = 1
+DEFAULT_KEYFRAME_MOTION = 0.02
+# Longer gaps restart the filter instead of blending across them
+MAX_GAP = 0.5
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One-Euro filter applied element-wise to an array of coordinates
+
+    A low-pass filter whose cutoff rises with speed: still landmarks are
+    smoothed heavily (no jitter), fast ones barely (little lag).
+    """
+
+    def __init__(self, min_cutoff=DEFAULT_MIN_CUTOFF, beta=DEFAULT_BETA, d_cutoff=DEFAULT_D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.velocity = None
+        self.timestamp = None
+
+    def reset(self):
+        self.value = self.velocity = self.timestamp = None
+
+    def __call__(self, value, timestamp):
+        dt = None if self.timestamp is None else timestamp - self.timestamp
+        if dt is None or not 0 < dt <= MAX_GAP:
+            self.value = value.copy()
+            self.velocity = np.zeros_like(value)
+            self.timestamp = timestamp
+            return self.value
+
+        self.velocity += _alpha(self.d_cutoff, dt) * ((value - self.value) / dt - self.velocity)
+        cutoff = self.min_cutoff + self.beta * np.abs(self.velocity)
+        tau = 1.0 / (2 * np.pi * cutoff)
+        self.value += (value - self.value) / (1.0 + tau / dt)
+        self.timestamp = timestamp
+        return self.value
+
+
+class TemporalLandmarkStage:
+    """Per-session smoothing plus keyframe skipping
+
+    predict() returns extrapolated landmarks when inference can be skipped
+    for this frame, or None when it must run: every keyframe_interval-th
+    frame, after a lost detection, or when the key landmarks are predicted to
+    have moved more than motion_threshold (in normalized units) since the
+    last inference. update() feeds an inference result through the filter.
+    """
+
+    def __init__(self, smoothing=True, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 motion_threshold=DEFAULT_KEYFRAME_MOTION, min_cutoff=DEFAULT_MIN_CUTOFF, beta=DEFAULT_BETA):
+        self.smoothing = smoothing
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.motion_threshold = motion_threshold
+        self.filter = OneEuroFilter(min_cutoff, beta)
+        self._visibility = None
+        self._since_keyframe = 0
+        self._keyframe_time = None
+        self.keyframes = 0
+        self.skipped = 0
+        self.last_was_keyframe = True
+
+    @classmethod
+    def from_env(cls):
+        """Stage configured by POSE_SMOOTHING*/POSE_KEYFRAME*, or None when both are off"""
+        smoothing = os.getenv("POSE_SMOOTHING", "1") == "1"
+        interval = int(os.getenv("POSE_KEYFRAME_INTERVAL", DEFAULT_KEYFRAME_INTERVAL))
+        if not smoothing and interval <= 1:
+            return None
+        return cls(
+            smoothing=smoothing,
+            keyframe_interval=interval,
+            motion_threshold=float(os.getenv("POSE_KEYFRAME_MOTION", DEFAULT_KEYFRAME_MOTION)),
+            min_cutoff=float(os.getenv("POSE_SMOOTHING_MIN_CUTOFF", DEFAULT_MIN_CUTOFF)),
+            beta=float(os.getenv("POSE_SMOOTHING_BETA", DEFAULT_BETA)),
+        )
+
+    def predict(self, timestamp):
+        """Extrapolated Landmarks for a skipped frame, or None if inference should run"""
+        f = self.filter
+        if self.keyframe_interval <= 1 or f.value is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            return None
+        elapsed = timestamp - f.timestamp
+        if not 0 <= elapsed <= MAX_GAP:
+            return None
+        # Predicted displacement of the key landmarks since the last real inference
+        horizon = timestamp - self._keyframe_time
+        speed = np.hypot(f.velocity[KEY_INDICES, 0], f.velocity[KEY_INDICES, 1])
+        if speed.max() * horizon > self.motion_threshold:
+            return None
+
+        self._since_keyframe += 1
+        self.skipped += 1
+        self.last_was_keyframe = False
+        data = np.empty((len(f.value), 4), dtype=np.float32)
+        data[:, :VIS] = f.value + f.velocity * elapsed
+        data[:, VIS] = self._visibility
+        return Landmarks(data)
+
+    def update(self, landmarks, timestamp):
+        """Filter an inference result (None resets the stage); returns the Landmarks to use"""
+        self.keyframes += 1
+        self._since_keyframe = 0
+        self._keyframe_time = timestamp
+        self.last_was_keyframe = True
+        if landmarks is None:
+            self.filter.reset()
+            return None
+
+        # Only x, y, z are filtered; visibility is a per-frame confidence
+        smoothed = self.filter(landmarks.data[:, :VIS].astype(np.float64), timestamp)
+        self._visibility = landmarks.data[:, VIS].copy()
+        if not self.smoothing:
+            return landmarks
+        data = landmarks.data.copy()
+        data[:, :VIS] = smoothed
+        return Landmarks(data)
+
+    def stats(self):
+        return {
+            "smoothing": self.smoothing,
+            "keyframe_interval": self.keyframe_interval,
+            "keyframe": self.last_was_keyframe,
+            "skipped_frames": self.skipped,
+        }
@@ -0,0 +1,86 @@
+from urllib.error import URLError
+
+import numpy as np
+import pytest
+
+import adaptive_pose
+from adaptive_pose import AdaptivePose, QualityController
+
+INIT_MS = 250.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def simulated(monkeypatch):
+    """AdaptivePose over fake Pose instances with a steady time per model complexity
+
+    Each Pose's first frame also pays INIT_MS of graph initialization.
+    """
+    clock = FakeClock()
+    monkeypatch.setattr(adaptive_pose.time, "perf_counter", clock.perf_counter)
+
+    def run(steady_ms, frames=200, **pose_kwargs):
+        class FakePose:
+            def __init__(self, static_image_mode, model_complexity, enable_segmentation):
+                self.complexity = model_complexity
+                self.initialized = False
+
+            def process(self, image):
+                clock.now += (steady_ms[self.complexity] + (0 if self.initialized else INIT_MS)) / 1000
+                self.initialized = True
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(adaptive_pose, "create_pose", FakePose)
+        controller = QualityController(budget_ms=100, start_level=0, adaptive=True, segmentation=False)
+        pose = AdaptivePose(controller=controller, **pose_kwargs)
+        image = np.zeros((48, 64, 3), dtype=np.uint8)
+        for _ in range(frames):
+            pose.process(image)
+        return controller
+    return run
+
+
+def test_fast_model_stays_at_top_level(simulated):
+    controller = simulated({2: 80, 1: 50, 0: 30})
+    assert controller.level_index == 0
+    assert controller.changes == 0
+
+
+def test_init_spike_alone_used_to_step_down(simulated):
+    # Timing the warm-up frame is what made fast sessions step down (and back up, repeatedly)
+    controller = simulated({2: 80, 1: 50, 0: 30}, warmup_frames=0)
+    assert controller.changes > 2
+
+
+def test_slow_model_steps_down_and_settles(simulated):
+    controller = simulated({2: 150, 1: 70, 0: 30})
+    assert controller.level_index == 1
+    assert controller.changes == 1
+
+
+def test_levels_whose_model_failed_to_preload_are_skipped(monkeypatch, simulated):
+    class OfflinePose:
+        def __init__(self, model_complexity, **kwargs):
+            if model_complexity != 1:
+                raise URLError("offline")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(adaptive_pose, "_unavailable", set())
+    monkeypatch.setattr(adaptive_pose, "create_pose", OfflinePose)
+    assert adaptive_pose.preload_models() == [1]
+
+    # Starts on the first level with the bundled model and never steps onto another model
+    controller = simulated({2: 150, 1: 150, 0: 30})
+    assert adaptive_pose.QUALITY_LEVELS[controller.level_index]["model_complexity"] == 1
+    assert controller.level_index == 2
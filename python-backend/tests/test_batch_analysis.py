@@ -0,0 +1,62 @@
+import numpy as np
+
+from batch_analysis import analyze_general_posture_batch, build_frame_results, frame_analysis
+from landmarks import (
+    KEY_INDICES, LEFT_HIP, LEFT_SHOULDER, NUM_LANDMARKS, RIGHT_HIP, RIGHT_SHOULDER, VIS, Y
+)
+
+
+def upright(frames=1):
+    """(frames, 33, 4) landmarks of a level, upright and fully visible pose"""
+    landmarks = np.zeros((frames, NUM_LANDMARKS, 4), dtype=np.float32)
+    landmarks[..., :2] = 0.5
+    landmarks[..., VIS] = 1.0
+    landmarks[:, [LEFT_SHOULDER, RIGHT_SHOULDER], Y] = 0.3
+    landmarks[:, [LEFT_HIP, RIGHT_HIP], Y] = 0.55
+    return landmarks
+
+
+def test_each_fault_costs_its_penalty():
+    landmarks = upright(6)
+    landmarks[1, LEFT_SHOULDER, Y] = 0.36                       # shoulders off: -15
+    landmarks[2, LEFT_HIP, Y] = 0.59                            # hips off: -10
+    landmarks[3, [LEFT_SHOULDER, RIGHT_SHOULDER], Y] = 0.7      # below the hips: -20
+    landmarks[4, KEY_INDICES[:len(KEY_INDICES) - 7], VIS] = 0.6  # only 7 key points clearly seen: -10
+    landmarks[5, RIGHT_HIP, VIS] = 0.4                          # a required landmark hidden
+    metrics = analyze_general_posture_batch(landmarks)
+
+    assert metrics["accuracy"].tolist() == [100, 85, 90, 80, 90, 20]
+    assert metrics["visible"].tolist() == [True] * 5 + [False]
+    assert metrics["shoulder_height_difference"][1] == np.float32(0.36) - np.float32(0.3)
+
+
+def test_batch_matches_single_frame_analysis():
+    rng = np.random.default_rng(0)
+    landmarks = upright(20)
+    landmarks[..., Y] += rng.normal(0, 0.04, landmarks.shape[:2])
+    landmarks[..., VIS] = rng.uniform(0.4, 1.0, landmarks.shape[:2])
+    metrics = analyze_general_posture_batch(landmarks)
+    for i in range(len(landmarks)):
+        assert frame_analysis(metrics, i) == frame_analysis(analyze_general_posture_batch(landmarks[i:i + 1]), 0)
+
+
+def test_frames_without_a_pose_are_not_visible():
+    landmarks = upright(2)
+    landmarks[1] = np.nan
+    metrics = analyze_general_posture_batch(landmarks)
+    assert metrics["visible"].tolist() == [True, False]
+    assert metrics["accuracy"].tolist() == [100, 20]
+
+
+def test_build_frame_results():
+    landmarks = upright(3)
+    landmarks[1] = np.nan
+    results = build_frame_results(landmarks, detected=[True, False, True], invalid=[2], include_landmarks=True)
+
+    assert [r["success"] for r in results] == [True, False, False]
+    assert results[0]["accuracy"] == 100
+    assert results[0]["feedback"] == "Good shoulder alignment | Good hip alignment | Good pose stability"
+    assert results[0]["detailed_analysis"]["hip_alignment"]["status"] == "good"
+    assert results[0]["landmarks"] is not None
+    assert results[1]["feedback"].startswith("No pose detected")
+    assert results[2]["feedback"] == "Invalid image format" and results[2]["landmarks"] is None
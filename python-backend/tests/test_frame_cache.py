@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from frame_cache import FrameCache
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "benchmarks", "fixtures", "squat_320x240.mp4")
+
+
+@pytest.fixture
+def analyzer_factory(monkeypatch):
+    def create(cache, **env):
+        from pose_analyzer import PoseAnalyzer
+        monkeypatch.setenv("POSE_CACHE", "1" if cache else "0")
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return PoseAnalyzer()
+    return create
+
+
+def count_reps(analyzer):
+    from video_analysis import detect_chunk, probe_video, score_series
+    frames, landmarks, detected = detect_chunk(analyzer, FIXTURE, 0, None, 1)
+    return len(score_series(landmarks, detected, frames / probe_video(FIXTURE)["fps"], "squat")["reps"])
+
+
+def test_cache_does_not_freeze_a_moving_squat(analyzer_factory):
+    # Both runs on the same fixed model, so any difference comes from the cache
+    env = {"POSE_ADAPTIVE_QUALITY": "0", "POSE_QUALITY_LEVEL": "1"}
+    uncached = count_reps(analyzer_factory(cache=False, **env))
+    cached_analyzer = analyzer_factory(cache=True, **env)
+    assert uncached == 3
+    assert count_reps(cached_analyzer) == uncached
+
+
+def test_evicted_and_closed_sessions_drop_their_entries(analyzer_factory):
+    analyzer = analyzer_factory(cache=True, POSE_MAX_SESSIONS="1")
+    analyzer.get_session("a")
+    analyzer.cache.put("a", 1, None)
+    analyzer.get_session("b")  # evicts "a"
+    analyzer.cache.put("b", 1, None)
+    assert analyzer.cache.get("a", 1) == (False, None)
+
+    analyzer.close_session("b")
+    assert len(analyzer.cache) == 0
+
+
+def test_exact_match_by_default():
+    cache = FrameCache(max_entries=4, ttl=10)
+    cache.put("s", 0b1010, "pose", now=0)
+    assert cache.get("s", 0b1011, now=1) == (False, None)
+    assert cache.get("s", 0b1010, now=1) == (True, "pose")
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pytest
+
+from frame_decoder import (
+    InvalidImageError, decode_frame, decode_image, decode_raw, jpeg_dimensions, reduction_factor
+)
+
+
+def encoded(width, height, extension=".jpg"):
+    """A red image (RGB 255, 0, 0) encoded with OpenCV"""
+    bgr = np.zeros((height, width, 3), dtype=np.uint8)
+    bgr[..., 2] = 255
+    return cv2.imencode(extension, bgr)[1].tobytes()
+
+
+def test_jpeg_dimensions_from_header():
+    assert jpeg_dimensions(encoded(1920, 1080)) == (1920, 1080)
+    assert jpeg_dimensions(encoded(64, 48, ".png")) is None
+    assert jpeg_dimensions(b"\xff\xd8") is None
+
+
+def test_reduction_factor_keeps_long_side_above_max():
+    assert reduction_factor(1920, 1080, 640) == 2
+    assert reduction_factor(2560, 1440, 640) == 4
+    assert reduction_factor(1080, 5200, 640) == 8
+    assert reduction_factor(640, 480, 640) == 1
+
+
+@pytest.mark.parametrize("width, height, max_side, shape", [
+    (1920, 1080, 640, (540, 960, 3)),
+    (2560, 1440, 640, (360, 640, 3)),
+    (640, 480, 640, (480, 640, 3)),
+    (1920, 1080, 2000, (1080, 1920, 3)),
+])
+def test_large_jpegs_decode_at_reduced_resolution_in_rgb(width, height, max_side, shape):
+    image = decode_image(encoded(width, height), max_side=max_side)
+    assert image.shape == shape
+    # Colour survives the reduced decode and channels come back as RGB
+    assert np.abs(image[shape[0] // 2, shape[1] // 2].astype(int) - [255, 0, 0]).max() <= 8
+
+
+def test_max_side_from_environment(monkeypatch):
+    monkeypatch.setenv("POSE_DECODE_MAX_SIDE", "200")
+    assert decode_frame(encoded(1600, 1200)).shape == (150, 200, 3)
+
+
+def test_png_is_decoded_at_full_size():
+    image = decode_image(encoded(1280, 720, ".png"), max_side=320)
+    assert image.shape == (720, 1280, 3) and image[0, 0].tolist() == [255, 0, 0]
+
+
+def test_invalid_bytes_raise():
+    with pytest.raises(InvalidImageError):
+        decode_image(b"not an image")
+
+
+def test_raw_formats():
+    rgb = np.arange(4 * 2 * 3, dtype=np.uint8).reshape(2, 4, 3)
+    assert np.array_equal(decode_frame(rgb.tobytes(), (4, 2, "rgb24")), rgb)
+    assert np.array_equal(decode_raw(rgb[..., ::-1].tobytes(), 4, 2, "bgr24"), rgb)
+    assert decode_raw(bytes(4 * 2 * 3 // 2), 4, 2, "nv12").shape == (2, 4, 3)
+    with pytest.raises(InvalidImageError):
+        decode_raw(bytes(10), 4, 2)
+    with pytest.raises(InvalidImageError):
+        decode_raw(bytes(3 * 3 * 3 // 2), 3, 3, "i420")
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures import Future
+from urllib.error import URLError
+
+import pytest
+
+from inference_pool import InferencePool, WorkerCrashedError, _warmup
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Workers inherit the environment: the lighter full model keeps spawning quick
+    monkeypatch.setenv("POSE_QUALITY_LEVEL", "1")
+    pool = InferencePool(workers=1, max_pending=4)
+    pool.start(warm=True)
+    yield pool
+    pool.shutdown()
+
+
+def wait_until(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_killed_worker_is_respawned_and_request_succeeds(pool):
+    pid = pool.warmup[0]["pid"]
+    os.kill(pid, signal.SIGKILL)
+
+    # Same session key, so the request goes to the shard whose worker was killed
+    result = asyncio.run(pool.run(_warmup, key="session-1"))
+    assert result["pid"] != pid
+    assert pool.stats()["respawns"] == 1
+
+    wait_until(lambda: pool.ready)
+    assert pool.stats()["workers_down"] == []
+    assert asyncio.run(pool.run(_warmup, key="session-1"))["pid"] == result["pid"]
+
+
+def test_task_that_crashes_its_worker_is_not_retried(pool):
+    pid = pool.warmup[0]["pid"]
+
+    async def crash_with_queued_task():
+        # Both on the crashing worker: the second is still queued when it dies
+        crash = pool.run(os._exit, 1, key="session-1")
+        queued = pool.run(_warmup, key="session-1")
+        return await asyncio.gather(crash, queued, return_exceptions=True)
+
+    crashed, result = asyncio.run(crash_with_queued_task())
+    assert isinstance(crashed, WorkerCrashedError)
+    assert result["pid"] != pid
+    assert pool.stats()["respawns"] == 1
+
+
+def test_failed_rewarm_is_reported_until_recovered(pool):
+    executor = pool._shards[0]
+    pool.down.add(0)
+    failed = Future()
+    failed.set_exception(URLError("offline"))
+    pool._rewarmed(failed, 0, executor)
+    assert pool.stats()["workers_down"] == []
+    assert not pool.ready
+    assert "URLError" in pool.warm_error
+
+    warmed = Future()
+    warmed.set_result({})
+    pool._rewarmed(warmed, 0, executor)
+    assert pool.ready and pool.warm_error is None
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from multicam import MultiCameraService
+from session_recorder import read_meta, recording_path
+
+
+@pytest.fixture
+def recording(monkeypatch, tmp_path):
+    # Workers inherit the environment: record every session, flushing only when it closes
+    monkeypatch.setenv("POSE_QUALITY_LEVEL", "1")
+    monkeypatch.setenv("POSE_RECORD", "1")
+    monkeypatch.setenv("POSE_RECORD_DIR", str(tmp_path))
+    monkeypatch.setenv("POSE_RECORD_FLUSH", "100000")
+    return tmp_path
+
+
+def test_stop_waits_for_sessions_to_close(recording):
+    service = MultiCameraService([("front", "synthetic://160x120@30"), ("side", "synthetic://160x120@30")],
+                                 workers=1)
+    service.start()
+    deadline = time.monotonic() + 60
+    while not all(stream.analyzed >= 3 for stream in service.streams):
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+    service.stop()
+
+    for stream in service.streams:
+        meta = read_meta(recording_path(stream.session_id, str(recording)))
+        assert meta is not None, f"{stream.stream_id} was not flushed"
+        assert meta["frames"] >= stream.analyzed
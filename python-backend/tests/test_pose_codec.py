@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from joint_angles import EXERCISE_ANGLES
+from landmarks import KEY_INDICES, NUM_LANDMARKS
+from pose_codec import (
+    FEEDBACK_CODES, REP_COMPLETE, decode_result, encode_result, encode_stream_result, feedback_codes,
+    format_description
+)
+
+
+def squat_result(landmarks=None):
+    names = EXERCISE_ANGLES["squat"].names
+    return {
+        "success": True,
+        "accuracy": 72,
+        "feedback": "Rep 3 complete | Rep differs from reference at the left knee | Something new",
+        "angles": {name: 90.0 + i for i, name in enumerate(names[1:])},
+        "detailed_analysis": {"reps": 3, "partial_reps": 1, "last_rep_depth": 84.5,
+                              "tempo": {"eccentric": 1.25, "concentric": 0.75}},
+        "landmarks": landmarks,
+    }
+
+
+def test_template_feedback_has_its_own_code():
+    codes = feedback_codes("Rep differs from reference at the right ankle")
+    assert codes == [FEEDBACK_CODES["Rep differs from reference at the right ankle"]]
+    assert codes[0] != 0
+
+
+@pytest.mark.parametrize("precision, tolerance", [("f16", 1e-3), ("f32", 0)])
+def test_round_trip(precision, tolerance):
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((NUM_LANDMARKS, 4)).astype(np.float32)
+    result = squat_result(landmarks)
+    decoded = decode_result(encode_result(result, "squat", precision))
+
+    assert decoded["success"] and decoded["exercise"] == "squat" and decoded["accuracy"] == 72
+    messages = format_description()["feedback_codes"]
+    assert decoded["feedback_codes"][0] == REP_COMPLETE
+    assert messages[decoded["feedback_codes"][1]] == "Rep differs from reference at the left knee"
+    assert decoded["feedback_codes"][2] == 0  # free text has no code
+
+    first, *rest = EXERCISE_ANGLES["squat"].names
+    assert math.isnan(decoded["angles"][first])
+    assert [decoded["angles"][name] for name in rest] == [result["angles"][name] for name in rest]
+    counters = decoded["counters"]
+    assert (counters["reps"], counters["partial_reps"]) == (3, 1)
+    assert counters["last_rep_depth"] == pytest.approx(84.5)
+    assert counters["eccentric"] == 1.25 and math.isnan(counters["best_hold"])
+    np.testing.assert_allclose(decoded["landmarks"], landmarks[KEY_INDICES], atol=tolerance)
+
+
+def test_stream_packet_without_landmarks():
+    packet = encode_stream_result(squat_result(), seq=7, dropped=2, exercise="squat")
+    assert packet[:8] == (7).to_bytes(4, "little") + (2).to_bytes(4, "little")
+    assert decode_result(packet[8:])["landmarks"] is None
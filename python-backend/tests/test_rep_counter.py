@@ -0,0 +1,42 @@
+import math
+
+import pytest
+
+from exercises import RepCounter
+
+
+def feed(counter, angles, dt=0.1):
+    return [counter.update(angle, i * dt) for i, angle in enumerate(angles)]
+
+
+def test_full_rep_with_tempo_and_depth():
+    counter = RepCounter(down_angle=90, up_angle=160)
+    events = feed(counter, [170, 140, 100, 85, 80, 88, 120, 150, 165])
+    assert events.count("rep") == 1 and events[-1] == "rep"
+    assert counter.reps == 1 and counter.phase == "up"
+    assert counter.last_depth == 80
+    assert counter.eccentric == pytest.approx(0.3)   # top at 0.0, first bottom at 0.3
+    assert counter.concentric == pytest.approx(0.3)  # last frame below 90 at 0.5, top again at 0.8
+
+
+def test_jitter_around_thresholds_counts_once():
+    counter = RepCounter(down_angle=90, up_angle=160)
+    # Noise around the bottom threshold and in the band between the thresholds
+    feed(counter, [170, 95, 89, 91, 89, 92, 150, 140, 155, 161, 158, 162, 159])
+    assert counter.reps == 1
+    assert counter.partial_reps == 0
+
+
+def test_shallow_dip_is_a_partial_rep():
+    counter = RepCounter(down_angle=90, up_angle=160, partial_margin=20)
+    assert feed(counter, [170, 130, 120, 165]) == [None, None, None, "partial"]
+    # Within the margin below the top is not even a partial
+    feed(counter, [150, 165])
+    assert (counter.reps, counter.partial_reps) == (0, 1)
+
+
+def test_missing_angles_are_ignored():
+    counter = RepCounter(down_angle=90, up_angle=160)
+    feed(counter, [170, math.nan, 80, math.nan, 170])
+    assert counter.reps == 1
+    assert counter.details()["last_rep_depth"] == 80
@@ -0,0 +1,75 @@
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, VIS, X, Y, Z, Landmarks
+from roi_tracker import MIN_ROI_SIZE, RegionOfInterest
+
+WIDTH, HEIGHT = 640, 480
+
+
+def pose(x0, y0, x1, y1):
+    """Visible landmarks spread evenly over a normalized box"""
+    data = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    data[:, X] = np.linspace(x0, x1, NUM_LANDMARKS)
+    data[:, Y] = np.linspace(y0, y1, NUM_LANDMARKS)
+    data[:, Z] = 0.1
+    data[:, VIS] = 1.0
+    return Landmarks(data)
+
+
+def test_crop_landmarks_map_back_to_full_frame():
+    roi = RegionOfInterest()
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    roi.update(pose(0.4, 0.3, 0.6, 0.7), None, WIDTH, HEIGHT)
+    image, window = roi.crop(frame)
+    x0, y0, x1, y1 = window
+    assert image.shape == (y1 - y0, x1 - x0, 3)
+
+    # A landmark at the crop's centre, and one at its top-left corner
+    data = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    data[0] = [0.5, 0.5, 0.2, 1.0]
+    data[1] = [0.0, 0.0, 0.0, 1.0]
+    mapped = roi.update(Landmarks(data), window, WIDTH, HEIGHT).data
+    np.testing.assert_allclose(mapped[0, :2], [(x0 + x1) / 2 / WIDTH, (y0 + y1) / 2 / HEIGHT], rtol=1e-6)
+    np.testing.assert_allclose(mapped[1, :2], [x0 / WIDTH, y0 / HEIGHT], rtol=1e-6)
+    # z is scaled like x
+    assert mapped[0, Z] == np.float32(0.2 * (x1 - x0) / WIDTH)
+
+
+def test_window_pads_the_pose_and_stays_inside_the_frame():
+    roi = RegionOfInterest(padding=0.25)
+    roi.update(pose(0.375, 0.25, 0.625, 0.75), None, WIDTH, HEIGHT)
+    # Box is 160x240 px, padded by a quarter of its longer side on each side
+    assert roi.crop(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))[1] == (180, 60, 460, 420)
+
+    # A small pose still gets a crop of at least the minimum size
+    roi = RegionOfInterest(padding=0.25)
+    roi.update(pose(0.5, 0.5, 0.52, 0.52), None, WIDTH, HEIGHT)
+    x0, y0, x1, y1 = roi.crop(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))[1]
+    assert min(x1 - x0, y1 - y0) >= MIN_ROI_SIZE
+
+    roi = RegionOfInterest()
+    roi.update(pose(0.0, 0.0, 0.1, 0.3), None, WIDTH, HEIGHT)
+    x0, y0, x1, y1 = roi.crop(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))[1]
+    assert x0 == 0 and y0 == 0 and x1 <= WIDTH and y1 <= HEIGHT
+
+
+def test_window_is_kept_while_the_pose_stays_inside():
+    roi = RegionOfInterest()
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    roi.update(pose(0.4, 0.3, 0.6, 0.7), None, WIDTH, HEIGHT)
+    first = roi.crop(frame)[1]
+    roi.update(pose(0.41, 0.3, 0.61, 0.7), None, WIDTH, HEIGHT)
+    assert roi.crop(frame)[1] == first
+
+
+def test_lost_or_large_pose_uses_the_full_frame():
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    roi = RegionOfInterest()
+    roi.update(pose(0.4, 0.3, 0.6, 0.7), None, WIDTH, HEIGHT)
+    roi.update(None, roi.crop(frame)[1], WIDTH, HEIGHT)
+    assert roi.crop(frame)[1] is None
+    assert roi.stats()["roi_lost"] == 1
+
+    roi.update(pose(0.05, 0.05, 0.95, 0.95), None, WIDTH, HEIGHT)
+    image, window = roi.crop(frame)
+    assert window is None and image is frame
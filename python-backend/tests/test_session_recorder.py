@@ -0,0 +1,105 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from exercises import EXERCISE_NAMES
+from landmarks import NUM_LANDMARKS, Landmarks
+from session_recorder import (
+    RECORDED_ANGLES, SessionAggregates, SessionRecorder, read_series, read_summary, reduce_buckets
+)
+
+
+def angles_with(first, second=math.nan):
+    """A row of recorded angles with only the first two set"""
+    angles = np.full(len(RECORDED_ANGLES), np.nan)
+    angles[:2] = [first, second]
+    return angles
+
+
+def test_welford_matches_numpy_and_skips_missing_angles():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(60, 180, 200)
+    aggregates = SessionAggregates()
+    for k, value in enumerate(values):
+        # The second angle is only seen on even frames
+        aggregates.update("squat", 80, angles_with(value, value if k % 2 == 0 else math.nan))
+
+    assert aggregates.angle_count[:2].tolist() == [200, 100]
+    assert aggregates.angle_mean[0] == pytest.approx(values.mean())
+    assert math.sqrt(aggregates.angle_m2[0] / 200) == pytest.approx(values.std())
+    assert aggregates.angle_mean[1] == pytest.approx(values[::2].mean())
+    assert (aggregates.angle_min[0], aggregates.angle_max[0]) == (values.min(), values.max())
+    assert aggregates.angle_count[2:].sum() == 0
+
+
+def test_histogram_percentiles():
+    aggregates = SessionAggregates()
+    for accuracy in range(1, 101):
+        aggregates.update("squat", accuracy, angles_with(90))
+    aggregates.update("squat")  # a frame without a pose
+
+    assert (aggregates.frames, aggregates.detected) == (101, 100)
+    assert [aggregates.percentile(q) for q in (10, 50, 90)] == [10, 50, 90]
+    assert SessionAggregates().percentile(50) is None
+
+
+def test_state_round_trips_through_json():
+    aggregates = SessionAggregates()
+    aggregates.update("squat", 71.6, angles_with(100, 120), {"reps": 2})
+    aggregates.update("squat", 64.2, angles_with(80), {"reps": 3})
+
+    restored = SessionAggregates.from_state(json.loads(json.dumps(aggregates.state())))
+    assert restored.summary() == aggregates.summary()
+    # Angles never seen stay unbounded rather than becoming 0
+    assert math.isinf(restored.angle_min[2]) and math.isinf(restored.angle_max[2])
+    assert restored.summary()["exercises"]["squat"] == {"frames": 2, "reps": 3}
+
+
+def test_reduce_buckets_handles_short_last_bucket_and_nan():
+    values = np.array([1, 2, 3, 4, np.nan, np.nan, 7], dtype=np.float32)
+    np.testing.assert_array_equal(reduce_buckets(values, 1, "mean"), values)
+    np.testing.assert_array_equal(reduce_buckets(values, 2, "first"), [1, 3, np.nan, 7])
+    means = reduce_buckets(values, 2, "mean")
+    assert means[:2].tolist() == [1.5, 3.5] and math.isnan(means[2]) and means[3] == 7
+    assert reduce_buckets(values, 3, "max")[[0, 2]].tolist() == [3, 7]
+
+
+def test_read_series_downsamples_committed_rows(tmp_path):
+    landmarks = Landmarks(np.full((NUM_LANDMARKS, 4), 0.5, dtype=np.float32))
+    recorder = SessionRecorder("downsample", root=str(tmp_path), flush_interval=50)
+    for frame in range(120):
+        detected = frame % 10 != 0
+        recorder.record("squat", landmarks if detected else None, accuracy=frame if detected else None,
+                        details={"reps": frame // 40}, now=recorder.started + frame / 10)
+    assert read_series("downsample", root=str(tmp_path))["frames"] == 100  # last flush at frame 100
+
+    recorder.close()
+    series = read_series("downsample", ("accuracy", "reps", "exercise"), max_points=30, root=str(tmp_path))
+    assert series["frames"] == 120 and series["step"] == 4
+    values = series["series"]
+    assert len(values["t"]) == 30 and values["t"][:2] == [0.0, 0.4]
+    # Bucket 0 holds frames 0-3, frame 0 without a pose
+    assert values["accuracy"][:2] == [2.0, 5.5]
+    assert values["reps"][9:11] == [0, 1] and values["reps"][-1] == 2
+    assert set(values["exercise"]) == {"squat"}
+
+    window = read_series("downsample", start=1.95, end=2.95, root=str(tmp_path))
+    assert window["range"] == [20, 30] and window["step"] == 1
+
+    with pytest.raises(ValueError):
+        read_series("downsample", ("bogus",), root=str(tmp_path))
+    assert read_series("missing", root=str(tmp_path)) is None
+
+
+def test_recording_is_reopened_and_extended(tmp_path):
+    landmarks = Landmarks(np.full((NUM_LANDMARKS, 4), 0.5, dtype=np.float32))
+    for _ in range(2):
+        recorder = SessionRecorder("reopen", root=str(tmp_path))
+        for _ in range(3):
+            recorder.record(EXERCISE_NAMES[0], landmarks, accuracy=50)
+        recorder.close()
+    summary = read_summary("reopen", root=str(tmp_path))
+    assert (summary["frames"], summary["detected_frames"]) == (6, 6)
+    assert summary["accuracy"]["mean"] == 50
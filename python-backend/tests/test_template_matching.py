@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pytest
+
+import template_matching
+from landmarks import (
+    LANDMARK_NAMES, LEFT_ELBOW, LEFT_HIP, LEFT_SHOULDER, LEFT_WRIST, NUM_LANDMARKS, RIGHT_HIP, RIGHT_SHOULDER, X
+)
+from template_matching import TemplateIndex, band_width, default_index, dtw, frame_costs, mirror, resample
+
+# Swaps every left_* landmark with its right_* counterpart
+LEFT_RIGHT = np.array([
+    LANDMARK_NAMES.index(name.replace("left", "right") if "left" in name else name.replace("right", "left"))
+    for name in LANDMARK_NAMES
+])
+
+
+def squat(frames=40, depth=0.08, arm=0.1):
+    """(frames, 33, 4) landmarks of one synthetic rep: hips and knees dip, the left arm swings"""
+    rng = np.random.default_rng(0)
+    base = np.column_stack([rng.uniform(0.35, 0.65, NUM_LANDMARKS), rng.uniform(0.1, 0.9, NUM_LANDMARKS)])
+    base[[LEFT_SHOULDER, RIGHT_SHOULDER]] = [[0.45, 0.3], [0.55, 0.3]]
+    base[[LEFT_HIP, RIGHT_HIP]] = [[0.46, 0.55], [0.54, 0.55]]
+    phase = np.sin(np.linspace(0, np.pi, frames))
+    xy = np.repeat(base[None], frames, axis=0)
+    # Everything from the shoulders down dips, less so towards the feet
+    body = np.arange(LEFT_SHOULDER, NUM_LANDMARKS)
+    xy[:, body, 1] += depth * phase[:, None] * np.linspace(1, 0, len(body))
+    xy[:, [LEFT_ELBOW, LEFT_WRIST], 0] -= arm * phase[:, None]
+    landmarks = np.zeros((frames, NUM_LANDMARKS, 4), dtype=np.float32)
+    landmarks[..., :2] = xy
+    landmarks[..., 3] = 1.0
+    return landmarks
+
+
+def mirrored(landmarks):
+    """The rep filmed from the other side: x flipped, so the detector labels left and right the other way"""
+    flipped = landmarks[:, LEFT_RIGHT].copy()
+    flipped[..., X] = 1 - flipped[..., X]
+    return flipped
+
+
+def reference_dtw(cost, band):
+    """Textbook O(L^2) DTW restricted to the Sakoe-Chiba band"""
+    length = len(cost)
+    width = band_width(length, band)
+    total = np.full((length + 1, length + 1), np.inf)
+    total[0, 0] = 0
+    for i in range(1, length + 1):
+        for j in range(1, length + 1):
+            if abs(i - j) <= width:
+                total[i, j] = cost[i - 1, j - 1] + min(total[i - 1, j - 1], total[i - 1, j], total[i, j - 1])
+    return total[length, length]
+
+
+def test_dtw_matches_reference_implementation():
+    rng = np.random.default_rng(1)
+    cost = rng.random((3, 12, 12)).astype(np.float32)
+    total, _ = dtw(cost, band=0.25)
+    for b in range(len(cost)):
+        assert total[b, -1, -1] == pytest.approx(reference_dtw(cost[b], 0.25), rel=1e-5)
+
+
+def test_frame_costs_of_identical_sequences_are_zero_on_the_diagonal():
+    sequence = resample(template_matching.normalize_sequence(squat()))[None]
+    cost = frame_costs(sequence, sequence)
+    assert np.allclose(np.diagonal(cost, axis1=1, axis2=2), 0)
+    assert np.isinf(cost[0, 0, -1])  # outside the band
+
+
+def test_match_finds_time_warped_rep():
+    index = TemplateIndex()
+    index.add("deep", "squat", squat())
+    index.add("shallow", "squat", squat(depth=0.02))
+    index.add("pushup", "pushup", squat())
+
+    # Same movement, slower and with a pause at the bottom
+    slow = squat(frames=70)
+    result = index.match(np.concatenate([slow[:35], slow[35:36].repeat(10, axis=0), slow[35:]]), "squat")
+    assert result["template"] == "deep"
+    assert result["similarity"] > 80
+    assert not result["mirrored"]
+    assert set(result["joint_deviation"]) == set(template_matching.JOINT_NAMES)
+
+    assert index.match(squat(), "plank") is None
+    assert index.match(squat(frames=3), "squat") is None
+
+
+def test_match_recognizes_mirrored_rep():
+    index = TemplateIndex()
+    index.add("reference", "squat", squat(arm=0.2))
+    rep = mirrored(squat(arm=0.2))
+    result = index.match(rep, "squat")
+    assert result["mirrored"]
+    assert result["similarity"] > 99
+
+    # The worst joint is reported as the user's own, not the template's
+    off = rep.copy()
+    off[:, LANDMARK_NAMES.index("right_knee"), X] += 0.1
+    assert index.match(off, "squat")["worst_joint"] == "right_knee"
+
+
+def test_mirror_is_its_own_inverse():
+    sequence = resample(template_matching.normalize_sequence(squat()))
+    assert np.array_equal(mirror(mirror(sequence)), sequence)
+
+
+def test_default_index_follows_path_and_rebuilds(monkeypatch, tmp_path):
+    path = str(tmp_path / "index.npz")
+    monkeypatch.setenv("POSE_TEMPLATES", path)
+    assert default_index() is None
+
+    index = TemplateIndex()
+    index.add("first", "squat", squat())
+    index.save(path)
+    assert default_index().names == ["first"]
+    assert default_index() is default_index()
+
+    index.add("second", "squat", squat(depth=0.02))
+    index.save(path)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+    assert default_index().names == ["first", "second"]
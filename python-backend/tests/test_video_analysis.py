@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from video_analysis import analyze_video, detect_chunk, plan_chunks
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "benchmarks", "fixtures", "squat_320x240.mp4")
+
+
+@pytest.fixture
+def fixed_quality(monkeypatch, tmp_path):
+    monkeypatch.setenv("POSE_QUALITY_LEVEL", "1")
+    monkeypatch.setenv("POSE_ADAPTIVE_QUALITY", "0")
+    monkeypatch.setenv("POSE_RECORD", "1")
+    monkeypatch.setenv("POSE_RECORD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_chunks_take_no_session_slot_and_are_not_recorded(fixed_quality):
+    from pose_analyzer import PoseAnalyzer
+    analyzer = PoseAnalyzer()
+    frames, landmarks, detected = detect_chunk(analyzer, FIXTURE, 30, 60, 2, warmup=5)
+    assert frames.tolist() == list(range(30, 60, 2))
+    assert detected.all() and landmarks.shape == (15, 33, 4)
+    assert len(analyzer.sessions) == 0
+    assert os.listdir(fixed_quality) == []
+
+
+def test_plan_chunks_aligns_to_stride():
+    assert plan_chunks(100, 10.0, stride=3, chunk_seconds=2.0) == [(0, 21), (21, 42), (42, 63), (63, 84), (84, 100)]
+    assert plan_chunks(0, 30.0) == [(0, None)]
+
+
+def test_video_read_in_short_steps_is_stitched_in_order(fixed_quality):
+    from inference_pool import InferencePool
+    pool = InferencePool(workers=1, max_pending=2)
+    pool.start()
+    try:
+        report = asyncio.run(analyze_video(pool, FIXTURE, "squat", stride=1, chunk_seconds=2.0))
+    finally:
+        pool.shutdown()
+    assert report["chunks"] == 3
+    assert np.array_equal(report["series"]["frame"], np.arange(90))
+    assert report["summary"]["reps"] == 3
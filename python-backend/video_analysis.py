@@ -0,0 +1,391 @@
+"""
+Offline video analysis
+Splits a recorded workout into chunks detected in parallel worker processes, then stitches
+the landmarks in order and runs the exercise analyzers over the whole time series
+
+Usage:
+  python video_analysis.py workout.mp4 --exercise squat --stride 2 --output squats.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from batch_analysis import analyze_general_posture_batch
+from exercises import EXERCISE_NAMES, EXERCISE_STATES
+from frame_decoder import DEFAULT_MAX_SIDE
+from inference_pool import InferencePool, PoolSaturatedError, close_video_chunk, read_video_chunk
+from joint_angles import EXERCISE_ANGLES
+from landmarks import KEY_INDICES, KEY_NAMES, Landmarks, empty_landmarks
+
+DEFAULT_STRIDE = 2
+DEFAULT_CHUNK_SECONDS = 30.0
+# Analyzed frames per pool task: chunks are read in steps this short so live frames sharing
+# a worker never wait behind a whole chunk
+DEFAULT_STEP_FRAMES = 8
+# How long a step waits before retrying when the pool is full
+SATURATED_RETRY_WAIT = 0.02
+# Analyzed frames run before a chunk's first frame so its tracker has locked on
+DEFAULT_WARMUP_FRAMES = 10
+# Used when the container does not report a frame rate
+FALLBACK_FPS = 30.0
+
+
+class InvalidVideoError(ValueError):
+    """Raised when a file cannot be opened or read as a video"""
+
+
+def probe_video(path):
+    """Frame rate, frame count and size of a video file (frames is 0 when unknown)"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise InvalidVideoError("Could not open video file")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            "fps": fps if fps and fps > 0 and not math.isnan(fps) else FALLBACK_FPS,
+            "frames": max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def plan_chunks(frame_count, fps, stride=DEFAULT_STRIDE, chunk_seconds=DEFAULT_CHUNK_SECONDS):
+    """[start, stop) frame ranges of about chunk_seconds each, aligned to the stride"""
+    if frame_count <= 0:
+        return [(0, None)]
+    chunk_frames = max(stride, int(chunk_seconds * fps))
+    chunk_frames += -chunk_frames % stride
+    return [(start, min(start + chunk_frames, frame_count))
+            for start in range(0, frame_count, chunk_frames)]
+
+
+class ChunkReader:
+    """Landmarks for every stride-th frame (by absolute index) in [start, stop), a few at a time
+
+    Lives in a worker for the duration of its chunk, so the chunk can be read
+    in short steps (see inference_pool.read_video_chunk) without seeking again
+    or losing tracking. Frames are analyzed on a detached tracker session
+    (see PoseAnalyzer.detached_session). Decoding begins `warmup` analyzed
+    frames before start so tracking is already locked on at the chunk
+    boundary; those frames are not returned. Skipped frames are only
+    grabbed, never converted.
+    """
+
+    def __init__(self, analyzer, path, start, stop, stride, warmup=0, max_side=None):
+        self.analyzer = analyzer
+        self.start = start
+        self.stop = stop
+        self.stride = stride
+        self.max_side = max_side or int(os.getenv("POSE_DECODE_MAX_SIDE", DEFAULT_MAX_SIDE))
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise InvalidVideoError("Could not open video file")
+
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 and not math.isnan(fps) else FALLBACK_FPS
+
+        first = max(0, start - warmup * stride)
+        first -= first % stride
+        if first:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+        self.index = first
+        self.done = False
+        self.session = analyzer.detached_session(f"video:{uuid.uuid4().hex}")
+
+    def read(self, frames=None):
+        """Up to `frames` more returned frames (all the rest with None); sets done at the end
+
+        Returns (frame indices, (n, 33, 4) landmarks with NaN rows for
+        misses, detected (n,) bool).
+        """
+        indices, rows = [], []
+        while not self.done and (frames is None or len(rows) < frames):
+            if self.stop is not None and self.index >= self.stop:
+                self.done = True
+                break
+            if self.index % self.stride:
+                if not self.cap.grab():
+                    self.done = True
+                self.index += 1
+                continue
+            success, frame = self.cap.read()
+            if not success:
+                self.done = True
+                break
+
+            height, width = frame.shape[:2]
+            scale = self.max_side / max(height, width)
+            if scale < 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            # Video time, not wall-clock time, drives smoothing and keyframe skipping
+            landmarks = self.analyzer.detect_landmarks(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), self.session,
+                                                       self.index / self.fps)
+
+            if self.index >= self.start:
+                indices.append(self.index)
+                rows.append(None if landmarks is None else landmarks.data)
+            self.index += 1
+
+        landmarks = empty_landmarks(len(rows))
+        detected = np.zeros(len(rows), dtype=bool)
+        for i, data in enumerate(rows):
+            if data is not None:
+                landmarks[i] = data
+                detected[i] = True
+        return np.asarray(indices, dtype=np.int64), landmarks, detected
+
+    def close(self):
+        self.cap.release()
+        self.analyzer.close_detached(self.session)
+
+
+def detect_chunk(analyzer, path, start, stop, stride, warmup=0, max_side=None):
+    """Read a whole chunk in one go (in-process use: template building, tests)"""
+    reader = ChunkReader(analyzer, path, start, stop, stride, warmup, max_side)
+    try:
+        return reader.read()
+    finally:
+        reader.close()
+
+
+async def detect_video(pool, path, chunks, stride, warmup=DEFAULT_WARMUP_FRAMES, step=None):
+    """Read the chunks on the pool a few frames per task and stitch them in order
+
+    Each chunk stays on one worker, which reads it in tasks of `step`
+    analyzed frames, so live frames on that worker wait for one step rather
+    than a whole chunk. At most one chunk per worker is active. If the pool
+    is full before anything was admitted, PoolSaturatedError is raised;
+    after that, steps wait for room.
+    """
+    step = step or int(os.getenv("POSE_VIDEO_STEP_FRAMES", DEFAULT_STEP_FRAMES))
+    job = uuid.uuid4().hex
+    slots = asyncio.Semaphore(pool.workers)
+    admitted = False
+
+    async def read_chunk(number, start, stop):
+        nonlocal admitted
+        key = pool.key_for_shard(f"video:{job}:{number}", number % pool.workers)
+        parts = []
+        async with slots:
+            try:
+                done = False
+                while not done:
+                    while True:
+                        try:
+                            future = pool.submit(read_video_chunk, key, path, start, stop, stride, warmup, step,
+                                                 key=key)
+                            break
+                        except PoolSaturatedError:
+                            if not admitted:
+                                raise
+                            await asyncio.sleep(SATURATED_RETRY_WAIT)
+                    admitted = True
+                    *part, done = await asyncio.wrap_future(future)
+                    parts.append(part)
+            except BaseException:
+                # Release the chunk's capture and tracker in its worker
+                try:
+                    pool.submit(close_video_chunk, key, key=key)
+                except PoolSaturatedError:
+                    pass
+                raise
+        return parts
+
+    chunk_parts = await asyncio.gather(*[read_chunk(n, start, stop) for n, (start, stop) in enumerate(chunks)])
+    parts = [part for chunk in chunk_parts for part in chunk]
+    return (
+        np.concatenate([p[0] for p in parts]),
+        np.concatenate([p[1] for p in parts]),
+        np.concatenate([p[2] for p in parts]),
+    )
+
+
+def _rounded(values, decimals):
+    """List with NaN mapped to None, for JSON"""
+    return [None if math.isnan(v) else v for v in np.round(values.astype(np.float64), decimals).tolist()]
+
+
+def score_series(landmarks, detected, timestamps, exercise="general"):
+    """Per-frame accuracy/feedback, joint angles and reps for a stitched landmark series
+
+    The exercise state machines run sequentially over the whole video, so reps
+    crossing chunk boundaries are counted once. Each completed rep is scored
+    by the mean accuracy of its frames, and carries its closest reference
+    template when a template index is configured.
+    """
+    angle_set = EXERCISE_ANGLES[exercise]
+    angles = angle_set.compute(landmarks)
+    accuracy = np.zeros(len(detected))
+    feedback = []
+    reps, partials = [], []
+    details = {}
+
+    if exercise == "general":
+        metrics = analyze_general_posture_batch(landmarks)
+        accuracy = np.where(detected, metrics["accuracy"], 0)
+    else:
+        state = EXERCISE_STATES[exercise]()
+        counter = getattr(state, "counter", None)
+        for i in np.flatnonzero(detected):
+            t = float(timestamps[i])
+            top_before = counter.last_top if counter is not None else None
+            reps_before = counter.reps if counter is not None else 0
+            partials_before = counter.partial_reps if counter is not None else 0
+
+            analysis = state.update(Landmarks(landmarks[i]), dict(zip(angle_set.names, angles[i].tolist())), t)
+            accuracy[i] = analysis["accuracy"]
+            feedback.append((i, analysis["feedback"]))
+            details = analysis["details"]
+
+            if counter is not None and counter.reps > reps_before:
+                reps.append({
+                    "rep": counter.reps,
+                    "start": round(top_before if top_before is not None else float(timestamps[0]), 3),
+                    "end": round(t, 3),
+                    "depth": round(counter.last_depth, 1),
+                    "eccentric": None if counter.eccentric is None else round(counter.eccentric, 2),
+                    "concentric": None if counter.concentric is None else round(counter.concentric, 2),
+                })
+                if "template_match" in details:
+                    reps[-1]["template_match"] = details["template_match"]
+            elif counter is not None and counter.partial_reps > partials_before:
+                partials.append(round(t, 3))
+
+    # Rep score: mean accuracy over the rep's detected frames
+    for rep in reps:
+        lo, hi = np.searchsorted(timestamps, [rep["start"], rep["end"]], side="left")
+        window = detected[lo:hi + 1]
+        scores = accuracy[lo:hi + 1][window]
+        rep["score"] = round(float(scores.mean()), 1) if scores.size else 0.0
+
+    # Feedback as change points only; per-frame text would dominate the response
+    changes = []
+    if exercise != "general":
+        last = None
+        for i, text in feedback:
+            if text != last:
+                changes.append([round(float(timestamps[i]), 3), text])
+                last = text
+
+    return {
+        "angles": angles,
+        "angle_names": angle_set.names,
+        "accuracy": accuracy,
+        "feedback": changes,
+        "reps": reps,
+        "partial_reps": partials,
+        "details": details,
+    }
+
+
+def build_report(video, frame_indices, landmarks, detected, exercise="general", stride=1,
+                 include_landmarks=False):
+    """Compact, columnar time series plus rep list and summary"""
+    timestamps = frame_indices / video["fps"]
+    scored = score_series(landmarks, detected, timestamps, exercise)
+    accuracy = scored["accuracy"]
+
+    series = {
+        "t": np.round(timestamps, 3).tolist(),
+        "frame": frame_indices.tolist(),
+        "detected": detected.astype(int).tolist(),
+        "accuracy": np.round(accuracy).astype(int).tolist(),
+        "angles": {name: _rounded(scored["angles"][:, k], 1) for k, name in enumerate(scored["angle_names"])},
+    }
+    if include_landmarks:
+        key = np.round(landmarks[:, KEY_INDICES].astype(np.float64), 4)
+        series["landmarks"] = [rows if ok else None for rows, ok in zip(key.tolist(), detected.tolist())]
+
+    reps = scored["reps"]
+    summary = {
+        "analyzed_frames": int(len(detected)),
+        "detected_frames": int(detected.sum()),
+        "mean_accuracy": round(float(accuracy[detected].mean()), 1) if detected.any() else 0.0,
+        "reps": len(reps),
+        "partial_reps": len(scored["partial_reps"]),
+        "mean_rep_score": round(float(np.mean([r["score"] for r in reps])), 1) if reps else None,
+    }
+    if exercise == "plank":
+        summary.update(scored["details"])
+
+    return {
+        "video": {**video, "duration": round(video["frames"] / video["fps"], 2)},
+        "exercise": exercise,
+        "stride": stride,
+        "landmarks": KEY_NAMES if include_landmarks else None,
+        "summary": summary,
+        "reps": reps,
+        "partial_reps": scored["partial_reps"],
+        "feedback": scored["feedback"],
+        "series": series,
+    }
+
+
+async def analyze_video(pool, path, exercise="general", stride=None, chunk_seconds=None,
+                        include_landmarks=False):
+    """Analyze a video file end to end using the given InferencePool"""
+    if exercise not in EXERCISE_NAMES:
+        raise ValueError(f"Unknown exercise '{exercise}', expected one of: {', '.join(EXERCISE_NAMES)}")
+    stride = max(1, stride or int(os.getenv("POSE_VIDEO_STRIDE", DEFAULT_STRIDE)))
+    chunk_seconds = chunk_seconds or float(os.getenv("POSE_VIDEO_CHUNK_SECONDS", DEFAULT_CHUNK_SECONDS))
+
+    started = time.perf_counter()
+    video = await asyncio.get_running_loop().run_in_executor(None, probe_video, path)
+    chunks = plan_chunks(video["frames"], video["fps"], stride, chunk_seconds)
+    frame_indices, landmarks, detected = await detect_video(pool, path, chunks, stride)
+    if not len(frame_indices):
+        raise InvalidVideoError("No frames could be decoded from the video")
+    if not video["frames"]:
+        video["frames"] = int(frame_indices[-1]) + 1
+
+    report = build_report(video, frame_indices, landmarks, detected, exercise, stride, include_landmarks)
+    report["chunks"] = len(chunks)
+    report["processing_seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a recorded workout video")
+    parser.add_argument("video", help="Path to the video file")
+    parser.add_argument("--exercise", default="general", choices=EXERCISE_NAMES)
+    parser.add_argument("--stride", type=int, default=None,
+                        help=f"Analyze every n-th frame (POSE_VIDEO_STRIDE, default {DEFAULT_STRIDE})")
+    parser.add_argument("--chunk-seconds", type=float, default=None,
+                        help=f"Seconds of video per parallel chunk (default {DEFAULT_CHUNK_SECONDS:.0f})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (POSE_WORKERS)")
+    parser.add_argument("--landmarks", action="store_true", help="Include key landmarks per frame")
+    parser.add_argument("--output", "-o", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    pool = InferencePool(workers=args.workers)
+    pool.start()
+    try:
+        report = asyncio.run(analyze_video(pool, args.video, args.exercise, args.stride,
+                                           args.chunk_seconds, args.landmarks))
+    finally:
+        pool.shutdown()
+
+    summary = report["summary"]
+    print(f"✅ {summary['analyzed_frames']} frames in {report['chunks']} chunks, "
+          f"{report['processing_seconds']}s; reps: {summary['reps']}, "
+          f"mean accuracy: {summary['mean_accuracy']}%")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        print(f"💾 Report written to {args.output}")
+    else:
+        print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()